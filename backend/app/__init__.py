@@ -3,6 +3,7 @@ from flask import request, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from config import Config
 
@@ -21,11 +22,55 @@ def create_app():
     app = Flask(__name__, static_folder=static_folder)
     app.config.from_object(Config)
 
+    hops = app.config.get('PROXY_FIX_HOPS', 0)
+    if hops:
+        # За прокси request.remote_addr — адрес прокси: клиента берём из X-Forwarded-*
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
+    from . import profiler
+    profiler.init_app(app)
+
+    from . import roles, session_user
+    roles.init_app(app)
+    session_user.init_app(app)
+
+    from ..services.images import image_pipeline
+    image_pipeline.init_app(app)
+
+    from ..services import search
+    search.init_app(app)
+
+    from ..services.mail import mail_sender
+    mail_sender.init_app(app)
+
+    from ..services.cache import cache
+    from ..repositories import reference
+    cache.init_app(app)
+    reference.init_app(app)
+
+    from ..services.throttle import login_throttle
+    login_throttle.init_app(app)
+
+    from ..services import category_tree, facets
+    category_tree.init_app(app)
+    facets.init_app(app)
+
+    from ..services import comments, feed, notifications
+    feed.init_app(app)
+    notifications.init_app(app)
+    comments.init_app(app)
+
+    from ..services.activity import activity_log
+    activity_log.init_app(app)
+
+    from . import bootstrap
+    bootstrap.init_app(app)
+
     # Register blueprints (внутрипакетные относительные импорты)
     from .routes import bp as main_bp
     from .auth import bp as auth_bp
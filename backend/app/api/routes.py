@@ -1,38 +1,118 @@
 """Простые REST-эндпоинты для клиента PySide6 и интеграций.
-В продакшне следует добавить пагинацию, схемы валидации, аутентификацию по токену.
+В продакшне следует добавить схемы валидации, аутентификацию по токену.
 """
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
-from flask import jsonify, request
+from flask import current_app, jsonify, request, url_for
 from flask_login import login_required, current_user
 
 from .. import db
 from . import bp
-from ..models import Category, Item
+from ..models import Item
+from ..roles import role_required
+from ...repositories import decode_cursor, items as items_repo, reference
+from ...services import activity, category_tree, deals, feed, importer, notifications, search
+from ...services.activity import activity_log
+from ...services.cache import cache
+
+
+@bp.errorhandler(HTTPStatus.FORBIDDEN)
+def _forbidden(error):
+    # role_required отвечает abort(403); клиентам API — JSON, а не HTML-страница
+    return jsonify({"error": "Недостаточно прав"}), HTTPStatus.FORBIDDEN
 
 
 def _item_to_json(item: Item) -> dict:
     return item.to_dict()
 
 
+def _requested_fields(raw):
+    """Список полей из ?fields=a,b (по умолчанию — все); None — если есть неизвестное"""
+
+    if not raw:
+        return list(items_repo.API_ITEM_FIELDS)
+    fields = [name.strip() for name in raw.split(",") if name.strip()]
+    if not fields or any(name not in items_repo.API_ITEM_FIELDS for name in fields):
+        return None
+    return list(dict.fromkeys(fields))
+
+
+def _row_to_json(row, fields) -> dict:
+    """Сериализация плоской строки запроса (без ORM-объектов и ленивых связей)"""
+
+    data = row._mapping
+    result = {name: data[name] for name in fields}
+    if "created_at" in result:
+        result["created_at"] = result["created_at"].isoformat() if result["created_at"] else None
+    return result
+
+
 @bp.get("/categories")
 def api_categories():
-    categories = Category.query.order_by(Category.name).all()
-    return jsonify([{"id": c.id, "name": c.name, "description": c.description} for c in categories])
+    """Категории по имени; item_count — объявления в самой категории, total_count — с подкатегориями"""
+
+    categories = sorted(category_tree.tree(), key=lambda c: c.name)
+    return jsonify([
+        {"id": c.id, "name": c.name, "description": c.description, "parent_id": c.parent_id,
+         "depth": c.depth, "item_count": c.item_count, "total_count": c.total_count}
+        for c in categories
+    ])
 
 
 @bp.get("/items")
 @login_required
 def api_items_list():
-    # Простые фильтры: category_id, status
-    q = Item.query
-    category_id = request.args.get("category_id", type=int)
-    status = request.args.get("status")
-    if category_id:
-        q = q.filter_by(category_id=category_id)
-    if status:
-        q = q.filter_by(status=status)
-    items = q.order_by(Item.created_at.desc()).limit(100).all()
-    return jsonify([_item_to_json(i) for i in items])
+    """Объявления страницами по курсору.
+
+    Параметры: category_id, status, q (полнотекстовый поиск), sort,
+    limit (до API_MAX_PAGE_SIZE), cursor, fields (через запятую).
+    Ссылка на следующую страницу — в заголовках Link (rel="next") и
+    X-Next-Cursor. Ответ снабжается слабым ETag: при совпадении
+    If-None-Match клиент получает 304 без тела.
+    """
+
+    fields = _requested_fields(request.args.get("fields"))
+    if fields is None:
+        allowed = ", ".join(items_repo.API_ITEM_FIELDS)
+        return jsonify({"error": f"Неизвестное поле; допустимы: {allowed}"}), HTTPStatus.BAD_REQUEST
+
+    search_query = request.args.get("q", "").strip()
+    sort = request.args.get("sort") or ("relevance" if search_query else "date_desc")
+    if sort not in items_repo.ITEM_SORTS:
+        return jsonify({"error": "Неизвестная сортировка"}), HTTPStatus.BAD_REQUEST
+    max_limit = current_app.config.get("API_MAX_PAGE_SIZE", 100)
+    limit = min(max(request.args.get("limit", default=max_limit, type=int), 1), max_limit)
+
+    query = items_repo.api_item_rows_query(fields)
+    query = items_repo.apply_item_filters(
+        query, request.args.get("category_id", type=int), request.args.get("status")
+    )
+    hits = search.search_hits(search_query)
+    if hits is not None:
+        query = query.join(hits, hits.c.item_id == Item.id).add_columns(hits.c.score)
+    query = items_repo.apply_items_keyset(
+        query, sort, decode_cursor(request.args.get("cursor")),
+        score=hits.c.score if hits is not None else None,
+    )
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = items_repo.items_cursor(
+            rows[-1], sort, score=rows[-1].score if hits is not None else None
+        )
+
+    response = jsonify([_row_to_json(row, fields) for row in rows])
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["Link"] = f'<{url_for("api.api_items_list", **args)}>; rel="next"'
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Ответ зависит от пользователя сессии: кешировать только у клиента и всегда перепроверять
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
 
 
 @bp.post("/items")
@@ -56,4 +136,211 @@ def api_items_create():
     )
     db.session.add(item)
     db.session.commit()
+    activity_log.record("item.create", current_user.id, item_id=item.id, source="api")
     return jsonify(_item_to_json(item)), HTTPStatus.CREATED
+
+
+def _batch_elements():
+    """Массив из тела запроса (или {"items": [...]}); (элементы, None) или (None, ответ с ошибкой)"""
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list) or not data:
+        return None, (jsonify({"error": "Ожидается непустой массив"}), HTTPStatus.BAD_REQUEST)
+    limit = current_app.config.get("API_MAX_BATCH_SIZE", 500)
+    if len(data) > limit:
+        return None, (jsonify({"error": f"Не больше {limit} элементов за запрос"}), HTTPStatus.BAD_REQUEST)
+    return data, None
+
+
+def _batch_rejected(results: list, key: str):
+    """Ответ 422: ничего не записано, в results — ошибки по элементам"""
+
+    return jsonify({key: 0, "results": results}), HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@bp.post("/items/batch")
+@login_required
+def api_items_batch_create():
+    """Создание пачки объявлений (массив объектов как у POST /items).
+
+    Сначала проверяются все элементы — по правилам формы объявления, как
+    при импорте; при любой ошибке ничего не записывается (422). Затем все
+    объявления вставляются одним executemany и одним commit. В results —
+    результат по каждому элементу в порядке запроса.
+    """
+
+    elements, error = _batch_elements()
+    if error:
+        return error
+    validate = importer.ItemRowValidator()
+    rows, results = [], []
+    for index, element in enumerate(elements):
+        if not isinstance(element, dict):
+            results.append({"index": index, "ok": False, "error": "Ожидается объект"})
+            continue
+        values, message = validate(dict(element, category=element.get("category_id", element.get("category"))))
+        if message:
+            results.append({"index": index, "ok": False, "error": message})
+            continue
+        values["owner_id"] = current_user.id
+        rows.append(values)
+        results.append({"index": index, "ok": True})
+    if len(rows) < len(elements):
+        return _batch_rejected(results, "created")
+
+    item_ids = items_repo.insert_items(rows)
+    # Вставка мимо ORM-объектов: индекс поиска и счётчики категорий дополняем явно
+    search.index_items(db.session.connection(), Item.id.in_(item_ids))
+    category_tree.count_inserted(rows)
+    db.session.commit()
+    feed.refresh_items(item_ids)
+    activity_log.record("item.create", current_user.id, item_ids=item_ids, source="api-batch")
+    for result, item_id in zip(results, item_ids):
+        result["id"] = item_id
+    return jsonify({"created": len(item_ids), "results": results}), HTTPStatus.CREATED
+
+
+@bp.patch("/items/batch")
+@login_required
+def api_items_batch_update():
+    """Смена статусов пачки объявлений: массив {"id": ..., "status": ...}.
+
+    Менять можно свои объявления, менеджер и администратор — любые.
+    Статусы меняются только по таблице переходов сделок (deals.py): нельзя,
+    например, вернуть проданную вещь в продажу. Проверка всех элементов
+    (существование, права, допустимый переход) идёт одним запросом до
+    записи; при любой ошибке ничего не меняется (422). Запись — условные
+    UPDATE по действиям и один commit; ожидающие заявки с этими вещами
+    отклоняются. Если параллельный запрос успел изменить статус — 409.
+    """
+
+    elements, error = _batch_elements()
+    if error:
+        return error
+    requested = [
+        element.get("id") if isinstance(element, dict) and type(element.get("id")) is int else None
+        for element in elements
+    ]
+    states = items_repo.item_states([item_id for item_id in requested if item_id is not None])
+    privileged = current_user.has_any_role("manager", "admin")
+    changes, results = {}, []
+    for index, (element, item_id) in enumerate(zip(elements, requested)):
+        status = element.get("status") if isinstance(element, dict) else None
+        owner_id, current = states.get(item_id, (None, None))
+        if item_id is None:
+            message = "Нужен числовой id"
+        elif status not in deals.STATUS_ACTIONS:
+            message = "Допустимые статусы: " + ", ".join(deals.STATUS_ACTIONS)
+        elif item_id in changes:
+            message = "Объявление указано повторно"
+        elif item_id not in states:
+            message = "Объявление не найдено"
+        elif owner_id != current_user.id and not privileged:
+            message = "Недостаточно прав"
+        elif current not in deals.ITEM_TRANSITIONS[deals.STATUS_ACTIONS[status]][0]:
+            message = f"Переход {current} → {status} недопустим"
+        else:
+            changes[item_id] = status
+            results.append({"index": index, "ok": True, "id": item_id, "status": status})
+            continue
+        results.append({"index": index, "ok": False, "id": item_id, "error": message})
+    if len(changes) < len(elements):
+        return _batch_rejected(results, "updated")
+
+    try:
+        deals.change_statuses(changes, current_user.id)
+    except deals.DealError as exc:
+        return jsonify({"updated": 0, "error": str(exc)}), HTTPStatus.CONFLICT
+    return jsonify({"updated": len(changes), "results": results})
+
+
+@bp.get("/notifications")
+@login_required
+def api_notifications():
+    """Уведомления текущего пользователя, новые первыми; ?before=<id>&limit=N"""
+
+    limit = max(1, min(request.args.get("limit", notifications.PAGE_SIZE, type=int), 200))
+    entries = notifications.recent(current_user.id, limit, request.args.get("before", type=int))
+    return jsonify({
+        "unread": notifications.unread_count(current_user.id),
+        "notifications": entries,
+        "next_before": entries[-1]["id"] if len(entries) == limit else None,
+    })
+
+
+@bp.post("/notifications/read")
+@login_required
+def api_notifications_read():
+    """Отметить прочитанными: {"ids": [...]} или пустое тело — все"""
+
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if ids is not None and not (isinstance(ids, list) and all(type(i) is int for i in ids)):
+        return jsonify({"error": "ids — массив чисел"}), HTTPStatus.BAD_REQUEST
+    changed = notifications.mark_read(current_user.id, ids)
+    db.session.commit()
+    return jsonify({"marked": changed, "unread": notifications.unread_count(current_user.id)})
+
+
+@bp.get("/admin/profiler")
+@login_required
+@role_required("admin")
+def api_profiler_stats():
+    """Агрегаты SQL-профилировщика по эндпоинтам (только администратор)"""
+
+    profiler = current_app.extensions.get("sql_profiler")
+    if profiler is None:
+        return jsonify({"error": "Профилировщик отключён"}), HTTPStatus.NOT_FOUND
+    return jsonify(profiler.snapshot())
+
+
+@bp.get("/admin/cache")
+@login_required
+@role_required("admin")
+def api_cache_stats():
+    """Попадания и промахи кеша по пространствам имён (только администратор)"""
+
+    return jsonify(cache.stats())
+
+
+def _parse_time(name: str, default: datetime) -> datetime:
+    value = request.args.get(name)
+    if not value:
+        return default
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)  # в БД — наивное UTC
+    return moment
+
+
+@bp.get("/admin/activity")
+@login_required
+@role_required("admin")
+def api_activity_log():
+    """Журнал действий за окно времени (только администратор).
+
+    ?since=&until= — ISO-время UTC (по умолчанию последние сутки, окно не
+    больше 31 дня), фильтры event= и user_id=, курсор cursor=, limit= до 500.
+    """
+
+    try:
+        until = _parse_time("until", datetime.utcnow())
+        since = _parse_time("since", until - timedelta(days=1))
+        entries, next_cursor = activity.query(
+            since, until,
+            event_type=request.args.get("event"),
+            user_id=request.args.get("user_id", type=int),
+            cursor=request.args.get("cursor"),
+            limit=max(1, min(request.args.get("limit", 100, type=int), 500)),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
+    return jsonify({
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "entries": entries,
+        "next_cursor": next_cursor,
+        "writer": activity_log.stats(),
+    })
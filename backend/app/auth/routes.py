@@ -1,12 +1,27 @@
 """Маршруты аутентификации."""
-from flask import flash, redirect, render_template, request, url_for
+import math
+
+from flask import flash, make_response, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
 from werkzeug.urls import url_parse
 
 from .. import db
+from ...services.activity import activity_log
+from ...services.throttle import login_throttle
 from . import bp
 from .forms import LoginForm, RegistrationForm
-from ..models import Role, User, UserRole
+from ..models import User, UserRole
+from ..roles import role_id
+
+
+def _throttled(template: str, title: str, form, wait: float):
+    """Ответ 429: форма с сообщением и заголовок Retry-After"""
+
+    seconds = max(int(math.ceil(wait)), 1)
+    flash(f"Слишком много попыток. Повторите через {seconds} с.", "danger")
+    response = make_response(render_template(template, title=title, form=form), 429)
+    response.headers["Retry-After"] = str(seconds)
+    return response
 
 
 @bp.route("/login", methods=["GET", "POST"])
@@ -18,12 +33,21 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
+        # До запроса к БД и проверки хеша: поток перебора не должен занимать воркеры
+        wait = login_throttle.check(request.remote_addr, form.username.data)
+        if wait:
+            activity_log.record("auth.login_throttled", username=form.username.data)
+            return _throttled("auth/login.html", "Вход", form, wait)
+
         user = User.query.filter_by(username=form.username.data).first()
         if user is None or not user.check_password(form.password.data):
+            activity_log.record("auth.login_failed", user.id if user else None, username=form.username.data)
             flash("Неверное имя пользователя или пароль", "danger")
             return redirect(url_for("auth.login"))
 
+        login_throttle.reset_user(form.username.data)
         login_user(user, remember=form.remember_me.data)
+        activity_log.record("auth.login", user.id)
         next_page = request.args.get("next")
         if not next_page or url_parse(next_page).netloc != "":
             next_page = url_for("main.dashboard")
@@ -41,6 +65,18 @@ def register():
 
     form = RegistrationForm()
     if form.validate_on_submit():
+        # Хеширование пароля дорогое — регистрации с адреса ограничены той же корзиной, что и вход
+        wait = login_throttle.check(request.remote_addr)
+        if wait:
+            return _throttled("auth/register.html", "Регистрация", form, wait)
+
+        # Пользователь и его роли — одна транзакция; id ролей берутся из кеша процесса
+        client_role_id = role_id("client", "Клиент платформы", level=10)
+        admin_role_id = role_id("admin", "Администратор", level=100)
+        # Если ещё нет ни одного администратора — делаем первого пользователя администратором
+        has_admin = db.session.scalar(
+            db.select(UserRole.id).where(UserRole.role_id == admin_role_id).limit(1)
+        ) is not None
         user = User(
             username=form.username.data,
             email=form.email.data,
@@ -48,19 +84,11 @@ def register():
             phone=form.phone.data,
         )
         user.set_password(form.password.data)
-        db.session.add(user)
-        db.session.commit()
-
         # Назначаем роль клиента по умолчанию
-        client_role = Role.get_or_create("client", "Клиент платформы", level=10)
-        db.session.add(UserRole(user_id=user.id, role_id=client_role.id))
-        # Если ещё нет ни одного администратора — делаем первого пользователя администратором
-        admin_role = Role.get_or_create("admin", "Администратор", level=100)
-        has_admin = (
-            UserRole.query.filter_by(role_id=admin_role.id).first() is not None
-        )
+        user.roles.append(UserRole(role_id=client_role_id))
         if not has_admin:
-            db.session.add(UserRole(user_id=user.id, role_id=admin_role.id))
+            user.roles.append(UserRole(role_id=admin_role_id))
+        db.session.add(user)
         db.session.commit()
 
         if not has_admin:
@@ -80,6 +108,7 @@ def register():
 def logout():
     """Выход пользователя."""
 
+    activity_log.record("auth.logout", current_user.id)
     logout_user()
     flash("Вы вышли из системы", "info")
     return redirect(url_for("auth.login"))
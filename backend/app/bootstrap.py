@@ -0,0 +1,132 @@
+"""Подготовка базы к запуску: ``flask bootstrap``.
+
+Одна команда в одном процессе делает то, что раньше делали три скрипта
+(init_db.py, seed_basics.py, seed_help.py), каждый со своим create_app():
+
+1. create_all — недостающие таблицы вместе с их индексами;
+2. миграции Alembic до head — новые колонки и индексы уже существующих
+   таблиц (базы, созданные одним create_all, получают их здесь же);
+3. полнотекстовый индекс объявлений;
+4. роли, категории по умолчанию и текст справки.
+
+Всё выполняется на одном соединении сессии и фиксируется одним commit;
+при ошибке откатывается. В PostgreSQL это и одна транзакция для DDL, в
+MySQL каждая DDL-операция фиксируется неявно. Команда идемпотентна:
+повторный запуск ничего не меняет, а справку, отредактированную
+администратором, не перезаписывает (кроме ``--reset-help``).
+"""
+import click
+from flask import current_app
+
+from . import db
+from .models import Category, Role, SystemSetting
+
+DEFAULT_ROLES = [
+    ("admin", "Администратор", 100),
+    ("manager", "Менеджер", 50),
+    ("client", "Клиент", 10),
+]
+
+DEFAULT_CATEGORIES = [
+    ("Электроника", "Телефоны, ноутбуки, гаджеты"),
+    ("Бытовая техника", "Чайники, стиральные машины, миксеры"),
+    ("Одежда", "Вещи, обувь, аксессуары"),
+    ("Детские товары", "Игрушки, мебель, коляски"),
+]
+
+HELP_TEXT = (
+    "MUIVesg — учебный проект ВКР для обмена и ответственного обращения с вещами.\n\n"
+    "Основные возможности:\n"
+    "- Создание объявлений: передача, обмен, продажа.\n"
+    "- Пожертвования: фиксация передачи вещи.\n"
+    "- Переработка/утилизация: отметка операций, рекомендации по классам опасности.\n"
+    "- Поиск и фильтры по категориям и статусам.\n"
+    "- Личный кабинет: управление объявлениями и история операций.\n\n"
+    "Роли пользователей:\n"
+    "- Пользователь: создание объявлений, инициирование сделок.\n"
+    "- Менеджер/модератор: модерация объявлений и сделок, отчёты.\n"
+    "- Администратор: управление пользователями и справочниками.\n\n"
+    "Подсказки:\n"
+    "- Для обмена выберите свою вещь в карточке интересующей вещи и отправьте заявку.\n"
+    "- Для пожертвования владелец подтверждает передачу в карточке своей вещи.\n"
+    "- Для переработки укажите способ и локацию при отметке операции.\n\n"
+    "Контакты и авторство:\n"
+    "- Проект выполнен в рамках учебного задания. Текст справки можно отредактировать администратором в разделе 'Редактор справки'.\n"
+)
+
+
+def _upgrade_schema(connection) -> None:
+    from alembic import command
+
+    config = current_app.extensions["migrate"].migrate.get_config()
+    # migrations/env.py берёт это соединение вместо собственного
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+def seed_reference() -> dict:
+    """Добавляет недостающие роли и категории (без commit); возвращает число созданных"""
+
+    from .roles import role_id
+
+    existing_roles = set(db.session.scalars(db.select(Role.name)))
+    for name, description, level in DEFAULT_ROLES:
+        role_id(name, description, level)
+
+    names = [name for name, _ in DEFAULT_CATEGORIES]
+    existing = set(db.session.scalars(db.select(Category.name).where(Category.name.in_(names))))
+    for name, description in DEFAULT_CATEGORIES:
+        if name not in existing:
+            db.session.add(Category(name=name, description=description))
+    return {
+        "roles": sum(name not in existing_roles for name, _, _ in DEFAULT_ROLES),
+        "categories": len(names) - len(existing),
+    }
+
+
+def seed_help(reset: bool = False) -> bool:
+    """Создаёт запись справки, если её нет (или перезаписывает при `reset`); True — если записана"""
+
+    record = db.session.scalar(db.select(SystemSetting).where(SystemSetting.key == "help_text"))
+    if record is not None and not reset:
+        return False
+    if record is None:
+        record = SystemSetting(key="help_text")
+        db.session.add(record)
+    record.value = HELP_TEXT
+    record.description = "Справочная информация"
+    return True
+
+
+def bootstrap(reset_help: bool = False) -> dict:
+    """Схема, поисковый индекс и справочники в одной транзакции сессии"""
+
+    from ..services import search
+
+    try:
+        connection = db.session.connection()
+        db.metadata.create_all(bind=connection)
+        _upgrade_schema(connection)
+        report = {"search_index": search.ensure_index(connection)}
+        report.update(seed_reference())
+        report["help_text"] = seed_help(reset_help)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
+
+
+def init_app(app) -> None:
+    @app.cli.command("bootstrap")
+    @click.option("--reset-help", is_flag=True, help="Перезаписать текст справки значением по умолчанию")
+    def bootstrap_command(reset_help):
+        """Подготовить базу: схема, миграции, роли, категории, справка."""
+
+        report = bootstrap(reset_help)
+        click.echo("[OK] Схема и миграции применены.")
+        if report["search_index"]:
+            click.echo("[OK] Создан полнотекстовый индекс объявлений.")
+        click.echo(f"[OK] Добавлено ролей: {report['roles']}, категорий: {report['categories']}.")
+        if report["help_text"]:
+            click.echo("[OK] Справка заполнена.")
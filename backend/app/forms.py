@@ -1,6 +1,6 @@
 """WTForms для основных сущностей приложения."""
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import (
     BooleanField,
     DecimalField,
@@ -12,6 +12,14 @@ from wtforms import (
 )
 from wtforms.validators import DataRequired, Length, NumberRange, Optional, Email
 
+# Состояние вещи: значение → подпись (форма объявления, фильтр списка)
+CONDITION_CHOICES = [
+    ("new", "Новое"),
+    ("like_new", "Как новое"),
+    ("used", "Б/У"),
+    ("needs_repair", "Требует ремонта"),
+]
+
 
 class ItemForm(FlaskForm):
     title = StringField("Название", validators=[DataRequired(), Length(max=120)])
@@ -19,12 +27,7 @@ class ItemForm(FlaskForm):
     category_id = SelectField("Категория", coerce=int, validators=[DataRequired()])
     condition = SelectField(
         "Состояние",
-        choices=[
-            ("new", "Новое"),
-            ("like_new", "Как новое"),
-            ("used", "Б/У"),
-            ("needs_repair", "Требует ремонта"),
-        ],
+        choices=CONDITION_CHOICES,
         validators=[DataRequired()],
     )
     price = DecimalField(
@@ -42,6 +45,16 @@ class ItemForm(FlaskForm):
     submit = SubmitField("Сохранить")
 
 
+class ItemImportForm(FlaskForm):
+    file = FileField(
+        "Файл XLSX или CSV",
+        validators=[FileRequired(), FileAllowed(["xlsx", "csv"], "Только XLSX или CSV")],
+    )
+    owner = StringField("Владелец объявлений (логин)", validators=[Optional(), Length(max=64)])
+    dry_run = BooleanField("Только проверить, не загружать")
+    submit = SubmitField("Импортировать")
+
+
 class RecyclingForm(FlaskForm):
     method = StringField("Способ переработки", validators=[DataRequired(), Length(max=120)])
     location = StringField("Локация", validators=[Length(max=255)])
@@ -17,7 +17,9 @@ class TimestampMixin:
 
 @login_manager.user_loader
 def load_user(user_id: str):
-    return User.query.get(int(user_id))
+    from .session_user import load_session_user
+
+    return load_session_user(int(user_id))
 
 
 class Role(db.Model):
@@ -62,6 +64,8 @@ class User(UserMixin, TimestampMixin, db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     last_login = db.Column(db.DateTime)
+    # Денормализованный счётчик непрочитанных уведомлений (services/notifications.py)
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     items = db.relationship("Item", back_populates="owner", lazy="dynamic")
     donations = db.relationship(
@@ -94,8 +98,18 @@ class User(UserMixin, TimestampMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def role_names(self) -> frozenset:
+        """Имена ролей без обхода self.roles (кеш процесса и запроса, см. roles.py)"""
+
+        from .roles import role_names
+
+        return role_names(self.id)
+
     def has_role(self, role_name: str) -> bool:
-        return any(link.role.name == role_name for link in self.roles)
+        return role_name in self.role_names()
+
+    def has_any_role(self, *role_names: str) -> bool:
+        return not self.role_names().isdisjoint(role_names)
 
     def to_dict(self) -> dict:
         """Упрощённое представление пользователя для API"""
@@ -106,7 +120,7 @@ class User(UserMixin, TimestampMixin, db.Model):
             "email": self.email,
             "full_name": self.full_name,
             "phone": self.phone,
-            "roles": [link.role.name for link in self.roles],
+            "roles": sorted(self.role_names()),
         }
 
     def __repr__(self) -> str:  # pragma: no cover
@@ -117,6 +131,10 @@ class UserRole(db.Model):
     """Связующая таблица пользователь ↔ роль"""
 
     __tablename__ = "user_roles"
+    __table_args__ = (
+        db.Index("ix_user_roles_user_role", "user_id", "role_id"),
+        db.Index("ix_user_roles_role_id", "role_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -161,28 +179,44 @@ class Category(db.Model):
     name = db.Column(db.String(80), nullable=False)
     description = db.Column(db.Text)
     parent_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
+    # Объявлений непосредственно в категории; поддерживается services/category_tree.py
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     parent = db.relationship("Category", remote_side=[id], backref="children")
     items = db.relationship("Item", back_populates="category", lazy="dynamic")
 
-    @staticmethod
-    def seed_defaults():
-        defaults = [
-            ("Электроника", "Телефоны, ноутбуки, гаджеты"),
-            ("Бытовая техника", "Чайники, стиральные машины, миксеры"),
-            ("Одежда", "Вещи, обувь, аксессуары"),
-            ("Детские товары", "Игрушки, мебель, коляски"),
-        ]
-        for name, desc in defaults:
-            if not Category.query.filter_by(name=name).first():
-                db.session.add(Category(name=name, description=desc))
-        db.session.commit()
+
+class CategoryClosure(db.Model):
+    """Дерево категорий как таблица замыкания: все пары (предок, потомок).
+
+    Каждая категория — сама себе предок с depth=0. Поддерживается событиями
+    сессии (services/category_tree.py) при добавлении и переносе категорий.
+    """
+
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        db.Index("ix_category_closure_descendant", "descendant_id", "ancestor_id"),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
 
 
 class Item(TimestampMixin, db.Model):
     """Объявление о вещи"""
 
     __tablename__ = "items"
+    # Индексы под запросы routes/main.py: лента и keyset-страницы, фильтры, кабинет владельца
+    __table_args__ = (
+        db.Index("ix_items_created_at_id", "created_at", "id"),
+        db.Index("ix_items_status_created_at", "status", "created_at"),
+        db.Index("ix_items_category_created_at", "category_id", "created_at"),
+        db.Index("ix_items_owner_created_at", "owner_id", "created_at"),
+        db.Index("ix_items_price_id", "price", "id"),
+        # Покрывающий индекс для счётчиков фасетов (services/facets.py)
+        db.Index("ix_items_facets", "category_id", "status", "condition", "is_free", "is_exchangeable"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
@@ -191,13 +225,18 @@ class Item(TimestampMixin, db.Model):
     price = db.Column(db.Float)
     is_free = db.Column(db.Boolean, default=False)
     is_exchangeable = db.Column(db.Boolean, default=False)
+    # Неудалённых комментариев; поддерживается services/comments.py
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     status = db.Column(
         db.String(20),
         default="available",
     )  # available, reserved, donated, recycled, disposed
 
     owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    # active_history: при смене категории прежнее значение нужно счётчикам категорий
+    category_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False), active_history=True
+    )
     hazard_class_id = db.Column(db.Integer, db.ForeignKey("hazard_classes.id"))
     recycling_method_id = db.Column(db.Integer, db.ForeignKey("recycling_methods.id"))
 
@@ -254,18 +293,35 @@ class ItemImage(TimestampMixin, db.Model):
     """Изображения для объявлений"""
 
     __tablename__ = "item_images"
+    __table_args__ = (
+        db.Index("ix_item_images_item_primary_created", "item_id", "is_primary", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
     is_primary = db.Column(db.Boolean, default=False)  # Основное изображение
+    content_hash = db.Column(db.String(64), index=True)  # sha256 исходного файла
+    # {"thumb": {"webp": "...", "jpeg": "..."}, "card": {...}, "full": {...}} — заполняет фоновый обработчик
+    variants = db.Column(db.JSON)
+    processed_at = db.Column(db.DateTime)
     item = db.relationship("Item", back_populates="images")
 
+    def variant(self, size: str, fmt: str = "jpeg") -> str:
+        """Путь к уменьшенной копии; пока копии не готовы — к исходному файлу"""
+
+        return ((self.variants or {}).get(size) or {}).get(fmt) or self.file_path
+
 
 class Comment(TimestampMixin, db.Model):
     """Комментарии под объявлениями"""
 
     __tablename__ = "comments"
+    __table_args__ = (
+        db.Index("ix_comments_item_deleted_created", "item_id", "is_deleted", "created_at"),
+        # Очистка мягко удалённых (services/comments.py)
+        db.Index("ix_comments_deleted_updated", "is_deleted", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
@@ -293,6 +349,17 @@ class ExchangeRequest(TimestampMixin, db.Model):
     """Заявки на обмен вещами"""
 
     __tablename__ = "exchange_requests"
+    __table_args__ = (
+        db.Index("ix_exchange_requests_target_status", "target_item_id", "status"),
+        db.Index("ix_exchange_requests_requester_created", "requester_id", "created_at"),
+        db.Index("ix_exchange_requests_offered_item_id", "offered_item_id"),
+        # Не больше одной ожидающей заявки пользователя на вещь. Частичных
+        # индексов в MySQL нет — там остаётся проверка в services/deals.py
+        db.Index(
+            "uq_exchange_requests_pending", "target_item_id", "requester_id", unique=True,
+            postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'"),
+        ).ddl_if(dialect=("postgresql", "sqlite")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     requester_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -313,6 +380,10 @@ class Donation(TimestampMixin, db.Model):
     """Учёт пожертвований"""
 
     __tablename__ = "donations"
+    __table_args__ = (
+        db.Index("ix_donations_donor_created", "donor_id", "created_at"),
+        db.Index("ix_donations_item_id", "item_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
@@ -358,9 +429,14 @@ class DisposalRequest(TimestampMixin, db.Model):
 
 
 class ActivityLog(TimestampMixin, db.Model):
-    """Журнал действий в системе"""
+    """Журнал действий в системе (пишется пачками, см. services/activity.py)"""
 
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        db.Index("ix_activity_logs_created_at", "created_at"),
+        db.Index("ix_activity_logs_event_created", "event_type", "created_at"),
+        db.Index("ix_activity_logs_user_created", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
@@ -374,11 +450,16 @@ class Notification(TimestampMixin, db.Model):
     """Уведомления  пользователям"""
 
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_user_id_id", "user_id", "id"),
+        db.Index("ix_notifications_is_read_created", "is_read", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     title = db.Column(db.String(120), nullable=False)
     body = db.Column(db.Text, nullable=False)
+    link = db.Column(db.String(255))  # куда ведёт уведомление (URL внутри сайта)
     is_read = db.Column(db.Boolean, default=False)
 
     user = db.relationship("User", back_populates="notifications")
@@ -394,3 +475,24 @@ class SystemSetting(db.Model):
     value = db.Column(db.Text, nullable=False)
     description = db.Column(db.String(255))
 
+
+
+class OutboundEmail(TimestampMixin, db.Model):
+    """Исходящее письмо в очереди (outbox); отправляет фоновый MailSender"""
+
+    __tablename__ = "outbound_emails"
+    __table_args__ = (
+        db.Index("ix_outbound_emails_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.String(1024), nullable=False)  # через запятую
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    reply_to = db.Column(db.String(255))
+    status = db.Column(db.String(16), nullable=False, default="pending")  # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
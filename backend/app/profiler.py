@@ -0,0 +1,190 @@
+"""Профилировщик SQL на уровне HTTP-запроса.
+
+События движка SQLAlchemy считают выражения и время БД, хуки Flask
+before_request/after_request привязывают их к эндпоинту. Итог запроса
+уходит в заголовок Server-Timing, а агрегаты по эндпоинтам копятся в
+кольцевом буфере, который отдаёт /api/admin/profiler. У потоковых ответов
+(экспорт) агрегаты записываются при закрытии ответа и включают SQL,
+выполненный при отдаче тела; Server-Timing отправляется раньше тела и
+его не учитывает.
+"""
+import heapq
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Длина SQL в отчёте: полный текст длинных запросов не нужен для поиска регрессий
+_STATEMENT_PREVIEW = 500
+
+_listeners_installed = False
+
+
+class RequestSqlStats:
+    """Статистика SQL одного HTTP-запроса"""
+
+    __slots__ = ("started", "count", "db_seconds", "slowest", "slow_top")
+
+    def __init__(self, slow_top: int):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_seconds = 0.0
+        self.slowest: list = []  # min-heap (секунды, SQL)
+        self.slow_top = slow_top
+
+    def add(self, seconds: float, statement: str) -> None:
+        self.count += 1
+        self.db_seconds += seconds
+        _push_slowest(self.slowest, self.slow_top, seconds, statement)
+
+
+def _push_slowest(heap: list, limit: int, seconds: float, statement: str) -> None:
+    if limit <= 0:
+        return
+    entry = (seconds, statement[:_STATEMENT_PREVIEW])
+    if len(heap) < limit:
+        heapq.heappush(heap, entry)
+    elif seconds > heap[0][0]:
+        heapq.heapreplace(heap, entry)
+
+
+class EndpointStats:
+    """Агрегаты эндпоинта: последние `ring_size` запросов и самые медленные SQL"""
+
+    def __init__(self, ring_size: int, slow_top: int):
+        self.requests_total = 0
+        self.samples = deque(maxlen=ring_size)  # (мс всего, мс БД, число запросов)
+        self.slowest: list = []
+        self.slow_top = slow_top
+
+    def add(self, wall_ms: float, stats: RequestSqlStats) -> None:
+        self.requests_total += 1
+        self.samples.append((wall_ms, stats.db_seconds * 1000, stats.count))
+        for seconds, statement in stats.slowest:
+            _push_slowest(self.slowest, self.slow_top, seconds, statement)
+
+    def summary(self) -> dict:
+        window = len(self.samples)
+        if not window:
+            return {"requests_total": self.requests_total, "window": 0}
+        walls = sorted(s[0] for s in self.samples)
+        queries = [s[2] for s in self.samples]
+        return {
+            "requests_total": self.requests_total,
+            "window": window,
+            "avg_queries": round(sum(queries) / window, 2),
+            "max_queries": max(queries),
+            "avg_db_ms": round(sum(s[1] for s in self.samples) / window, 3),
+            "avg_wall_ms": round(sum(walls) / window, 3),
+            "p95_wall_ms": round(walls[min(window - 1, int(window * 0.95))], 3),
+            "slowest_statements": [
+                {"ms": round(seconds * 1000, 3), "sql": statement}
+                for seconds, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class SqlProfiler:
+    """Потокобезопасное хранилище агрегатов по эндпоинтам"""
+
+    def __init__(self, ring_size: int = 200, slow_top: int = 5):
+        self.ring_size = ring_size
+        self.slow_top = slow_top
+        self._lock = threading.Lock()
+        self._endpoints: dict = {}
+
+    def record(self, endpoint: str, wall_ms: float, stats: RequestSqlStats) -> None:
+        with self._lock:
+            bucket = self._endpoints.get(endpoint)
+            if bucket is None:
+                bucket = self._endpoints[endpoint] = EndpointStats(self.ring_size, self.slow_top)
+            bucket.add(wall_ms, stats)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: bucket.summary() for name, bucket in sorted(self._endpoints.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("profiler_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        stats = g.get("sql_stats")
+        if stats is not None:
+            stats.add(elapsed, statement)
+
+
+def _handle_error(exception_context):
+    # Упавший запрос не вызывает after_cursor_execute — снимаем его отметку
+    connection = exception_context.connection
+    if connection is not None:
+        started = connection.info.get("profiler_started")
+        if started:
+            started.pop()
+
+
+def _install_engine_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _listeners_installed = True
+
+
+def init_app(app) -> None:
+    """Подключает профилировщик к приложению (app.extensions["sql_profiler"])"""
+
+    if not app.config.get("SQL_PROFILER_ENABLED", True):
+        return
+
+    profiler = SqlProfiler(
+        ring_size=app.config.get("SQL_PROFILER_RING_SIZE", 200),
+        slow_top=app.config.get("SQL_PROFILER_SLOW_TOP", 5),
+    )
+    app.extensions["sql_profiler"] = profiler
+    _install_engine_listeners()
+
+    @app.before_request
+    def _start_sql_profiling():
+        if request.endpoint != "static":
+            g.sql_stats = RequestSqlStats(profiler.slow_top)
+
+    @app.after_request
+    def _finish_sql_profiling(response):
+        stats = g.get("sql_stats")
+        if stats is None:
+            return response
+        endpoint = request.endpoint or "<unmatched>"
+
+        def record():
+            profiler.record(endpoint, (time.perf_counter() - stats.started) * 1000, stats)
+
+        # Заголовок уходит до тела: для потоковых ответов он покрывает только SQL до первого байта
+        wall_ms = (time.perf_counter() - stats.started) * 1000
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.count} SQL", app;dur={wall_ms:.2f}',
+        )
+        if response.is_streamed:
+            # Тело (экспорт через stream_with_context) читает БД уже после after_request:
+            # его SQL попадает в ту же статистику, а итог записывается при закрытии ответа
+            response.call_on_close(record)
+        else:
+            g.pop("sql_stats", None)
+            record()
+        return response
@@ -0,0 +1,205 @@
+"""Кеш ролей пользователей и декоратор проверки прав.
+
+Набор имён ролей пользователя читается одним запросом и хранится в
+TTL-кеше процесса (ключ — id пользователя) и в `g` на время запроса,
+поэтому повторные `has_role` в шаблонах и обработчиках не обращаются к БД.
+
+Изменения UserRole/Role в этом процессе сбрасывают кеш событиями сессии
+(после flush и после commit). Изменения из другого процесса
+(scripts/manage_roles.py, другой воркер) становятся видны не позже чем
+через ROLE_CACHE_TTL секунд.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import abort, current_app, g, has_app_context
+from flask_login import current_user
+from sqlalchemy import event
+
+from . import db
+
+# Верхняя граница числа записей: при переполнении сначала выбрасываются устаревшие
+_MAX_ENTRIES = 10000
+
+
+class TtlCache:
+    """Потокобезопасный TTL-кеш процесса с поколениями для безопасной инвалидации"""
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        # Растёт при каждой инвалидации: загрузка, начатая до неё, в кеш не попадёт
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        return None
+
+    def put(self, key, value, generation: int) -> None:
+        """Кладёт значение, прочитанное из БД, если с начала чтения не было инвалидации"""
+
+        now = time.monotonic()
+        with self._lock:
+            if generation == self._generation and self.ttl > 0:
+                if len(self._entries) >= _MAX_ENTRIES:
+                    self._evict(now)
+                self._entries[key] = (now + self.ttl, value)
+
+    def get(self, key, loader):
+        value = self.peek(key)
+        if value is None:
+            generation = self._generation
+            value = loader(key)
+            self.put(key, value, generation)
+        return value
+
+    def invalidate(self, keys=None) -> None:
+        """Сбрасывает указанные ключи (None — весь кеш)"""
+
+        with self._lock:
+            self._generation += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+        if len(self._entries) >= _MAX_ENTRIES:
+            self._entries.clear()
+
+
+# user_id → frozenset имён ролей
+role_cache = TtlCache()
+
+
+def _load_role_names(user_id: int) -> frozenset:
+    from .models import Role, UserRole
+
+    return frozenset(db.session.scalars(
+        db.select(Role.name).join(UserRole, UserRole.role_id == Role.id).where(UserRole.user_id == user_id)
+    ))
+
+
+def role_names(user_id: int) -> frozenset:
+    """Имена ролей пользователя: из `g`, затем из TTL-кеша, затем одним запросом"""
+
+    if not has_app_context():
+        return _load_role_names(user_id)
+    memo = g.setdefault("_user_roles", {})
+    roles = memo.get(user_id)
+    if roles is None:
+        roles = memo[user_id] = role_cache.get(user_id, _load_role_names)
+    return roles
+
+
+def remember_roles(user_id: int, names, generation: int) -> frozenset:
+    """Сохраняет роли, уже прочитанные вместе с пользователем (см. session_user.py)"""
+
+    roles = frozenset(names)
+    role_cache.put(user_id, roles, generation)
+    if has_app_context():
+        g.setdefault("_user_roles", {})[user_id] = roles
+    return roles
+
+
+def invalidate_roles(user_ids=None) -> None:
+    role_cache.invalidate(user_ids)
+    if has_app_context():
+        memo = g.get("_user_roles")
+        if memo is not None:
+            if user_ids is None:
+                memo.clear()
+            else:
+                for user_id in user_ids:
+                    memo.pop(user_id, None)
+
+
+# Имя роли → id. Роли создаются при развёртывании и не переименовываются,
+# поэтому id, прочитанные из БД, живут до конца процесса (изменения Role сбрасывают словарь)
+_role_ids: dict = {}
+
+
+def role_id(name: str, description: str = "", level: int = 10) -> int:
+    """id роли без запроса к БД; недостающая роль создаётся в текущей транзакции (без commit)"""
+
+    cached = _role_ids.get(name)
+    if cached is not None:
+        return cached
+    from .models import Role
+
+    found = db.session.scalar(db.select(Role.id).where(Role.name == name))
+    if found is not None:
+        _role_ids[name] = found
+        return found
+    # id новой роли не кешируется: транзакция ещё может откатиться
+    role = Role(name=name, description=description, level=level)
+    db.session.add(role)
+    db.session.flush()
+    return role.id
+
+
+def role_required(*names: str):
+    """Пускает только пользователей хотя бы с одной из ролей `names`, иначе 403"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return current_app.login_manager.unauthorized()
+            if not current_user.has_any_role(*names):
+                abort(403)
+            return view(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def _after_flush(session, flush_context) -> None:
+    from .models import Role, UserRole
+
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, Role) for obj in changed):
+        pending = None
+        _role_ids.clear()
+    else:
+        pending = {obj.user_id for obj in changed if isinstance(obj, UserRole)}
+        if not pending:
+            return
+        previous = session.info.get("role_cache_pending", set())
+        pending = None if previous is None else pending | previous
+    session.info["role_cache_pending"] = pending
+    # Сразу — чтобы тот же запрос увидел свои изменения; повторно после commit
+    invalidate_roles(pending)
+
+
+def _after_commit(session) -> None:
+    if "role_cache_pending" in session.info:
+        invalidate_roles(session.info.pop("role_cache_pending"))
+
+
+def _after_rollback(session) -> None:
+    if "role_cache_pending" in session.info:
+        invalidate_roles(session.info.pop("role_cache_pending"))
+
+
+def init_app(app) -> None:
+    role_cache.ttl = app.config.get("ROLE_CACHE_TTL", 60)
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
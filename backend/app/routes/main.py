@@ -1,40 +1,50 @@
 """Маршруты основной части приложения"""
-from flask import abort, flash, redirect, render_template, request, url_for, send_file, current_app
+from flask import (
+    Response,
+    abort,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user, login_required
-from io import BytesIO
-from docx import Document
-from openpyxl import Workbook
-import smtplib
-from email.message import EmailMessage
 import os
 from werkzeug.utils import secure_filename
-from PIL import Image
 
-from .. import db
+from .. import bootstrap, db
+from ...repositories import decode_cursor, items as items_repo, reference, users as users_repo
+from ...services import category_tree, comments as comments_service, deals, exports, facets, feed, importer, mail, notifications, search
+from ...services.images import image_pipeline, probe_upload, store_original
+from ...services.activity import activity_log
+from ...services.cache import cached_page
+from ...services.mail import mail_sender
 from ..forms import (
+    CONDITION_CHOICES,
     DonationForm,
     ExchangeRequestForm,
     HelpTextForm,
     FeedbackForm,
     ItemForm,
+    ItemImportForm,
     RecyclingForm,
     CommentForm,
     ProfileEditForm,
 )
 from ..models import (
-    Category,
-    Donation,
-    ExchangeRequest,
     User,
     UserRole,
     Item,
     Role,
-    RecyclingOperation,
     SystemSetting,
     FeedbackMessage,
     ItemImage,
     Comment,
 )
+from ..roles import role_required
 from . import bp
 
 
@@ -42,13 +52,7 @@ from . import bp
 def index():
     """Главная страница с подборкой объявлений"""
 
-    items = Item.query.order_by(Item.created_at.desc()).limit(12).all()
-    # Загружаем первое изображение для каждого объявления
-    items_with_images = []
-    for item in items:
-        first_image = ItemImage.query.filter_by(item_id=item.id).order_by(ItemImage.is_primary.desc(), ItemImage.created_at).first()
-        items_with_images.append((item, first_image))
-    return render_template("main/index.html", items_with_images=items_with_images, title="MUIVesg")
+    return render_template("main/index.html", cards=feed.latest_cards(), title="MUIVesg")
 
 
 @bp.route("/dashboard")
@@ -56,9 +60,9 @@ def index():
 def dashboard():
     """Панель пользователя."""
 
-    items = Item.query.filter_by(owner_id=current_user.id).all()
-    exchange_requests = ExchangeRequest.query.filter_by(requester_id=current_user.id).all()
-    donations = Donation.query.filter_by(donor_id=current_user.id).all()
+    items = items_repo.owner_items(current_user.id)
+    exchange_requests = items_repo.user_exchange_requests(current_user.id)
+    donations = items_repo.user_donations(current_user.id)
     return render_template(
         "main/dashboard.html",
         title="Личный кабинет",
@@ -68,94 +72,132 @@ def dashboard():
     )
 
 
+def _item_filters() -> facets.ItemFilters:
+    """Фильтры списка объявлений из строки запроса (страница и экспорт)"""
+
+    condition = request.args.get("condition")
+    return facets.ItemFilters(
+        category_id=request.args.get("category", type=int),
+        status=request.args.get("status") or None,
+        condition=condition if condition in dict(CONDITION_CHOICES) else None,
+        is_free=facets.parse_flag(request.args.get("free")),
+        is_exchangeable=facets.parse_flag(request.args.get("exchange")),
+    )
+
+
 @bp.route("/items")
 def items_list():
-    """Список объявлений с фильтрами и сортировкой."""
-
-    query = Item.query
-    category_id = request.args.get("category", type=int)
-    status = request.args.get("status")
-    sort = request.args.get("sort", default="date_desc")
-
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if status:
-        query = query.filter_by(status=status)
-
-    if sort == "price_asc":
-        # MySQL не поддерживает NULLS LAST — эмулируем: сначала не-NULL, затем NULL
-        query = query.order_by(Item.price.is_(None), Item.price.asc())
-    elif sort == "price_desc":
-        query = query.order_by(Item.price.is_(None), Item.price.desc())
-    else:
-        query = query.order_by(Item.created_at.desc())
-
-    categories = Category.query.all()
-    items = query.all()
-    # Загружаем первое изображение для каждого объявления
-    items_with_images = []
-    for item in items:
-        first_image = ItemImage.query.filter_by(item_id=item.id).order_by(ItemImage.is_primary.desc(), ItemImage.created_at).first()
-        items_with_images.append((item, first_image))
+    """Список объявлений с поиском, фильтрами, счётчиками фасетов, сортировкой и keyset-пагинацией."""
+
+    query = items_repo.item_cards_query()
+    search_query = (request.args.get("q") or "").strip()
+    filters = _item_filters()
+    sort = request.args.get("sort", default="relevance" if search_query else "date_desc")
+    cursor_token = request.args.get("cursor")
+
+    hits = search.search_hits(search_query) if search_query else None
+    if hits is not None:
+        query = query.join(hits, hits.c.item_id == Item.id).add_columns(hits.c.score)
+    query = items_repo.apply_item_filters(query, *filters)
+
+    per_page = current_app.config.get("ITEMS_PER_PAGE", 24)
+    query = items_repo.apply_items_keyset(
+        query, sort, decode_cursor(cursor_token),
+        score=hits.c.score if hits is not None else None,
+    )
+    # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = items_repo.items_cursor(
+            last[0], sort, score=last[3] if hits is not None else None
+        )
+    cards = [row[:3] for row in rows]
+
     return render_template(
         "main/items.html",
         title="Объявления",
-        items_with_images=items_with_images,
-        categories=categories,
-        selected_category=category_id,
-        selected_status=status,
+        cards=cards,
+        categories=category_tree.tree(),
+        statuses=items_repo.ITEM_STATUSES,
+        conditions=CONDITION_CHOICES,
+        facet_counts=facets.item_facets(filters, hits),
+        search_query=search_query,
+        filters=filters,
+        # Параметры фильтров для ссылок (пагинация, экспорт); пустые url_for отбрасывает
+        filter_args={
+            "category": filters.category_id,
+            "status": filters.status,
+            "condition": filters.condition,
+            "free": {True: 1, False: 0}.get(filters.is_free),
+            "exchange": {True: 1, False: 0}.get(filters.is_exchangeable),
+        },
         selected_sort=sort,
+        next_cursor=next_cursor,
+        is_first_page=not cursor_token,
     )
 
 
 # ===== Публичные страницы (10+) =====
 @bp.route("/about")
+@cached_page()
 def about():
     return render_template("main/about.html", title="О нас")
 
 
 @bp.route("/contacts")
+@cached_page()
 def contacts():
     return render_template("main/contacts.html", title="Контакты")
 
 
 @bp.route("/faq")
+@cached_page()
 def faq():
     return render_template("main/faq.html", title="FAQ")
 
 
 @bp.route("/how-it-works")
+@cached_page()
 def howitworks():
     return render_template("main/howitworks.html", title="Как это работает")
 
 
 @bp.route("/categories-page")
+@cached_page()
 def categories_page():
-    categories = Category.query.all()
+    categories = category_tree.tree()
     return render_template("main/categories.html", title="Категории", categories=categories)
 
 
 @bp.route("/news")
+@cached_page()
 def news():
     return render_template("main/news.html", title="Новости")
 
 
 @bp.route("/partners")
+@cached_page()
 def partners():
     return render_template("main/partners.html", title="Партнёрам")
 
 
 @bp.route("/support")
+@cached_page()
 def support():
     return render_template("main/support.html", title="Поддержка")
 
 
 @bp.route("/privacy")
+@cached_page()
 def privacy():
     return render_template("main/privacy.html", title="Политика конфиденциальности")
 
 
 @bp.route("/terms")
+@cached_page()
 def terms():
     return render_template("main/terms.html", title="Условия использования")
 
@@ -168,38 +210,18 @@ def feedback():
         # Сохраняем сообщение в БД
         msg = FeedbackMessage(name=form.name.data, email=form.email.data, message=form.message.data)
         db.session.add(msg)
+        # Письмо администратору — в очередь той же транзакцией; отправит фоновый MailSender
+        queued = mail.enqueue_email(
+            "Новое обращение с сайта",
+            f"Имя: {form.name.data}\n"
+            f"Email: {form.email.data}\n\n"
+            f"Сообщение:\n{form.message.data}\n",
+            to=[current_app.config.get("MAIL_ADMIN_TO")],
+            reply_to=form.email.data,
+        )
         db.session.commit()
-
-        # Пытаемся отправить письмо администратору, если настроен SMTP
-        cfg = current_app.config
-        if cfg.get("MAIL_SERVER") and cfg.get("MAIL_DEFAULT_SENDER") and cfg.get("MAIL_ADMIN_TO"):
-            try:
-                email_msg = EmailMessage()
-                email_msg["From"] = cfg.get("MAIL_DEFAULT_SENDER")
-                email_msg["To"] = cfg.get("MAIL_ADMIN_TO")
-                email_msg["Subject"] = "Новое обращение с сайта"
-                body = (
-                    f"Имя: {form.name.data}\n"
-                    f"Email: {form.email.data}\n\n"
-                    f"Сообщение:\n{form.message.data}\n"
-                )
-                email_msg.set_content(body)
-
-                if cfg.get("MAIL_USE_SSL"):
-                    with smtplib.SMTP_SSL(cfg.get("MAIL_SERVER"), cfg.get("MAIL_PORT")) as server:
-                        if cfg.get("MAIL_USERNAME") and cfg.get("MAIL_PASSWORD"):
-                            server.login(cfg.get("MAIL_USERNAME"), cfg.get("MAIL_PASSWORD"))
-                        server.send_message(email_msg)
-                else:
-                    with smtplib.SMTP(cfg.get("MAIL_SERVER"), cfg.get("MAIL_PORT")) as server:
-                        if cfg.get("MAIL_USE_TLS"):
-                            server.starttls()
-                        if cfg.get("MAIL_USERNAME") and cfg.get("MAIL_PASSWORD"):
-                            server.login(cfg.get("MAIL_USERNAME"), cfg.get("MAIL_PASSWORD"))
-                        server.send_message(email_msg)
-            except Exception:
-                # Тихо игнорируем ошибку отправки, чтобы пользователь получил успех
-                pass
+        if queued is not None:
+            mail_sender.wake()
 
         flash("Спасибо за обращение! Мы свяжемся с вами по email.", "success")
         return redirect(url_for("main.feedback"))
@@ -207,49 +229,29 @@ def feedback():
 
 
 # ===== Экспорт DOCX/XLSX =====
+def _export_response(stream, filename: str, mimetype: str) -> Response:
+    response = Response(stream_with_context(stream), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
 @bp.route("/export/items.docx")
 def export_items_docx():
-    items = Item.query.order_by(Item.created_at.desc()).all()
-    doc = Document()
-    doc.add_heading("Список объявлений", 0)
-    for it in items:
-        p = doc.add_paragraph()
-        p.add_run(it.title).bold = True
-        p.add_run(f" — {it.category.name if it.category else 'Без категории'}\n")
-        p.add_run((it.description or "").strip())
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="items.docx", mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    rows = items_repo.export_rows(**_item_filters()._asdict())
+    return _export_response(exports.stream_items_docx(rows), "items.docx", exports.DOCX_MIMETYPE)
 
 
 @bp.route("/export/items.xlsx")
 def export_items_xlsx():
-    items = Item.query.order_by(Item.created_at.desc()).all()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Объявления"
-    ws.append(["ID", "Название", "Категория", "Цена", "Статус", "Создано"])
-    for it in items:
-        ws.append([
-            it.id,
-            it.title,
-            it.category.name if it.category else None,
-            it.price,
-            it.status,
-            it.created_at.strftime("%Y-%m-%d %H:%M") if it.created_at else "",
-        ])
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="items.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    rows = items_repo.export_rows(**_item_filters()._asdict())
+    return _export_response(exports.stream_items_xlsx(rows), "items.xlsx", exports.XLSX_MIMETYPE)
 
 
 @bp.route("/items/<int:item_id>")
 def item_detail(item_id: int):
     """Карточка объявления."""
 
-    item = Item.query.get_or_404(item_id)
+    item = items_repo.get_item_detail_or_404(item_id)
 
     recycling_form = RecyclingForm(prefix="recycle")
     exchange_form = ExchangeRequestForm(prefix="exchange")
@@ -257,31 +259,30 @@ def item_detail(item_id: int):
     comment_form = CommentForm(prefix="comment")
 
     if current_user.is_authenticated:
-        exchange_form.offered_item_id.choices = [
-            (usr_item.id, usr_item.title)
-            for usr_item in Item.query.filter_by(owner_id=current_user.id).all()
-        ]
+        exchange_form.offered_item_id.choices = items_repo.owner_item_choices(current_user.id)
     else:
         exchange_form.offered_item_id.choices = []
 
     # Входящие заявки на этот товар (для владельца)
     incoming = []
     if current_user.is_authenticated and current_user.id == item.owner_id:
-        incoming = [r for r in item.incoming_requests if r.status == "pending"]
+        incoming = items_repo.pending_requests(item.id)
 
     # Получаем изображения объявления
-    images = ItemImage.query.filter_by(item_id=item.id).order_by(ItemImage.is_primary.desc(), ItemImage.created_at).all()
+    images = items_repo.item_images(item.id)
     
-    # Получаем комментарии (не удаленные)
-    comments = Comment.query.filter_by(item_id=item.id, is_deleted=False).order_by(Comment.created_at.desc()).all()
+    # Страница комментариев (не удаленных) вместе с авторами
+    comments, comments_cursor = items_repo.item_comments(
+        item.id, decode_cursor(request.args.get("comments")),
+        current_app.config.get("COMMENTS_PER_PAGE", 20),
+    )
 
     # Проверяем права на удаление (владелец, менеджер или администратор)
     can_delete = False
     if current_user.is_authenticated:
         can_delete = (
             current_user.id == item.owner_id or
-            current_user.has_role("manager") or
-            current_user.has_role("admin")
+            current_user.has_any_role("manager", "admin")
         )
 
     return render_template(
@@ -295,6 +296,8 @@ def item_detail(item_id: int):
         incoming_requests=incoming,
         images=images,
         comments=comments,
+        comments_cursor=comments_cursor,
+        comments_first_page=not request.args.get("comments"),
         can_delete=can_delete,
     )
 
@@ -304,36 +307,15 @@ def item_detail(item_id: int):
 def accept_request(req_id: int):
     """Подтвердить заявку владельцем вещи (покупка или обмен)."""
 
-    req = ExchangeRequest.query.get_or_404(req_id)
-    item = Item.query.get_or_404(req.target_item_id)
-    if item.owner_id != current_user.id:
+    try:
+        item_id = deals.accept_request(req_id, current_user.id)
+    except deals.DealForbidden:
         abort(403)
-    if req.status != "pending":
-        flash("Заявка уже обработана", "info")
-        return redirect(url_for("main.item_detail", item_id=item.id))
-
-    req.status = "accepted"
-    # Покупка: нет предложенной вещи — закрепляем продажу
-    if req.offered_item_id is None:
-        item.status = "sold"
-        # Передаём право собственности покупателю
-        item.owner_id = req.requester_id
-        # Отклоняем остальные заявки на этот товар
-        for other in ExchangeRequest.query.filter(
-            ExchangeRequest.target_item_id == item.id,
-            ExchangeRequest.id != req.id,
-            ExchangeRequest.status == "pending",
-        ).all():
-            other.status = "declined"
-    else:
-        # Обмен: помечаем обе вещи зарезервированными
-        item.status = "reserved"
-        offered = Item.query.get(req.offered_item_id)
-        if offered:
-            offered.status = "reserved"
-    db.session.commit()
+    except deals.DealError as exc:
+        flash(str(exc), "info")
+        return redirect(request.referrer or url_for("main.index"))
     flash("Заявка подтверждена", "success")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 @bp.route("/requests/<int:req_id>/decline", methods=["POST"])
@@ -341,30 +323,33 @@ def accept_request(req_id: int):
 def decline_request(req_id: int):
     """Отклонить заявку владельцем вещи."""
 
-    req = ExchangeRequest.query.get_or_404(req_id)
-    item = Item.query.get_or_404(req.target_item_id)
-    if item.owner_id != current_user.id:
+    try:
+        item_id = deals.decline_request(req_id, current_user.id)
+    except deals.DealForbidden:
         abort(403)
-    if req.status != "pending":
-        flash("Заявка уже обработана", "info")
-        return redirect(url_for("main.item_detail", item_id=item.id))
-
-    req.status = "declined"
-    db.session.commit()
+    except deals.DealError as exc:
+        flash(str(exc), "info")
+        return redirect(request.referrer or url_for("main.index"))
     flash("Заявка отклонена", "success")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 def save_uploaded_images(item_id, files):
-    """Сохраняет загруженные изображения для объявления"""
+    """Сохраняет загруженные изображения для объявления.
+
+    В запросе файл только проверяется по заголовку и пишется на диск под
+    именем хеша содержимого. Возвращает задания (content_hash, filename),
+    которые после коммита передаются в image_pipeline.submit().
+    """
+    jobs = []
     if not files:
-        return
-    
+        return jobs
+
     upload_folder = current_app.config['UPLOAD_FOLDER']
     os.makedirs(upload_folder, exist_ok=True)
-    
-    ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
-    
+
+    ALLOWED_EXTENSIONS = current_app.config.get('ALLOWED_EXTENSIONS', {'jpg', 'jpeg', 'png', 'gif'})
+
     primary_set = False
     for idx, file in enumerate(files):
         if file and file.filename:
@@ -375,38 +360,26 @@ def save_uploaded_images(item_id, files):
             ext = filename.rsplit('.', 1)[1].lower()
             if ext not in ALLOWED_EXTENSIONS:
                 continue
-            
-            # Добавляем префикс с ID объявления и индексом для уникальности
-            name, ext = os.path.splitext(filename)
-            filename = f"item_{item_id}_{idx}_{name}{ext}"
-            filepath = os.path.join(upload_folder, filename)
-            
-            # Сохраняем файл
-            file.save(filepath)
-            
-            # Проверяем, что это действительно изображение
-            try:
-                img = Image.open(filepath)
-                # Конвертируем в RGB, если нужно
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                # Сохраняем оригинал
-                img.save(filepath, optimize=True, quality=85)
-            except Exception as e:
-                # Если не удалось обработать как изображение, удаляем файл
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+
+            # Проверяем, что это действительно изображение (без полного декодирования)
+            data = file.read()
+            stored_ext = probe_upload(data)
+            if stored_ext is None:
                 continue
-            
+            digest, filename = store_original(upload_folder, data, stored_ext)
+
             # Создаем запись в БД
             image = ItemImage(
                 item_id=item_id,
                 file_path=filename,
+                content_hash=digest,
                 is_primary=(idx == 0 and not primary_set)
             )
             if idx == 0:
                 primary_set = True
             db.session.add(image)
+            jobs.append((digest, filename))
+    return jobs
 
 
 @bp.route("/items/create", methods=["GET", "POST"])
@@ -415,7 +388,7 @@ def create_item():
     """Создание нового объявления (упрощённая версия)."""
 
     form = ItemForm()
-    form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
+    form.category_id.choices = reference.category_choices()
 
     if form.validate_on_submit():
         item = Item(
@@ -432,11 +405,14 @@ def create_item():
         db.session.flush()  # Получаем ID объявления
         
         # Обрабатываем загруженные изображения
+        jobs = []
         if 'images' in request.files:
             files = request.files.getlist('images')
-            save_uploaded_images(item.id, files)
+            jobs = save_uploaded_images(item.id, files)
         
         db.session.commit()
+        activity_log.record("item.create", current_user.id, item_id=item.id)
+        image_pipeline.submit(jobs)
         flash("Объявление опубликовано", "success")
         return redirect(url_for("main.item_detail", item_id=item.id))
     # Показ формы при первом заходе или при невалидной отправке
@@ -445,33 +421,16 @@ def create_item():
 @bp.route("/items/<int:item_id>/buy", methods=["POST"])
 @login_required
 def buy_item(item_id: int):
-    """Простой сценарий покупки: пометить объявление как зарезервированное покупателем.
-    В дальнейшем можно расширить до полноценной сущности сделки.
-    """
-
-    item = Item.query.get_or_404(item_id)
-    if item.owner_id == current_user.id:
-        flash("Нельзя купить собственную вещь", "warning")
-        return redirect(url_for("main.item_detail", item_id=item.id))
-    if item.status != "available":
-        flash("Вещь недоступна для покупки", "warning")
-        return redirect(url_for("main.item_detail", item_id=item.id))
-    if not item.price or item.is_free:
-        flash("Для покупки должна быть указана цена", "warning")
-        return redirect(url_for("main.item_detail", item_id=item.id))
+    """Заявка на покупку; вещь закрепляется за покупателем, когда владелец её примет."""
 
-    # Создаём заявку как ExchangeRequest без предложенной вещи
-    req = ExchangeRequest(
-        requester_id=current_user.id,
-        target_item_id=item.id,
-        offered_item_id=None,
-        message="Заявка на покупку",
-        status="pending",
-    )
-    db.session.add(req)
-    db.session.commit()
-    flash("Запрос на покупку отправлен. Ожидайте подтверждения владельца.", "success")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    Item.query.get_or_404(item_id)
+    try:
+        deals.request_purchase(item_id, current_user.id)
+    except deals.DealError as exc:
+        flash(str(exc), "warning")
+    else:
+        flash("Запрос на покупку отправлен. Ожидайте подтверждения владельца.", "success")
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 @bp.route("/recycling/<int:item_id>", methods=["POST"])
@@ -479,23 +438,20 @@ def buy_item(item_id: int):
 def mark_recycled(item_id: int):
     """Отметить вещь переработанной."""
 
-    item = Item.query.get_or_404(item_id)
+    Item.query.get_or_404(item_id)
     form = RecyclingForm(prefix="recycle")
     if form.validate_on_submit():
-        operation = RecyclingOperation(
-            item_id=item.id,
-            operator_id=current_user.id,
-            method=form.method.data,
-            location=form.location.data,
-            notes=form.notes.data,
-        )
-        item.status = "recycled"
-        db.session.add(operation)
-        db.session.commit()
-        flash("Информация о переработке сохранена", "success")
+        try:
+            deals.recycle_item(
+                item_id, current_user.id, form.method.data, form.location.data, form.notes.data
+            )
+        except deals.DealError as exc:
+            flash(str(exc), "warning")
+        else:
+            flash("Информация о переработке сохранена", "success")
     else:
         flash("Проверьте правильность данных по переработке", "warning")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 @bp.route("/items/<int:item_id>/exchange", methods=["POST"])
@@ -503,25 +459,19 @@ def mark_recycled(item_id: int):
 def request_exchange(item_id: int):
     """Создать заявку на обмен."""
 
-    item = Item.query.get_or_404(item_id)
+    Item.query.get_or_404(item_id)
     form = ExchangeRequestForm(prefix="exchange")
-    form.offered_item_id.choices = [
-        (usr_item.id, usr_item.title)
-        for usr_item in Item.query.filter_by(owner_id=current_user.id).all()
-    ]
+    form.offered_item_id.choices = items_repo.owner_item_choices(current_user.id)
     if form.validate_on_submit():
-        exchange = ExchangeRequest(
-            requester_id=current_user.id,
-            target_item_id=item.id,
-            offered_item_id=form.offered_item_id.data,
-            message=form.message.data,
-        )
-        db.session.add(exchange)
-        db.session.commit()
-        flash("Заявка на обмен отправлена", "success")
+        try:
+            deals.request_exchange(item_id, current_user.id, form.offered_item_id.data, form.message.data)
+        except deals.DealError as exc:
+            flash(str(exc), "warning")
+        else:
+            flash("Заявка на обмен отправлена", "success")
     else:
         flash("Не удалось отправить заявку", "warning")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 @bp.route("/items/<int:item_id>/donate", methods=["POST"])
@@ -534,36 +484,33 @@ def donate_item(item_id: int):
         abort(403)
     form = DonationForm(prefix="donate")
     if form.validate_on_submit():
-        donation = Donation(
-            item_id=item.id,
-            donor_id=current_user.id,
-            status="confirmed",
-            confirmation_doc=form.notes.data,
-        )
-        item.status = "donated"
-        db.session.add(donation)
-        db.session.commit()
-        flash("Пожертвование зафиксировано", "success")
+        try:
+            deals.donate_item(item_id, current_user.id, form.notes.data)
+        except deals.DealForbidden:
+            abort(403)
+        except deals.DealError as exc:
+            flash(str(exc), "warning")
+        else:
+            flash("Пожертвование зафиксировано", "success")
     else:
         flash("Не удалось сохранить пожертвование", "warning")
-    return redirect(url_for("main.item_detail", item_id=item.id))
+    return redirect(url_for("main.item_detail", item_id=item_id))
 
 
 @bp.route("/help")
+@cached_page()
 def help_page():
     """Справка по системе."""
 
-    info = SystemSetting.query.filter_by(key="help_text").first()
-    return render_template("main/help.html", title="Справка", info=info)
+    return render_template("main/help.html", title="Справка", help_text=reference.help_text())
 
 
 @bp.route("/admin/help", methods=["GET", "POST"])
 @login_required
+@role_required("admin")
 def edit_help():
     """Редактирование справки (только для администраторов)."""
 
-    if not current_user.has_role("admin"):
-        abort(403)
     record = SystemSetting.query.filter_by(key="help_text").first()
     form = HelpTextForm()
     if record and request.method == "GET":
@@ -589,7 +536,7 @@ def edit_item(item_id: int):
     if item.owner_id != current_user.id:
         abort(403)
     form = ItemForm(obj=item)
-    form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
+    form.category_id.choices = reference.category_choices()
     if form.validate_on_submit():
         item.title = form.title.data
         item.description = form.description.data
@@ -600,11 +547,13 @@ def edit_item(item_id: int):
         item.is_exchangeable = form.is_exchangeable.data
         
         # Обрабатываем новые загруженные изображения
+        jobs = []
         if 'images' in request.files:
             files = request.files.getlist('images')
-            save_uploaded_images(item.id, files)
+            jobs = save_uploaded_images(item.id, files)
         
         db.session.commit()
+        image_pipeline.submit(jobs)
         flash("Объявление обновлено", "success")
         return redirect(url_for("main.item_detail", item_id=item.id))
     
@@ -622,52 +571,75 @@ def delete_item(item_id: int):
     # Проверяем права: владелец, менеджер или администратор
     can_delete = (
         item.owner_id == current_user.id or
-        current_user.has_role("manager") or
-        current_user.has_role("admin")
+        current_user.has_any_role("manager", "admin")
     )
     if not can_delete:
         abort(403)
     
-    # Удаляем связанные изображения
-    images = ItemImage.query.filter_by(item_id=item.id).all()
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    for img in images:
-        filepath = os.path.join(upload_folder, img.file_path)
-        if os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except Exception:
-                pass
-    
+    # Файлы изображений удаляются в фоне после коммита, если на них не ссылаются другие объявления
+    images = [(img.file_path, img.content_hash) for img in item.images]
     db.session.delete(item)
     db.session.commit()
+    image_pipeline.release(images)
+    activity_log.record("item.delete", current_user.id, item_id=item_id, owner_id=item.owner_id)
     flash("Объявление удалено", "success")
     return redirect(url_for("main.dashboard"))
 
 
 @bp.route("/admin/seed", methods=["POST"])
 @login_required
+@role_required("admin")
 def seed_data():
     """Инициализация базовых ролей и категорий (только админ)."""
 
-    if not current_user.has_role("admin"):
-        abort(403)
-    # Роли по умолчанию
-    Role.get_or_create("admin", "Администратор", level=100)
-    Role.get_or_create("manager", "Менеджер", level=50)
-    Role.get_or_create("client", "Клиент", level=10)
-    # Категории по умолчанию
-    Category.seed_defaults()
+    # Те же роли и категории по умолчанию, что и в flask bootstrap
+    bootstrap.seed_reference()
+    db.session.commit()
     flash("Справочники инициализированы", "success")
     return redirect(url_for("main.dashboard"))
 
 
+@bp.route("/admin/import", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def import_items():
+    """Массовый импорт объявлений из XLSX/CSV (только админ)."""
+
+    form = ItemImportForm()
+    report = None
+    if form.validate_on_submit():
+        owner = current_user
+        if form.owner.data:
+            owner = User.query.filter_by(username=form.owner.data.strip()).first()
+        if owner is None:
+            form.owner.errors.append("Пользователь не найден")
+        else:
+            upload = form.file.data
+            try:
+                report = importer.import_items(
+                    upload.stream, upload.filename, owner.id, dry_run=form.dry_run.data
+                )
+            except importer.ImportFormatError as exc:
+                flash(str(exc), "danger")
+            else:
+                if not report.dry_run:
+                    activity_log.record(
+                        "item.import", current_user.id, owner_id=owner.id, filename=upload.filename,
+                        imported=report.imported,
+                    )
+                verb = "проверено" if report.dry_run else "загружено"
+                flash(
+                    f"Строк: {report.total}, {verb}: {report.imported}, с ошибками: {report.error_count}",
+                    "success" if not report.error_count else "warning",
+                )
+    return render_template("admin/import.html", title="Импорт объявлений", form=form, report=report)
+
+
 # ===== Управление ролями (веб-страница для администратора) =====
 @bp.route("/admin/users", methods=["GET", "POST"])
 @login_required
+@role_required("admin")
 def admin_users():
-    if not current_user.has_role("admin"):
-        abort(403)
 
     # Выдача/снятие ролей (простая форма POST)
     if request.method == "POST":
@@ -683,6 +655,7 @@ def admin_users():
             if not any(link.role_id == role.id for link in user.roles):
                 db.session.add(UserRole(user_id=user.id, role_id=role.id))
                 db.session.commit()
+                activity_log.record("role.add", current_user.id, target_user_id=user.id, role=role.name)
                 flash("Роль выдана", "success")
             else:
                 flash("У пользователя уже есть эта роль", "info")
@@ -691,12 +664,13 @@ def admin_users():
             if link:
                 db.session.delete(link)
                 db.session.commit()
+                activity_log.record("role.remove", current_user.id, target_user_id=user.id, role=role.name)
                 flash("Роль снята", "success")
             else:
                 flash("У пользователя нет этой роли", "info")
         return redirect(url_for("main.admin_users"))
 
-    users = User.query.order_by(User.username).all()
+    users = users_repo.users_with_roles()
     roles = Role.query.order_by(Role.name).all()
     return render_template("admin/users.html", title="Пользователи и роли", users=users, roles=roles)
 
@@ -726,11 +700,12 @@ def edit_profile():
             flash("Такой email уже зарегистрирован", "danger")
             return render_template("main/profile_edit.html", title="Редактирование профиля", form=form)
         
-        # Обновляем данные
-        current_user.username = form.username.data
-        current_user.email = form.email.data
-        current_user.full_name = form.full_name.data
-        current_user.phone = form.phone.data
+        # Обновляем данные (ORM-запись; снимок в кеше сбросится при commit)
+        user = current_user.record
+        user.username = form.username.data
+        user.email = form.email.data
+        user.full_name = form.full_name.data
+        user.phone = form.phone.data
         
         db.session.commit()
         flash("Профиль обновлен", "success")
@@ -747,12 +722,13 @@ def add_comment(item_id: int):
     form = CommentForm(prefix="comment")
     
     if form.validate_on_submit():
-        comment = Comment(
-            item_id=item.id,
-            user_id=current_user.id,
-            text=form.text.data
-        )
-        db.session.add(comment)
+        comments_service.add(item.id, current_user.id, form.text.data)
+        if item.owner_id != current_user.id:
+            notifications.notify(
+                [item.owner_id], "Новый комментарий",
+                f"{current_user.username} прокомментировал(а) «{item.title}».",
+                url_for("main.item_detail", item_id=item.id),
+            )
         db.session.commit()
         flash("Комментарий добавлен", "success")
     else:
@@ -770,16 +746,50 @@ def delete_comment(comment_id: int):
     # Проверяем права: автор комментария, менеджер или администратор
     can_delete = (
         comment.user_id == current_user.id or
-        current_user.has_role("manager") or
-        current_user.has_role("admin")
+        current_user.has_any_role("manager", "admin")
     )
     
     if not can_delete:
         abort(403)
     
-    # Мягкое удаление (помечаем как удаленный)
-    comment.is_deleted = True
+    # Мягкое удаление (помечаем как удаленный) вместе со счётчиком объявления
+    comments_service.soft_delete(comment)
     db.session.commit()
     flash("Комментарий удален", "success")
     
     return redirect(url_for("main.item_detail", item_id=comment.item_id))
+
+
+# ===== Уведомления =====
+@bp.route("/notifications")
+@login_required
+def notifications_page():
+    """Последние уведомления; ?before=<id> — следующая страница"""
+
+    entries = notifications.recent(current_user.id, before_id=request.args.get("before", type=int))
+    return render_template(
+        "main/notifications.html", title="Уведомления", notifications=entries, page_size=notifications.PAGE_SIZE
+    )
+
+
+@bp.route("/notifications/read", methods=["POST"])
+@login_required
+def notifications_read():
+    """Отметить все уведомления прочитанными"""
+
+    notifications.mark_read(current_user.id)
+    db.session.commit()
+    return redirect(url_for("main.notifications_page"))
+
+
+@bp.route("/notifications/poll")
+@login_required
+def notifications_poll():
+    """Длинный опрос: новые уведомления после ?after=<id> и число непрочитанных (?unread=)"""
+
+    result = notifications.wait_for_updates(
+        current_user.id, request.args.get("after", type=int), request.args.get("unread", type=int)
+    )
+    response = jsonify(result)
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,135 @@
+"""Загрузка пользователя сессии для login_manager.user_loader.
+
+Пользователь читается одним запросом вместе с ролями, роли сразу кладутся
+в кеш ролей (roles.py). Поля, нужные шаблонам и обработчикам (id, логин,
+email, ФИО, телефон, дата регистрации), хранятся в TTL-кеше процесса как
+неизменяемый снимок, поэтому типичная страница авторизованного
+пользователя не делает ни одного запроса ради current_user.
+
+current_user — это SessionUser: снимок + ленивая ORM-запись. Любой
+атрибут, которого нет в снимке (items, donations, roles...), прозрачно
+берётся из записи User, прочитанной по требованию. Изменять пользователя
+нужно через ORM-объект (`current_user.record`); правки User и удаление
+сбрасывают снимок событиями сессии, как и в кеше ролей. Правки из другого
+процесса видны не позже чем через USER_CACHE_TTL секунд.
+"""
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import User, UserRole
+from .roles import TtlCache, remember_roles, role_cache, role_names
+
+SNAPSHOT_FIELDS = (
+    "id", "username", "email", "full_name", "phone", "is_active", "created_at", "unread_notifications",
+)
+
+# user_id → dict с полями SNAPSHOT_FIELDS
+user_cache = TtlCache(ttl=30)
+
+
+class SessionUser(UserMixin):
+    """current_user: поля снимка без запросов, остальное — из ORM-записи"""
+
+    def __init__(self, snapshot: dict, record: User = None):
+        self.__dict__["_snapshot"] = snapshot
+        self.__dict__["_record"] = record
+
+    def __getattr__(self, name):
+        snapshot = self.__dict__["_snapshot"]
+        if name in snapshot:
+            return snapshot[name]
+        return getattr(self.record, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SessionUser только для чтения: изменяйте current_user.record")
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self._snapshot["is_active"])
+
+    @property
+    def record(self) -> User:
+        """ORM-объект пользователя (читается при первом обращении)"""
+
+        if self._record is None:
+            self.__dict__["_record"] = db.session.get(User, self._snapshot["id"])
+        return self._record
+
+    def get_id(self) -> str:
+        return str(self._snapshot["id"])
+
+    def role_names(self) -> frozenset:
+        return role_names(self._snapshot["id"])
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.role_names()
+
+    def has_any_role(self, *names: str) -> bool:
+        return not self.role_names().isdisjoint(names)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"SessionUser(username={self._snapshot['username']!r})"
+
+
+def _snapshot(user: User) -> dict:
+    return {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+
+
+def load_session_user(user_id: int):
+    """user_loader: снимок из кеша или один запрос User + роли"""
+
+    snapshot = user_cache.peek(user_id)
+    if snapshot is not None:
+        return SessionUser(snapshot)
+
+    generation = user_cache.generation
+    roles_generation = role_cache.generation
+    user = db.session.scalars(
+        db.select(User)
+        .options(joinedload(User.roles).joinedload(UserRole.role))
+        .where(User.id == user_id)
+    ).unique().first()
+    if user is None:
+        return None
+    remember_roles(user.id, (link.role.name for link in user.roles), roles_generation)
+    snapshot = _snapshot(user)
+    user_cache.put(user.id, snapshot, generation)
+    return SessionUser(snapshot, user)
+
+
+def invalidate_users(user_ids=None) -> None:
+    user_cache.invalidate(user_ids)
+
+
+def _after_flush(session, flush_context) -> None:
+    changed = {
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if not changed:
+        return
+    session.info.setdefault("user_cache_pending", set()).update(changed)
+    invalidate_users(changed)
+
+
+def _after_commit(session) -> None:
+    if "user_cache_pending" in session.info:
+        invalidate_users(session.info.pop("user_cache_pending"))
+
+
+def _after_rollback(session) -> None:
+    if "user_cache_pending" in session.info:
+        invalidate_users(session.info.pop("user_cache_pending"))
+
+
+def init_app(app) -> None:
+    user_cache.ttl = app.config.get("USER_CACHE_TTL", 30)
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
@@ -0,0 +1,51 @@
+// Длинный опрос уведомлений: значок непрочитанных в меню и новые записи списка.
+// Запрос ждёт на сервере не дольше NOTIFY_POLL_TIMEOUT, следующий уходит сразу после ответа.
+(function () {
+  const url = document.currentScript.dataset.pollUrl;
+  const badge = document.getElementById("unread-badge");
+  const list = document.getElementById("notification-list");
+  let after = null;
+  let unread = null;
+
+  function prepend(notification) {
+    const entry = document.createElement("a");
+    entry.className = "list-group-item list-group-item-action" + (notification.is_read ? "" : " list-group-item-primary");
+    entry.href = notification.link || "#";
+    const head = document.createElement("div");
+    head.className = "d-flex justify-content-between";
+    const title = document.createElement("strong");
+    title.textContent = notification.title;
+    const time = document.createElement("small");
+    time.className = "text-muted";
+    time.textContent = (notification.created_at || "").slice(0, 16).replace("T", " ");
+    head.append(title, time);
+    const body = document.createElement("div");
+    body.textContent = notification.body;
+    entry.append(head, body);
+    list.prepend(entry);
+  }
+
+  async function poll() {
+    const params = new URLSearchParams();
+    if (after !== null) params.set("after", after);
+    if (unread !== null) params.set("unread", unread);
+    try {
+      const response = await fetch(url + "?" + params, { credentials: "same-origin" });
+      if (response.redirected) return; // сессия закончилась — на страницу входа не опрашиваем
+      if (!response.ok) throw new Error(response.status);
+      const data = await response.json();
+      if (list && after !== null) data.notifications.forEach(prepend);
+      after = data.last_id;
+      unread = data.unread;
+      if (badge) {
+        badge.textContent = unread;
+        badge.classList.toggle("d-none", unread === 0);
+      }
+    } catch (error) {
+      await new Promise((resolve) => setTimeout(resolve, 5000));
+    }
+    poll();
+  }
+
+  poll();
+})();
@@ -0,0 +1,3 @@
+"""Слой доступа к данным (DAL): запросы к ORM с заранее загруженными связями."""
+from . import items, reference, users  # noqa: F401
+from .pagination import decode_cursor, encode_cursor  # noqa: F401
@@ -0,0 +1,354 @@
+"""Запросы к объявлениям с заранее загруженными связями.
+
+Каждая функция отдаёт представлению готовый граф объектов, чтобы шаблоны
+не порождали ленивых запросов при обходе связей.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import aliased, joinedload, load_only
+
+from ..app import db
+from ..app.models import (
+    Category,
+    CategoryClosure,
+    Comment,
+    Donation,
+    ExchangeRequest,
+    HazardClass,
+    Item,
+    ItemImage,
+    RecyclingMethod,
+    User,
+)
+from .pagination import encode_cursor
+
+ITEM_SORTS = ("date_desc", "price_asc", "price_desc", "relevance")
+ITEM_STATUSES = ("available", "reserved", "sold", "donated", "recycled", "disposed")
+
+
+def primary_image_id_subquery():
+    """Коррелированный подзапрос: id основного (или первого) изображения объявления"""
+
+    return (
+        db.select(ItemImage.id)
+        .where(ItemImage.item_id == Item.id)
+        .order_by(ItemImage.is_primary.desc(), ItemImage.created_at)
+        .limit(1)
+        .correlate(Item)
+        .scalar_subquery()
+    )
+
+
+def item_cards_query():
+    """Строки карточек (Item, имя категории, ItemImage или None) одним запросом"""
+
+    image = aliased(ItemImage)
+    return (
+        db.session.query(Item, Category.name, image)
+        .outerjoin(Category, Item.category_id == Category.id)
+        .outerjoin(image, image.id == primary_image_id_subquery())
+    )
+
+
+def apply_item_filters(query, category_id: Optional[int] = None, status: Optional[str] = None,
+                       condition: Optional[str] = None, is_free: Optional[bool] = None,
+                       is_exchangeable: Optional[bool] = None):
+    """Фильтры списка объявлений (общие для страницы, API, экспорта и фасетов)"""
+
+    if category_id:
+        # Категория вместе с подкатегориями: один подзапрос по таблице замыкания
+        query = query.filter(Item.category_id.in_(
+            db.select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+        ))
+    if status:
+        query = query.filter(Item.status == status)
+    if condition:
+        query = query.filter(Item.condition == condition)
+    # NULL во флагах считается «нет», как и в счётчиках фасетов
+    if is_free is not None:
+        query = query.filter(Item.is_free.is_(True) if is_free else db.func.coalesce(Item.is_free, False).is_(False))
+    if is_exchangeable is not None:
+        query = query.filter(
+            Item.is_exchangeable.is_(True) if is_exchangeable
+            else db.func.coalesce(Item.is_exchangeable, False).is_(False)
+        )
+    return query
+
+
+def export_rows(category_id: Optional[int] = None, status: Optional[str] = None, batch_size: int = 1000,
+                **filters):
+    """Плоские строки для экспорта, читаемые из БД пачками по `batch_size`"""
+
+    query = db.session.query(
+        Item.id,
+        Item.title,
+        Item.description,
+        Category.name.label("category"),
+        Item.price,
+        Item.status,
+        Item.created_at,
+    ).outerjoin(Category, Item.category_id == Category.id)
+    query = apply_item_filters(query, category_id, status, **filters)
+    return query.order_by(Item.created_at.desc(), Item.id.desc()).yield_per(batch_size)
+
+
+# Поле ответа API → (колонка, модель справочника для LEFT JOIN или None)
+API_ITEM_FIELDS = {
+    "id": (Item.id, None),
+    "title": (Item.title, None),
+    "description": (Item.description, None),
+    "condition": (Item.condition, None),
+    "price": (Item.price, None),
+    "is_free": (Item.is_free, None),
+    "is_exchangeable": (Item.is_exchangeable, None),
+    "status": (Item.status, None),
+    "comment_count": (Item.comment_count, None),
+    "category": (Category.name, Category),
+    "hazard_class": (HazardClass.code, HazardClass),
+    "recycling_method": (RecyclingMethod.name, RecyclingMethod),
+    "owner": (User.username, User),
+    "created_at": (Item.created_at, None),
+}
+
+_API_JOINS = {
+    Category: Item.category_id == Category.id,
+    HazardClass: Item.hazard_class_id == HazardClass.id,
+    RecyclingMethod: Item.recycling_method_id == RecyclingMethod.id,
+    User: Item.owner_id == User.id,
+}
+
+
+def api_item_rows_query(fields):
+    """Плоские строки только с запрошенными полями; справочники — через LEFT JOIN.
+
+    id, price и created_at выбираются всегда: из них строится курсор.
+    """
+
+    names = list(dict.fromkeys(["id", "price", "created_at", *fields]))
+    query = db.session.query(*(API_ITEM_FIELDS[name][0].label(name) for name in names))
+    for model in dict.fromkeys(API_ITEM_FIELDS[name][1] for name in names):
+        if model is not None:
+            query = query.outerjoin(model, _API_JOINS[model])
+    return query
+
+
+def feed_rows_select():
+    """Плоские строки карточек ленты главной (без ORM-объектов), Core select"""
+
+    image = aliased(ItemImage)
+    return (
+        db.select(
+            Item.id,
+            Item.title,
+            Item.description,
+            Category.name.label("category_name"),
+            Item.price,
+            Item.is_free,
+            Item.status,
+            Item.created_at,
+            image.file_path.label("image_path"),
+            image.variants.label("image_variants"),
+        )
+        .outerjoin(Category, Item.category_id == Category.id)
+        .outerjoin(image, image.id == primary_image_id_subquery())
+    )
+
+
+def items_cursor(item: Item, sort: str, score: Optional[float] = None) -> str:
+    if sort == "relevance" and score is not None:
+        return encode_cursor([score, item.id])
+    if sort in ("price_asc", "price_desc"):
+        return encode_cursor([item.price, item.id])
+    return encode_cursor([item.created_at.isoformat() if item.created_at else None, item.id])
+
+
+def apply_items_keyset(query, sort: str, cursor: Optional[list], score=None):
+    """Сортировка и условие «строго после курсора» для keyset-пагинации.
+
+    Порядок всегда однозначен за счёт id в конце ключа, поэтому страница
+    читается по индексу без OFFSET и не зависит от размера таблицы.
+    `score` — колонка релевантности полнотекстового поиска (для sort="relevance").
+    """
+
+    if sort == "relevance" and score is not None:
+        query = query.order_by(score.desc(), Item.id.desc())
+        if cursor and isinstance(cursor[0], (int, float)):
+            last_score, last_id = cursor
+            query = query.filter(
+                db.or_(score < last_score, db.and_(score == last_score, Item.id < last_id))
+            )
+        return query
+
+    if sort in ("price_asc", "price_desc"):
+        asc = sort == "price_asc"
+        # MySQL не поддерживает NULLS LAST — эмулируем: сначала не-NULL, затем NULL
+        query = query.order_by(
+            Item.price.is_(None),
+            Item.price.asc() if asc else Item.price.desc(),
+            Item.id.asc() if asc else Item.id.desc(),
+        )
+        if cursor:
+            price, last_id = cursor
+            after_id = Item.id > last_id if asc else Item.id < last_id
+            if price is None:
+                query = query.filter(Item.price.is_(None), after_id)
+            else:
+                beyond = Item.price > price if asc else Item.price < price
+                query = query.filter(
+                    db.or_(Item.price.is_(None), beyond, db.and_(Item.price == price, after_id))
+                )
+        return query
+
+    query = query.order_by(Item.created_at.desc(), Item.id.desc())
+    if not cursor:
+        return query
+    last_id = cursor[1]
+    # created_at может быть NULL (старые строки). При DESC PostgreSQL ставит NULL
+    # первыми, SQLite и MySQL — последними; курсор с NULL в ключе тоже должен
+    # продвигать страницу, иначе клиент по ссылкам next снова получит первую.
+    nulls_first = db.engine.dialect.name == "postgresql"
+    undated_after = db.and_(Item.created_at.is_(None), Item.id < last_id)
+    if cursor[0] is None:
+        if nulls_first:
+            return query.filter(db.or_(undated_after, Item.created_at.isnot(None)))
+        return query.filter(undated_after)
+    try:
+        created_at = datetime.fromisoformat(cursor[0])
+    except (TypeError, ValueError):
+        return query
+    after = db.or_(
+        Item.created_at < created_at,
+        db.and_(Item.created_at == created_at, Item.id < last_id),
+    )
+    if not nulls_first:
+        after = db.or_(after, Item.created_at.is_(None))
+    return query.filter(after)
+
+
+def get_item_detail_or_404(item_id: int) -> Item:
+    """Объявление вместе со справочниками и владельцем (один запрос с JOIN)"""
+
+    return (
+        Item.query.options(
+            joinedload(Item.category),
+            joinedload(Item.hazard_class),
+            joinedload(Item.recycling_method),
+            joinedload(Item.owner),
+        )
+        .filter(Item.id == item_id)
+        .first_or_404()
+    )
+
+
+def item_images(item_id: int) -> list:
+    return (
+        ItemImage.query.filter_by(item_id=item_id)
+        .order_by(ItemImage.is_primary.desc(), ItemImage.created_at)
+        .all()
+    )
+
+
+def item_comments(item_id: int, cursor: Optional[list] = None, limit: int = 20) -> tuple:
+    """Страница неудалённых комментариев с авторами, новые первыми.
+
+    Возвращает (комментарии, курсор следующей страницы или None); порядок
+    (created_at, id) читается по индексу ix_comments_item_deleted_created.
+    """
+
+    query = (
+        Comment.query.options(joinedload(Comment.user))
+        .filter_by(item_id=item_id, is_deleted=False)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+    )
+    created_at = None
+    if cursor:
+        try:
+            created_at = datetime.fromisoformat(cursor[0])
+        except (TypeError, ValueError):
+            pass  # повреждённый курсор — первая страница, как у decode_cursor
+    if created_at is not None:
+        last_id = cursor[1]
+        query = query.filter(
+            db.or_(Comment.created_at < created_at,
+                   db.and_(Comment.created_at == created_at, Comment.id < last_id))
+        )
+    comments = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor([comments[-1].created_at.isoformat(), comments[-1].id])
+    return comments, next_cursor
+
+
+def pending_requests(item_id: int) -> list:
+    """Входящие заявки на вещь с заявителем и предложенной вещью"""
+
+    return (
+        ExchangeRequest.query.options(
+            joinedload(ExchangeRequest.requester),
+            joinedload(ExchangeRequest.offered_item).load_only(Item.id, Item.title),
+        )
+        .filter_by(target_item_id=item_id, status="pending")
+        .order_by(ExchangeRequest.created_at)
+        .all()
+    )
+
+
+def owner_item_choices(owner_id: int) -> list:
+    """Пары (id, title) для выбора своей вещи в форме обмена"""
+
+    rows = (
+        db.session.query(Item.id, Item.title)
+        .filter(Item.owner_id == owner_id)
+        .order_by(Item.title)
+        .all()
+    )
+    return [(row.id, row.title) for row in rows]
+
+
+def owner_items(owner_id: int) -> list:
+    return (
+        Item.query.options(load_only(Item.id, Item.title, Item.status))
+        .filter_by(owner_id=owner_id)
+        .order_by(Item.created_at.desc())
+        .all()
+    )
+
+
+def user_exchange_requests(user_id: int) -> list:
+    return (
+        ExchangeRequest.query.filter_by(requester_id=user_id)
+        .order_by(ExchangeRequest.created_at.desc())
+        .all()
+    )
+
+
+def user_donations(user_id: int) -> list:
+    return Donation.query.filter_by(donor_id=user_id).order_by(Donation.created_at.desc()).all()
+
+
+def insert_items(rows: list) -> list:
+    """Вставляет объявления пачкой; возвращает id в порядке `rows`.
+
+    В PostgreSQL и SQLite (3.35+) это INSERT ... RETURNING с гарантированным
+    порядком (insertmanyvalues). В MySQL RETURNING нет, поэтому там строки
+    вставляются по одной, но в той же транзакции, без лишних commit.
+    """
+
+    table = Item.__table__
+    # Через сессию, а не её соединение: вставку видят события do_orm_execute (services/facets.py)
+    if db.session.connection().dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = db.session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        )
+        return [row.id for row in result]
+    return [db.session.execute(insert(table), row).inserted_primary_key[0] for row in rows]
+
+
+def item_states(item_ids) -> dict:
+    """{id: (owner_id, status)} для существующих объявлений из `item_ids`"""
+
+    rows = db.session.execute(db.select(Item.id, Item.owner_id, Item.status).where(Item.id.in_(item_ids)))
+    return {item_id: (owner_id, status) for item_id, owner_id, status in rows}
@@ -0,0 +1,87 @@
+"""Справочные данные через кеш: категории и текст справки.
+
+В кеш кладутся неизменяемые кортежи, а не ORM-объекты: их можно отдавать
+в любой сессии и в любой воркер (при общем бэкенде). Изменения Category и
+SystemSetting сбрасывают и сами справочники, и зависящие от них страницы
+событиями сессии — сразу после flush и повторно после commit, поэтому
+edit_help, seed_data и ``flask bootstrap`` не требуют ручной инвалидации.
+"""
+from collections import namedtuple
+
+from sqlalchemy import event
+
+from ..app import db
+from ..app.models import Category, SystemSetting
+from ..services.cache import cache, page_key
+
+CategoryRef = namedtuple("CategoryRef", "id name description parent_id")
+
+CATEGORIES_KEY = "ref:categories"
+HELP_TEXT_KEY = "ref:help_text"
+
+# Модель → ключи кеша, которые нужно сбросить при её изменении
+_DEPENDENT_KEYS = {
+    Category: (CATEGORIES_KEY, page_key("main.categories_page")),
+    SystemSetting: (HELP_TEXT_KEY, page_key("main.help_page")),
+}
+
+
+def categories() -> tuple:
+    """Все категории (CategoryRef) в порядке id"""
+
+    def load():
+        rows = db.session.execute(
+            db.select(Category.id, Category.name, Category.description, Category.parent_id).order_by(Category.id)
+        ).all()
+        return tuple(CategoryRef(*row) for row in rows)
+
+    return cache.get_or_set(CATEGORIES_KEY, load)
+
+
+def category_choices() -> list:
+    """Пары (id, name) для SelectField"""
+
+    return [(c.id, c.name) for c in categories()]
+
+
+def help_text():
+    def load():
+        return db.session.scalar(db.select(SystemSetting.value).where(SystemSetting.key == "help_text"))
+
+    return cache.get_or_set(HELP_TEXT_KEY, load)
+
+
+def _changed_keys(session) -> set:
+    keys = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        keys.update(_DEPENDENT_KEYS.get(type(obj), ()))
+    return keys
+
+
+def _after_flush(session, flush_context) -> None:
+    keys = _changed_keys(session)
+    if keys:
+        session.info.setdefault("reference_cache_pending", set()).update(keys)
+        cache.delete(*keys)
+
+
+def _after_commit(session) -> None:
+    keys = session.info.pop("reference_cache_pending", None)
+    if keys:
+        cache.delete(*keys)
+
+
+def _after_rollback(session) -> None:
+    keys = session.info.pop("reference_cache_pending", None)
+    if keys:
+        cache.delete(*keys)
+
+
+def init_app(app) -> None:
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
@@ -0,0 +1,51 @@
+"""Помощники для тестов: подсчёт SQL-запросов и бюджет на запрос.
+
+Пример::
+
+    with app.app_context(), query_budget(4):
+        client.get("/items")
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from ..app import db
+
+
+class QueryCounter:
+    """Считает SQL-выражения, выполненные движком внутри блока with"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: list = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def query_budget(limit: int, engine=None):
+    """Падает с AssertionError, если в блоке выполнено больше `limit` SQL-запросов.
+
+    Без явного `engine` берётся движок текущего приложения (нужен app context).
+    """
+
+    counter = QueryCounter(engine if engine is not None else db.engine)
+    with counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {n}. {stmt}" for n, stmt in enumerate(counter.statements, 1))
+        raise AssertionError(
+            f"Превышен бюджет SQL-запросов: {counter.count} > {limit}\n{listing}"
+        )
@@ -0,0 +1 @@
+"""Сервисный слой: бизнес-логика и фоновые обработчики."""
@@ -0,0 +1,260 @@
+"""Журнал действий (ActivityLog) без задержки запросов.
+
+``activity_log.record(...)`` только кладёт событие в ограниченный буфер
+процесса и сразу возвращается. Фоновый поток ActivityWriter сбрасывает
+буфер пачками — один executemany на пачку — когда накопилось
+ACTIVITY_FLUSH_SIZE событий или прошло ACTIVITY_FLUSH_INTERVAL секунд с
+первого несброшенного. При остановке процесса (atexit) буфер дописывается.
+
+Буфер ограничен ACTIVITY_BUFFER_SIZE: если БД не успевает или недоступна,
+новые события отбрасываются, а их число попадает в журнал отдельным
+событием ``activity.dropped`` — запросы при этом не ждут.
+
+Время события фиксируется в момент вызова, а не записи. Журнал читается
+только в пределах временного окна (индексы по created_at), старые записи
+удаляются пачками: ``flask activity-prune``.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+import click
+from flask import has_request_context, request
+from sqlalchemy import delete, insert
+
+from ..app import db
+from ..app.models import ActivityLog
+from ..repositories import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Наибольшее окно одного запроса к журналу
+MAX_QUERY_WINDOW = timedelta(days=31)
+
+
+class ActivityWriter:
+    """Буфер событий и фоновая запись (app.extensions["activity_log"])"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._buffer: deque = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._dropped = 0
+        self._first_at = None  # monotonic-время первого несброшенного события
+        self.written = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.extensions["activity_log"] = self
+
+        @app.cli.command("activity-prune")
+        @click.option("--days", type=int, default=None, help="Старше скольких дней (по умолчанию ACTIVITY_RETENTION_DAYS)")
+        @click.option("--batch", type=int, default=5000, help="Строк в одном DELETE")
+        def activity_prune_command(days, batch):
+            """Удалить старые записи журнала действий."""
+
+            total = prune(days if days is not None else app.config.get("ACTIVITY_RETENTION_DAYS", 180), batch)
+            click.echo(f"[OK] Удалено записей журнала: {total}.")
+
+    def _config(self, name: str, default):
+        return self.app.config.get(name, default)
+
+    def record(self, event_type: str, user_id: Optional[int] = None, **payload) -> bool:
+        """Ставит событие в буфер; False — если буфер переполнен и событие отброшено"""
+
+        if has_request_context() and "ip" not in payload:
+            payload["ip"] = request.remote_addr
+        now = datetime.utcnow()
+        row = {"user_id": user_id, "event_type": event_type, "payload": payload or None,
+               "created_at": now, "updated_at": now}
+        with self._condition:
+            if len(self._buffer) >= self._config("ACTIVITY_BUFFER_SIZE", 10000):
+                self._dropped += 1
+                return False
+            first = not self._buffer
+            if first:
+                self._first_at = time.monotonic()
+            self._buffer.append(row)
+            # Первое событие — поток заводит таймер; полный буфер — пишет сразу
+            if first or len(self._buffer) >= self._config("ACTIVITY_FLUSH_SIZE", 500):
+                self._condition.notify()
+        if self._thread is None:
+            self.start()
+        return True
+
+    def start(self) -> None:
+        # Поток стартует при первом событии — в воркере gunicorn после fork
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 10) -> None:
+        """Останавливает поток и дописывает буфер"""
+
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._stop = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def _take(self, limit: int) -> tuple:
+        """(события из начала буфера, сколько отброшенных учесть в этой пачке)"""
+
+        with self._condition:
+            rows = [self._buffer.popleft() for _ in range(min(limit, len(self._buffer)))]
+            self._first_at = time.monotonic() if self._buffer else None
+            return rows, self._dropped
+
+    def _give_back(self, rows: list) -> None:
+        # Неудачная пачка возвращается в начало буфера, пока есть место
+        with self._condition:
+            room = max(self._config("ACTIVITY_BUFFER_SIZE", 10000) - len(self._buffer), 0)
+            self._dropped += max(len(rows) - room, 0)
+            self._buffer.extendleft(reversed(rows[:room]))
+            # Таймер заново: повтор — не раньше чем через ACTIVITY_FLUSH_INTERVAL
+            self._first_at = time.monotonic() if self._buffer else None
+
+    def flush(self) -> int:
+        """Записывает всё, что накоплено; возвращает число записанных событий"""
+
+        total = 0
+        batch_size = self._config("ACTIVITY_FLUSH_SIZE", 500)
+        while True:
+            events, dropped = self._take(batch_size)
+            if not events and not dropped:
+                return total
+            rows = list(events)
+            if dropped:
+                now = datetime.utcnow()
+                rows.append({"user_id": None, "event_type": "activity.dropped",
+                             "payload": {"count": dropped}, "created_at": now, "updated_at": now})
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(ActivityLog.__table__), rows)
+                    db.session.commit()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Не удалось записать журнал действий (%s событий)", len(rows))
+                if events:
+                    self._give_back(events)
+                return total
+            # Счётчик отброшенных уменьшается только после commit: неудачная запись его не теряет,
+            # а отброшенные за время записи остаются на следующую пачку
+            with self._condition:
+                self._dropped -= dropped
+            total += len(rows)
+            self.written += len(rows)
+
+    def _run(self) -> None:
+        interval = self._config("ACTIVITY_FLUSH_INTERVAL", 2)
+        size = self._config("ACTIVITY_FLUSH_SIZE", 500)
+        while True:
+            with self._condition:
+                while not self._stop:
+                    if len(self._buffer) >= size:
+                        break
+                    if self._first_at is not None:
+                        remaining = self._first_at + interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._stop:
+                    return
+            if not self.flush():
+                # БД недоступна — не крутимся впустую
+                with self._condition:
+                    self._condition.wait(interval)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"buffered": len(self._buffer), "dropped": self._dropped, "written": self.written}
+
+
+def _parse_position(cursor: Optional[str]) -> Optional[tuple]:
+    """(created_at, id) из курсора; None — первая страница (нет курсора или он повреждён)"""
+
+    position = decode_cursor(cursor)
+    if position is None or not isinstance(position[0], str) or isinstance(position[1], bool):
+        return None
+    try:
+        return datetime.fromisoformat(position[0]), position[1]
+    except ValueError:
+        return None
+
+
+def query(since: datetime, until: datetime, event_type: Optional[str] = None, user_id: Optional[int] = None,
+          cursor: Optional[str] = None, limit: int = 100) -> tuple:
+    """Записи журнала за окно [since, until), новые первыми.
+
+    Возвращает (список словарей, курсор следующей страницы или None).
+    Окно не шире MAX_QUERY_WINDOW — запрос всегда ограничен диапазоном по
+    индексированному created_at. Повреждённый курсор — первая страница.
+    """
+
+    if until - since > MAX_QUERY_WINDOW:
+        raise ValueError(f"Окно запроса не больше {MAX_QUERY_WINDOW.days} дней")
+    criteria = [ActivityLog.created_at >= since, ActivityLog.created_at < until]
+    if event_type:
+        criteria.append(ActivityLog.event_type == event_type)
+    if user_id is not None:
+        criteria.append(ActivityLog.user_id == user_id)
+    position = _parse_position(cursor)
+    if position is not None:
+        created_at, last_id = position
+        criteria.append(
+            (ActivityLog.created_at < created_at)
+            | ((ActivityLog.created_at == created_at) & (ActivityLog.id < last_id))
+        )
+    rows = db.session.execute(
+        db.select(ActivityLog.id, ActivityLog.created_at, ActivityLog.user_id,
+                  ActivityLog.event_type, ActivityLog.payload)
+        .where(*criteria)
+        .order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].created_at.isoformat(), rows[-1].id])
+    return [
+        {"id": row.id, "created_at": row.created_at.isoformat(), "user_id": row.user_id,
+         "event_type": row.event_type, "payload": row.payload}
+        for row in rows
+    ], next_cursor
+
+
+def prune(days: int, batch_size: int = 5000) -> int:
+    """Удаляет записи старше `days` дней пачками; возвращает их число"""
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(ActivityLog.id).where(ActivityLog.created_at < cutoff).limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.session.execute(
+            delete(ActivityLog).where(ActivityLog.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += len(ids)
+
+
+activity_log = ActivityWriter()
@@ -0,0 +1,269 @@
+"""Кеш отрендеренных страниц и справочных данных.
+
+Бэкенд выбирается настройкой CACHE_TYPE:
+
+- ``memory`` — LRU с TTL в памяти процесса (по умолчанию); инвалидация
+  действует только в своём воркере, остальные увидят изменения через TTL;
+- ``redis`` — общий кеш для всех воркеров (CACHE_URL), значения хранятся
+  через pickle. Нужен пакет ``redis``; в тестах вместо сервера можно
+  передать совместимый клиент, например ``RedisCache(client=FakeRedis())``;
+- ``null`` — кеш выключен.
+
+``cache.replace(key, ожидаемое, новое)`` — compare-and-set для значений,
+которые обновляются чтением-изменением-записью (лента главной): в Redis
+через WATCH, в памяти — под блокировкой; null-бэкенд всегда сообщает о
+конфликте.
+
+Фасад ``cache`` считает попадания и промахи по пространствам имён
+(часть ключа до двоеточия: ``page``, ``ref``...), агрегаты отдаёт
+/api/admin/cache.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import request, session
+from flask_login import current_user
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """Интерфейс бэкенда: значения — любые picklable-объекты"""
+
+    name = "null"
+
+    def get(self, key: str):
+        return _MISSING
+
+    def set(self, key: str, value, ttl: int) -> None:
+        pass
+
+    def replace(self, key: str, expected, value, ttl: int) -> bool:
+        """Compare-and-set: пишет `value`, только если в кеше всё ещё `expected`"""
+
+        return False
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """LRU с TTL в памяти процесса (потокобезопасный)"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # key → (истекает, значение)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def replace(self, key: str, expected, value, ttl: int) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic() or entry[1] != expected:
+                return False
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """Общий кеш в Redis; `client` позволяет подставить совместимую заглушку"""
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "ecobg:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:  # pragma: no cover - зависит от окружения
+                raise RuntimeError("CACHE_TYPE=redis требует пакет redis (pip install redis)") from exc
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key: str, value, ttl: int) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def replace(self, key: str, expected, value, ttl: int) -> bool:
+        from redis.exceptions import WatchError
+
+        name = self.prefix + key
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(name)
+                raw = pipe.get(name)
+                if raw is None or pickle.loads(raw) != expected:
+                    return False
+                pipe.multi()
+                pipe.set(name, pickle.dumps(value), ex=max(int(ttl), 1))
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class Cache:
+    """Фасад кеша с метриками (app.extensions["cache"])"""
+
+    def __init__(self):
+        self.backend: CacheBackend = MemoryCache()
+        self.default_ttl = 300
+        self._stats: dict = {}
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app, backend: Optional[CacheBackend] = None) -> None:
+        cfg = app.config
+        if backend is None:
+            kind = cfg.get("CACHE_TYPE", "memory")
+            if kind == "redis":
+                backend = RedisCache(cfg.get("CACHE_URL"))
+            elif kind == "null":
+                backend = CacheBackend()
+            else:
+                backend = MemoryCache(cfg.get("CACHE_MAX_ENTRIES", 1024))
+        self.backend = backend
+        self.default_ttl = cfg.get("CACHE_DEFAULT_TTL", 300)
+        app.extensions["cache"] = self
+
+    def _count(self, key: str, field: str) -> None:
+        namespace = key.split(":", 1)[0]
+        with self._stats_lock:
+            stats = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "sets": 0, "deletes": 0})
+            stats[field] += 1
+
+    def get(self, key: str, default=None):
+        value = self.backend.get(key)
+        if value is _MISSING:
+            self._count(key, "misses")
+            return default
+        self._count(key, "hits")
+        return value
+
+    def set(self, key: str, value, ttl: Optional[int] = None) -> None:
+        self._count(key, "sets")
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def get_or_set(self, key: str, factory: Callable, ttl: Optional[int] = None):
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self._count(key, "hits")
+            return value
+        self._count(key, "misses")
+        value = factory()
+        self.set(key, value, ttl)
+        return value
+
+    def replace(self, key: str, expected, value, ttl: Optional[int] = None) -> bool:
+        """Заменяет значение, если его никто не успел изменить; False — конфликт или ключа нет"""
+
+        replaced = self.backend.replace(key, expected, value, ttl or self.default_ttl)
+        if replaced:
+            self._count(key, "sets")
+        return replaced
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._count(key, "deletes")
+        self.backend.delete(*keys)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            namespaces = {name: dict(values) for name, values in self._stats.items()}
+        for values in namespaces.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_ratio"] = round(values["hits"] / lookups, 3) if lookups else None
+        return {"backend": self.backend.name, "default_ttl": self.default_ttl, "namespaces": namespaces}
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats.clear()
+
+
+cache = Cache()
+
+
+def page_key(endpoint: str) -> str:
+    return f"page:{endpoint}"
+
+
+def cached_page(ttl: Optional[int] = None):
+    """Кеширует HTML страницы для анонимных посетителей.
+
+    Страница зависит от current_user (меню в base.html) и flash-сообщений,
+    поэтому авторизованным, запросам с flash и с параметрами строки
+    запроса всегда отдаётся свежий рендер.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if (
+                request.method != "GET"
+                or request.args
+                or current_user.is_authenticated
+                or session.get("_flashes")
+            ):
+                return view(*args, **kwargs)
+            key = page_key(request.endpoint)
+            body = cache.get(key)
+            if body is None:
+                body = view(*args, **kwargs)
+                if not isinstance(body, str):
+                    return body
+                cache.set(key, body, ttl)
+            return body
+
+        return wrapped
+
+    return decorator
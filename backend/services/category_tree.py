@@ -0,0 +1,243 @@
+"""Дерево категорий: таблица замыкания и счётчики объявлений.
+
+category_closure хранит все пары (предок, потомок), поэтому «объявления
+категории со всеми подкатегориями» — один запрос по индексу:
+
+    items.category_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = :id)
+
+Таблица и счётчики поддерживаются событием сессии after_flush в той же
+транзакции: новая категория получает пути от всех предков родителя,
+перенос (смена parent_id) перевешивает всё поддерево одним DELETE и одним
+INSERT ... SELECT. Categories.item_count — число объявлений прямо в
+категории: ORM-вставка, удаление и смена категории объявления меняют его
+на ±1, массовые вставки мимо ORM вызывают ``count_inserted``. Итог по
+поддереву — сумма счётчиков потомков по замыканию, без COUNT(*) по items;
+дерево со счётчиками кешируется и сбрасывается после commit.
+
+Полная перестройка (после ручных правок БД): ``flask categories-rebuild``.
+"""
+from collections import Counter, namedtuple
+
+import click
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+
+from ..app import db
+from ..app.models import Category, CategoryClosure, Item
+from .cache import cache, page_key
+
+CategoryNode = namedtuple("CategoryNode", "id name description parent_id depth item_count total_count")
+
+CATEGORY_TREE_KEY = "ref:category_tree"
+
+
+def _closure():
+    return CategoryClosure.__table__
+
+
+def subtree_ids(category_id: int):
+    """Подзапрос id категории и всех её потомков"""
+
+    closure = _closure()
+    return select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+
+
+def tree() -> tuple:
+    """Все категории (CategoryNode) в порядке обхода дерева: родитель перед детьми, дети по имени"""
+
+    def load():
+        categories = _categories()
+        closure = _closure()
+        totals = dict(db.session.execute(
+            select(closure.c.ancestor_id, func.sum(Category.item_count))
+            .join(Category, Category.id == closure.c.descendant_id)
+            .group_by(closure.c.ancestor_id)
+        ).all())
+        children: dict = {}
+        for row in sorted(categories.values(), key=lambda row: (row.name.lower(), row.id)):
+            parent_id = row.parent_id if row.parent_id in categories else None
+            children.setdefault(parent_id, []).append(row)
+        nodes = []
+        stack = [(row, 0) for row in reversed(children.get(None, []))]
+        while stack:
+            row, depth = stack.pop()
+            nodes.append(CategoryNode(row.id, row.name, row.description, row.parent_id, depth,
+                                      row.item_count, int(totals.get(row.id) or 0)))
+            stack.extend((child, depth + 1) for child in reversed(children.get(row.id, [])))
+        return tuple(nodes)
+
+    return cache.get_or_set(CATEGORY_TREE_KEY, load)
+
+
+def _categories() -> dict:
+    rows = db.session.execute(
+        select(Category.id, Category.name, Category.description, Category.parent_id, Category.item_count)
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def adjust_item_counts(deltas: dict, session=None) -> None:
+    """Прибавляет к Category.item_count изменения {category_id: ±n} в транзакции сессии"""
+
+    session = session or db.session
+    changes = [{"category": category_id, "delta": delta}
+               for category_id, delta in deltas.items() if category_id is not None and delta]
+    if not changes:
+        return
+    table = Category.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c.id == db.bindparam("category"))
+        .values(item_count=table.c.item_count + db.bindparam("delta")),
+        changes,
+    )
+    session.info["category_tree_pending"] = True
+
+
+def count_inserted(rows: list) -> None:
+    """Учитывает в счётчиках объявления, вставленные мимо ORM (строки с category_id)"""
+
+    adjust_item_counts(Counter(row.get("category_id") for row in rows))
+
+
+def _add_node(connection, category_id: int, parent_id) -> None:
+    closure = _closure()
+    connection.execute(insert(closure).values(ancestor_id=category_id, descendant_id=category_id, depth=0))
+    if parent_id is not None:
+        connection.execute(insert(closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(closure.c.ancestor_id, db.literal(category_id), closure.c.depth + 1)
+            .where(closure.c.descendant_id == parent_id),
+        ))
+
+
+def _move_node(connection, category_id: int, parent_id) -> None:
+    """Перевешивает поддерево `category_id` под `parent_id` (None — в корень)"""
+
+    closure = _closure()
+    # Поддерево выбирается заранее: MySQL не разрешает подзапрос к изменяемой таблице
+    subtree = connection.execute(
+        select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+    ).scalars().all()
+    if parent_id in subtree:
+        raise ValueError("Категорию нельзя перенести в её же подкатегорию")
+    # Пути от прежних внешних предков к узлам поддерева
+    connection.execute(delete(closure).where(
+        closure.c.descendant_id.in_(subtree),
+        closure.c.ancestor_id.not_in(subtree),
+    ))
+    if parent_id is None:
+        return
+    above, below = closure.alias("above"), closure.alias("below")
+    connection.execute(insert(closure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+        .select_from(above.join(below, db.true()))  # все предки нового родителя × всё поддерево
+        .where(above.c.descendant_id == parent_id, below.c.ancestor_id == category_id),
+    ))
+
+
+def rebuild(connection) -> int:
+    """Пересчитывает замыкание по parent_id и счётчики по items; возвращает число категорий"""
+
+    parents = dict(connection.execute(select(Category.id, Category.parent_id)).all())
+    rows = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node is not None and node in parents and node not in seen:
+            seen.add(node)
+            rows.append({"ancestor_id": node, "descendant_id": category_id, "depth": depth})
+            node, depth = parents[node], depth + 1
+    closure = _closure()
+    connection.execute(delete(closure))
+    if rows:
+        connection.execute(insert(closure), rows)
+    categories, items = Category.__table__, Item.__table__
+    connection.execute(update(categories).values(item_count=(
+        select(func.count()).select_from(items).where(items.c.category_id == categories.c.id).scalar_subquery()
+    )))
+    return len(parents)
+
+
+def _after_flush(session, flush_context) -> None:
+    added, moved, removed = [], [], []
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, Category):
+            added.append(obj)
+        elif isinstance(obj, Item):
+            deltas[obj.category_id] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Category):
+            history = inspect(obj).attrs.parent_id.history
+            if history.has_changes():
+                moved.append(obj)
+            else:
+                session.info["category_tree_pending"] = True  # переименование и т.п.
+        elif isinstance(obj, Item):
+            history = inspect(obj).attrs.category_id.history
+            if history.has_changes():
+                for old in history.deleted:
+                    deltas[old] -= 1
+                for new in history.added:
+                    deltas[new] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Category):
+            removed.append(obj.id)
+        elif isinstance(obj, Item):
+            deltas[obj.category_id] -= 1
+    if not (added or moved or removed or deltas):
+        return
+
+    connection = session.connection()
+    closure = _closure()
+    if removed:
+        # В SQLite внешние ключи (ON DELETE CASCADE) обычно выключены
+        connection.execute(delete(closure).where(
+            closure.c.ancestor_id.in_(removed) | closure.c.descendant_id.in_(removed)
+        ))
+    # Родители раньше детей: путь ребёнка строится из путей родителя
+    pending = {obj.id: obj for obj in added}
+    done = set()
+
+    def add(obj):
+        if obj.id in done:
+            return
+        if obj.parent_id in pending:
+            add(pending[obj.parent_id])
+        _add_node(connection, obj.id, obj.parent_id)
+        done.add(obj.id)
+
+    for obj in added:
+        add(obj)
+    for obj in moved:
+        _move_node(connection, obj.id, obj.parent_id)
+    adjust_item_counts(deltas, session)
+    session.info["category_tree_pending"] = True
+
+
+def _after_commit(session) -> None:
+    if session.info.pop("category_tree_pending", None):
+        cache.delete(CATEGORY_TREE_KEY, page_key("main.categories_page"))
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("category_tree_pending", None)
+
+
+def init_app(app) -> None:
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+    @app.cli.command("categories-rebuild")
+    def categories_rebuild_command():
+        """Пересчитать дерево категорий и счётчики объявлений."""
+
+        with db.engine.begin() as connection:
+            total = rebuild(connection)
+        cache.delete(CATEGORY_TREE_KEY, page_key("main.categories_page"))
+        click.echo(f"[OK] Дерево категорий перестроено: {total} категорий.")
@@ -0,0 +1,128 @@
+"""Комментарии под объявлениями: счётчик на Item и очистка удалённых.
+
+items.comment_count — число неудалённых комментариев. Он меняется
+атомарным UPDATE в той же транзакции, что и сам комментарий, поэтому
+карточки показывают число без COUNT(*) по comments. Удаление мягкое и
+условное (``is_deleted = false`` в WHERE): повторное нажатие «Удалить» не
+уменьшит счётчик дважды.
+
+Мягко удалённые комментарии старше COMMENTS_PURGE_AGE дней удаляются
+пачками — фоновым потоком раз в COMMENTS_PURGE_INTERVAL секунд (0 —
+только вручную) и командой ``flask comments-purge``.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import click
+from sqlalchemy import delete, update
+
+from ..app import db
+from ..app.models import Comment, Item
+
+logger = logging.getLogger(__name__)
+
+_settings = {"purge_interval": 3600, "purge_age_days": 30}
+_purger = {"thread": None, "lock": threading.Lock(), "stop": threading.Event()}
+
+
+def _adjust_count(item_id: int, delta: int) -> None:
+    # Через соединение сессии, мимо событий ORM: счётчик — не правка объявления
+    # (updated_at не трогаем, ленту и фасеты не сбрасываем)
+    items = Item.__table__
+    db.session.connection().execute(
+        update(items)
+        .where(items.c.id == item_id)
+        .values(comment_count=items.c.comment_count + delta, updated_at=items.c.updated_at)
+    )
+
+
+def add(item_id: int, user_id: int, text: str) -> Comment:
+    """Добавляет комментарий и увеличивает счётчик объявления (без commit)"""
+
+    comment = Comment(item_id=item_id, user_id=user_id, text=text)
+    db.session.add(comment)
+    _adjust_count(item_id, 1)
+    return comment
+
+
+def soft_delete(comment: Comment) -> bool:
+    """Помечает комментарий удалённым (без commit); False — если он уже удалён"""
+
+    changed = db.session.execute(
+        update(Comment)
+        .where(Comment.id == comment.id, Comment.is_deleted.is_(False))
+        .values(is_deleted=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        _adjust_count(comment.item_id, -1)
+    return bool(changed)
+
+
+def purge_deleted(days: Optional[int] = None, batch_size: int = 1000) -> int:
+    """Удаляет мягко удалённые комментарии старше `days` дней пачками; возвращает их число"""
+
+    cutoff = datetime.utcnow() - timedelta(days=_settings["purge_age_days"] if days is None else days)
+    total = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(Comment.id)
+            .where(Comment.is_deleted.is_(True), Comment.updated_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.session.execute(
+            delete(Comment).where(Comment.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += len(ids)
+
+
+def _run_purge(app) -> None:
+    while not _purger["stop"].wait(_settings["purge_interval"]):
+        try:
+            with app.app_context():
+                removed = purge_deleted()
+                db.session.remove()
+            if removed:
+                logger.info("Очистка комментариев: удалено %s", removed)
+        except Exception:
+            logger.exception("Сбой очистки удалённых комментариев")
+
+
+def start_purge(app) -> None:
+    with _purger["lock"]:
+        if _purger["thread"] is not None:
+            return
+        _purger["stop"].clear()
+        _purger["thread"] = threading.Thread(target=_run_purge, args=(app,), name="comments-purge", daemon=True)
+        _purger["thread"].start()
+
+
+def stop_purge() -> None:
+    _purger["stop"].set()
+    with _purger["lock"]:
+        _purger["thread"] = None
+
+
+def init_app(app) -> None:
+    _settings["purge_interval"] = app.config.get("COMMENTS_PURGE_INTERVAL", 3600)
+    _settings["purge_age_days"] = app.config.get("COMMENTS_PURGE_AGE", 30)
+
+    @app.before_request
+    def _start_comments_purge():
+        # Поток стартует с первым запросом — в воркере gunicorn после fork
+        if _purger["thread"] is None and _settings["purge_interval"] > 0:
+            start_purge(app)
+
+    @app.cli.command("comments-purge")
+    @click.option("--days", type=int, default=None, help="Старше скольких дней (по умолчанию COMMENTS_PURGE_AGE)")
+    @click.option("--batch", type=int, default=1000, help="Строк в одном DELETE")
+    def comments_purge_command(days, batch):
+        """Удалить мягко удалённые комментарии."""
+
+        total = purge_deleted(days, batch)
+        click.echo(f"[OK] Удалено комментариев: {total}.")
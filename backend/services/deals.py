@@ -0,0 +1,346 @@
+"""Сделки с вещами: покупка, обмен, дарение, переработка.
+
+Переходы статусов заданы таблицами ITEM_TRANSITIONS и REQUEST_TRANSITIONS:
+действие → (допустимые исходные статусы, новый статус). Каждый переход
+выполняется условным UPDATE («compare-and-set»):
+
+    UPDATE items SET status = 'sold' ... WHERE id = :id AND status IN ('available')
+
+Если строку успел изменить параллельный запрос, UPDATE не затронет ни
+одной строки — сделка откатывается с DealError, а не перетирает чужой
+результат. Блокировки держатся только внутри короткой транзакции: в
+PostgreSQL второй UPDATE ждёт фиксации первого и перепроверяет условие, в
+SQLite писатели сериализуются блокировкой базы.
+
+Повторную ожидающую заявку на ту же вещь не даёт создать частичный
+уникальный индекс uq_exchange_requests_pending (PostgreSQL, SQLite):
+проверка перед INSERT даёт понятное сообщение, а гонку двух запросов
+ловит индекс.
+
+Конкурирующие заявки (на ту же вещь или с теми же предложенными вещами)
+отклоняются одним массовым UPDATE. Уведомления участникам (notifications.py)
+пишутся в той же транзакции. Каждая функция сама фиксирует транзакцию;
+UPDATE идут мимо ORM-объектов, поэтому лента главной обновляется явно
+после commit.
+"""
+from typing import Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from ..app import db
+from ..app.models import Donation, ExchangeRequest, Item, RecyclingOperation
+from . import feed, notifications
+from .activity import activity_log
+
+# действие → (из каких статусов, в какой)
+ITEM_TRANSITIONS = {
+    "sell": (("available",), "sold"),
+    "reserve": (("available",), "reserved"),
+    "donate": (("available", "reserved"), "donated"),
+    "recycle": (("available", "reserved", "donated"), "recycled"),
+}
+REQUEST_TRANSITIONS = {
+    "accept": (("pending",), "accepted"),
+    "decline": (("pending",), "declined"),
+}
+
+# На вещь в этих статусах можно отправлять заявки
+OPEN_ITEM_STATUSES = ITEM_TRANSITIONS["sell"][0]
+
+# Новый статус → действие (смена статусов через PATCH /api/items/batch)
+STATUS_ACTIONS = {target: action for action, (_, target) in ITEM_TRANSITIONS.items()}
+
+
+class DealError(Exception):
+    """Сделка невозможна; текст исключения можно показать пользователю"""
+
+
+class DealForbidden(DealError):
+    """Действие доступно только владельцу вещи"""
+
+
+def _transition(model, table: dict, action: str, *criteria, **values) -> int:
+    """Условный UPDATE по таблице переходов; возвращает число изменённых строк"""
+
+    sources, target = table[action]
+    statement = (
+        update(model)
+        .where(model.status.in_(sources), *criteria)
+        .values(status=target, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.execute(statement).rowcount
+
+
+def transition_items(action: str, *criteria, **values) -> int:
+    return _transition(Item, ITEM_TRANSITIONS, action, *criteria, **values)
+
+
+def transition_requests(action: str, *criteria, **values) -> int:
+    return _transition(ExchangeRequest, REQUEST_TRANSITIONS, action, *criteria, **values)
+
+
+def _item_link(item_id: int) -> str:
+    return f"/items/{item_id}"
+
+
+def _decline_competing(item_ids: list, except_id: Optional[int] = None) -> int:
+    """Одним UPDATE отклоняет ожидающие заявки, где участвуют вещи `item_ids`.
+
+    Заявки сначала выбираются с блокировкой строк, чтобы уведомить ровно
+    тех, чьи заявки отклонены.
+    """
+
+    criteria = [
+        ExchangeRequest.status == "pending",
+        or_(ExchangeRequest.target_item_id.in_(item_ids), ExchangeRequest.offered_item_id.in_(item_ids)),
+    ]
+    if except_id is not None:
+        criteria.append(ExchangeRequest.id != except_id)
+    rows = db.session.execute(
+        db.select(ExchangeRequest.id, ExchangeRequest.requester_id, ExchangeRequest.target_item_id, Item.title)
+        .join(Item, Item.id == ExchangeRequest.target_item_id)
+        .where(*criteria)
+        .with_for_update(of=ExchangeRequest)
+    ).all()
+    if not rows:
+        return 0
+    transition_requests("decline", ExchangeRequest.id.in_([row.id for row in rows]))
+    for target_id, title in {(row.target_item_id, row.title) for row in rows}:
+        notifications.notify(
+            (row.requester_id for row in rows if row.target_item_id == target_id),
+            "Заявка отклонена",
+            f"Вещь «{title}» больше недоступна для сделки." if target_id in item_ids
+            else f"Предложенная вами в обмен на «{title}» вещь больше недоступна.",
+            _item_link(target_id),
+        )
+    return len(rows)
+
+
+def _commit(item_ids) -> None:
+    db.session.commit()
+    feed.refresh_items(item_ids)
+
+
+def _fail(message: str, error=DealError):
+    db.session.rollback()
+    raise error(message)
+
+
+def _request_with_item(req_id: int):
+    """(заявка, владелец вещи) одним запросом; None — если заявки нет"""
+
+    return db.session.execute(
+        db.select(
+            ExchangeRequest.id,
+            ExchangeRequest.target_item_id,
+            ExchangeRequest.offered_item_id,
+            ExchangeRequest.requester_id,
+            ExchangeRequest.status,
+            Item.owner_id,
+            Item.title,
+        )
+        .join(Item, Item.id == ExchangeRequest.target_item_id)
+        .where(ExchangeRequest.id == req_id)
+    ).first()
+
+
+def _open_item(item_id: int, user_id: int):
+    item = db.session.get(Item, item_id)
+    if item is None:
+        raise DealError("Вещь не найдена")
+    if item.owner_id == user_id:
+        raise DealError("Нельзя отправить заявку на собственную вещь")
+    if item.status not in OPEN_ITEM_STATUSES:
+        raise DealError("Вещь уже недоступна")
+    return item
+
+
+def _has_pending_request(item_id: int, user_id: int) -> bool:
+    return db.session.scalar(
+        db.select(ExchangeRequest.id).where(
+            ExchangeRequest.target_item_id == item_id,
+            ExchangeRequest.requester_id == user_id,
+            ExchangeRequest.status == "pending",
+        ).limit(1)
+    ) is not None
+
+
+def _save_request(req: ExchangeRequest, owner_id: int, title: str, text: str, item_id: int) -> int:
+    """INSERT заявки и уведомление владельцу; возвращает id заявки.
+
+    Параллельный дубликат, прошедший _has_pending_request, отсекает
+    уникальный индекс — тогда DealError.
+    """
+
+    db.session.add(req)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        _fail("Вы уже отправили заявку на эту вещь")
+    notifications.notify([owner_id], title, text, _item_link(item_id))
+    req_id = req.id
+    db.session.commit()
+    return req_id
+
+
+def request_purchase(item_id: int, buyer_id: int) -> ExchangeRequest:
+    """Заявка на покупку (ExchangeRequest без предложенной вещи)"""
+
+    item = _open_item(item_id, buyer_id)
+    if not item.price or item.is_free:
+        raise DealError("Для покупки должна быть указана цена")
+    if _has_pending_request(item_id, buyer_id):
+        raise DealError("Вы уже отправили заявку на эту вещь")
+    req = ExchangeRequest(
+        requester_id=buyer_id,
+        target_item_id=item_id,
+        offered_item_id=None,
+        message="Заявка на покупку",
+        status="pending",
+    )
+    req_id = _save_request(
+        req, item.owner_id, "Новая заявка на покупку", f"На вещь «{item.title}» пришла заявка на покупку.", item_id
+    )
+    activity_log.record("deal.request", buyer_id, request_id=req_id, item_id=item_id)
+    return req
+
+
+def request_exchange(item_id: int, requester_id: int, offered_item_id: int, message: str = None) -> ExchangeRequest:
+    """Заявка на обмен вещи `item_id` на свою вещь `offered_item_id`"""
+
+    item = _open_item(item_id, requester_id)
+    offered = db.session.get(Item, offered_item_id)
+    if offered is None or offered.owner_id != requester_id:
+        raise DealError("Предлагать можно только свою вещь")
+    if offered.status not in OPEN_ITEM_STATUSES:
+        raise DealError("Предложенная вещь уже недоступна")
+    if _has_pending_request(item_id, requester_id):
+        raise DealError("Вы уже отправили заявку на эту вещь")
+    req = ExchangeRequest(
+        requester_id=requester_id,
+        target_item_id=item_id,
+        offered_item_id=offered_item_id,
+        message=message,
+    )
+    req_id = _save_request(
+        req, item.owner_id, "Новая заявка на обмен", f"За вещь «{item.title}» предлагают «{offered.title}».", item_id
+    )
+    activity_log.record("deal.request", requester_id, request_id=req_id, item_id=item_id,
+                        offered_item_id=offered_item_id)
+    return req
+
+
+def accept_request(req_id: int, owner_id: int) -> int:
+    """Владелец принимает заявку; возвращает id вещи.
+
+    Покупка: вещь available → sold и переходит покупателю. Обмен: обе вещи
+    available → reserved. Остальные ожидающие заявки с этими вещами
+    отклоняются. Если параллельный запрос успел раньше — DealError.
+    """
+
+    row = _request_with_item(req_id)
+    if row is None:
+        raise DealError("Заявка не найдена")
+    if row.owner_id != owner_id:
+        raise DealForbidden("Принять заявку может только владелец вещи")
+
+    if not transition_requests("accept", ExchangeRequest.id == req_id):
+        _fail("Заявка уже обработана")
+    if row.offered_item_id is None:
+        item_ids = [row.target_item_id]
+        changed = transition_items(
+            "sell", Item.id == row.target_item_id, Item.owner_id == owner_id, owner_id=row.requester_id
+        )
+    else:
+        item_ids = [row.target_item_id, row.offered_item_id]
+        changed = transition_items(
+            "reserve",
+            or_(
+                (Item.id == row.target_item_id) & (Item.owner_id == owner_id),
+                (Item.id == row.offered_item_id) & (Item.owner_id == row.requester_id),
+            ),
+        )
+    if changed != len(item_ids):
+        _fail("Вещь уже недоступна")
+    _decline_competing(item_ids, except_id=req_id)
+    notifications.notify(
+        [row.requester_id], "Заявка принята",
+        f"Владелец принял вашу заявку на вещь «{row.title}».", _item_link(row.target_item_id),
+    )
+    _commit(item_ids)
+    activity_log.record("deal.accept", owner_id, request_id=req_id, item_ids=item_ids)
+    return row.target_item_id
+
+
+def decline_request(req_id: int, owner_id: int) -> int:
+    """Владелец отклоняет заявку; возвращает id вещи"""
+
+    row = _request_with_item(req_id)
+    if row is None:
+        raise DealError("Заявка не найдена")
+    if row.owner_id != owner_id:
+        raise DealForbidden("Отклонить заявку может только владелец вещи")
+    if not transition_requests("decline", ExchangeRequest.id == req_id):
+        _fail("Заявка уже обработана")
+    notifications.notify(
+        [row.requester_id], "Заявка отклонена",
+        f"Владелец отклонил вашу заявку на вещь «{row.title}».", _item_link(row.target_item_id),
+    )
+    db.session.commit()
+    activity_log.record("deal.decline", owner_id, request_id=req_id, item_id=row.target_item_id)
+    return row.target_item_id
+
+
+def donate_item(item_id: int, owner_id: int, notes: str = None) -> Donation:
+    """Передача вещи в дар: статус donated, ожидающие заявки отклоняются"""
+
+    if not transition_items("donate", Item.id == item_id, Item.owner_id == owner_id):
+        item = db.session.get(Item, item_id)
+        if item is not None and item.owner_id != owner_id:
+            _fail("Передать в дар может только владелец вещи", DealForbidden)
+        _fail("Вещь уже недоступна")
+    donation = Donation(item_id=item_id, donor_id=owner_id, status="confirmed", confirmation_doc=notes)
+    db.session.add(donation)
+    _decline_competing([item_id])
+    _commit([item_id])
+    activity_log.record("deal.donate", owner_id, item_id=item_id)
+    return donation
+
+
+def recycle_item(item_id: int, operator_id: int, method: str, location: str = None,
+                 notes: str = None) -> RecyclingOperation:
+    """Отметка о переработке: статус recycled, ожидающие заявки отклоняются"""
+
+    if not transition_items("recycle", Item.id == item_id):
+        _fail("Вещь уже переработана или утилизирована")
+    operation = RecyclingOperation(
+        item_id=item_id, operator_id=operator_id, method=method, location=location, notes=notes
+    )
+    db.session.add(operation)
+    _decline_competing([item_id])
+    _commit([item_id])
+    activity_log.record("deal.recycle", operator_id, item_id=item_id, method=method)
+    return operation
+
+
+def change_statuses(changes: dict, actor_id: int) -> None:
+    """Смена статусов {id: новый статус} по таблице переходов (пакетное API).
+
+    Статусы должны быть из STATUS_ACTIONS, а исходные — допустимыми (это
+    проверяет вызывающий). На каждое действие — один условный UPDATE; если
+    параллельный запрос успел изменить хоть одну вещь, всё откатывается с
+    DealError. Ожидающие заявки с этими вещами отклоняются.
+    """
+
+    by_action: dict = {}
+    for item_id, status in changes.items():
+        by_action.setdefault(STATUS_ACTIONS[status], []).append(item_id)
+    for action, item_ids in by_action.items():
+        if transition_items(action, Item.id.in_(item_ids)) != len(item_ids):
+            _fail("Статус объявления успел измениться, повторите запрос")
+    item_ids = list(changes)
+    _decline_competing(item_ids)
+    _commit(item_ids)
+    activity_log.record("deal.status", actor_id, item_ids=item_ids, source="api-batch")
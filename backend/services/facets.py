@@ -0,0 +1,155 @@
+"""Счётчики фасетов списка объявлений (категория, статус, состояние, флаги).
+
+Все счётчики страницы берутся из одного сгруппированного запроса:
+
+    SELECT category_id, status, condition, is_free, is_exchangeable, COUNT(*)
+    FROM items [JOIN search_hits] GROUP BY 1, 2, 3, 4, 5
+
+Сочетаний значений немного (категории × статусы × состояния × 2 × 2), и
+дальше всё считается в Python. Счётчик варианта фасета учитывает все
+выбранные фильтры, кроме фильтра самого этого фасета: рядом с «Б/У»
+показано, сколько объявлений будет, если выбрать «Б/У» вместо текущего
+состояния. Счётчик категории включает подкатегории — как и фильтр.
+
+Без поискового запроса сочетания кешируются (FACETS_TTL) и сбрасываются
+после commit, изменившего объявления: ORM-объекты Item (after_flush) и
+INSERT/UPDATE/DELETE по items через сессию (do_orm_execute).
+"""
+from collections import Counter, namedtuple
+from typing import Optional
+
+from sqlalchemy import event, func, select
+
+from ..app import db
+from ..app.models import Item
+from . import category_tree
+from .cache import cache
+
+FACETS_KEY = "facets:items"
+
+ItemFilters = namedtuple("ItemFilters", "category_id status condition is_free is_exchangeable")
+ItemFilters.__new__.__defaults__ = (None,) * len(ItemFilters._fields)
+
+ItemFacets = namedtuple("ItemFacets", "total category status condition is_free is_exchangeable")
+
+_settings = {"ttl": 60}
+
+
+def _combinations(hits=None) -> list:
+    """[(category_id, status, condition, is_free, is_exchangeable, count)] по всем объявлениям"""
+
+    def load():
+        query = select(
+            Item.category_id, Item.status, Item.condition, Item.is_free, Item.is_exchangeable, func.count()
+        )
+        if hits is not None:
+            query = query.join(hits, hits.c.item_id == Item.id)
+        query = query.group_by(Item.category_id, Item.status, Item.condition, Item.is_free, Item.is_exchangeable)
+        return [
+            (category_id, status, condition, bool(is_free), bool(is_exchangeable), count)
+            for category_id, status, condition, is_free, is_exchangeable, count in db.session.execute(query)
+        ]
+
+    if hits is not None:
+        return load()  # результаты поиска не кешируются
+    return cache.get_or_set(FACETS_KEY, load, _settings["ttl"])
+
+
+def _subtree(nodes: tuple, category_id: int) -> set:
+    ids, inside, depth = set(), False, 0
+    # Узлы в порядке обхода дерева: поддерево — непрерывный отрезок после корня
+    for node in nodes:
+        if inside and node.depth <= depth:
+            break
+        if node.id == category_id:
+            inside, depth = True, node.depth
+        if inside:
+            ids.add(node.id)
+    return ids
+
+
+def item_facets(filters: ItemFilters, hits=None) -> ItemFacets:
+    """Счётчики всех фасетов при фильтрах `filters` (и результатах поиска `hits`)"""
+
+    nodes = category_tree.tree()
+    in_category = _subtree(nodes, filters.category_id) if filters.category_id else None
+    checks = {
+        "category": lambda row: in_category is None or row[0] in in_category,
+        "status": lambda row: not filters.status or row[1] == filters.status,
+        "condition": lambda row: not filters.condition or row[2] == filters.condition,
+        "is_free": lambda row: filters.is_free is None or row[3] == filters.is_free,
+        "is_exchangeable": lambda row: filters.is_exchangeable is None or row[4] == filters.is_exchangeable,
+    }
+    counts = {name: Counter() for name in checks}
+    total = 0
+    for row in _combinations(hits):
+        failed = [name for name, check in checks.items() if not check(row)]
+        if len(failed) > 1:
+            continue
+        count = row[5]
+        if not failed:
+            total += count
+        # Строка, не прошедшая только фильтр фасета, всё равно входит в его счётчики
+        for position, name in enumerate(checks):
+            if not failed or failed == [name]:
+                counts[name][row[position]] += count
+
+    # Подкатегории входят в счётчик родителя: дети идут после родителя, сворачиваем с конца
+    by_category = counts["category"]
+    for node in reversed(nodes):
+        if node.parent_id is not None:
+            by_category[node.parent_id] += by_category[node.id]
+    return ItemFacets(total=total, **{name: dict(values) for name, values in counts.items()})
+
+
+def invalidate() -> None:
+    cache.delete(FACETS_KEY)
+
+
+def _touch(session) -> None:
+    session.info["facets_pending"] = True
+
+
+def _after_flush(session, flush_context) -> None:
+    for objects in (session.new, session.dirty, session.deleted):
+        if any(isinstance(obj, Item) for obj in objects):
+            _touch(session)
+            return
+
+
+def _on_execute(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None and getattr(table, "name", None) == Item.__tablename__:
+            _touch(state.session)
+
+
+def _after_commit(session) -> None:
+    if session.info.pop("facets_pending", None):
+        invalidate()
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("facets_pending", None)
+
+
+def parse_flag(value: Optional[str]) -> Optional[bool]:
+    """Флаг из строки запроса: "1"/"0" → True/False, пусто — фильтр не задан"""
+
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    return None
+
+
+def init_app(app) -> None:
+    _settings["ttl"] = app.config.get("FACETS_TTL", 60)
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _on_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
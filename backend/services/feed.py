@@ -0,0 +1,148 @@
+"""Лента «Последние объявления» для главной страницы.
+
+Лента хранится в кеше (services/cache.py) как готовый кортеж FeedCard —
+всё, что нужно шаблону, без ORM-объектов. Главная читает её без обращений
+к БД; пустой кеш (первый запрос, истёк FEED_TTL) заполняется одним
+запросом.
+
+Лента обновляется инкрементально: события сессии собирают id изменённых,
+созданных и удалённых объявлений (и объявлений, у которых поменялись
+фотографии), а после commit эти строки перечитываются одним запросом по
+отдельному соединению и вливаются в ленту. Полная пересборка нужна,
+только если после удаления в ленте осталось меньше FEED_SIZE карточек или
+переименована категория.
+
+Новая лента записывается через compare-and-set (cache.replace): если
+другой воркер успел обновить ленту после нашего чтения, его изменения не
+перетираются — ключ сбрасывается, и следующий запрос соберёт ленту заново.
+"""
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import event
+
+from ..app import db
+from ..app.models import Category, Item, ItemImage
+from ..repositories import items as items_repo
+from .cache import cache
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = "feed:home"
+EXCERPT_LENGTH = 120
+
+FeedCard = namedtuple(
+    "FeedCard",
+    "id title excerpt category_name price is_free status created_at image_jpeg image_webp",
+)
+
+_settings = {"size": 12, "ttl": 300}
+
+
+def _card(row) -> FeedCard:
+    description = row.description or ""
+    excerpt = description[:EXCERPT_LENGTH] + ("..." if len(description) > EXCERPT_LENGTH else "")
+    card_variants = (row.image_variants or {}).get("card") or {}
+    image_jpeg = card_variants.get("jpeg") or row.image_path
+    return FeedCard(
+        id=row.id,
+        title=row.title,
+        excerpt=excerpt,
+        category_name=row.category_name,
+        price=row.price,
+        is_free=row.is_free,
+        status=row.status,
+        created_at=row.created_at,
+        image_jpeg=image_jpeg,
+        image_webp=card_variants.get("webp") if image_jpeg else None,
+    )
+
+
+def _sort_key(card: FeedCard):
+    return (card.created_at or datetime.min, card.id)
+
+
+def _load(connection) -> tuple:
+    size = _settings["size"]
+    rows = connection.execute(
+        items_repo.feed_rows_select().order_by(Item.created_at.desc(), Item.id.desc()).limit(size)
+    ).all()
+    return tuple(_card(row) for row in rows)
+
+
+def latest_cards() -> tuple:
+    """Карточки ленты главной: из кеша, при промахе — одним запросом"""
+
+    return cache.get_or_set(FEED_KEY, lambda: _load(db.session), _settings["ttl"])
+
+
+def refresh_items(item_ids) -> None:
+    """Вливает в ленту актуальные версии объявлений `item_ids` (удалённые — убирает)"""
+
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    current = cache.get(FEED_KEY)
+    if current is None:
+        return  # ленты нет в кеше — её соберёт следующий запрос
+    size = _settings["size"]
+    with db.engine.connect() as connection:
+        rows = connection.execute(items_repo.feed_rows_select().where(Item.id.in_(item_ids))).all()
+        kept = [card for card in current if card.id not in item_ids]
+        if len(kept) < len(current) and len(kept) + len(rows) < size:
+            # Часть ленты удалена — заполнить хвост можно только полным запросом
+            feed = _load(connection)
+        else:
+            merged = sorted(kept + [_card(row) for row in rows], key=_sort_key, reverse=True)
+            feed = tuple(merged[:size])
+    if feed != current and not cache.replace(FEED_KEY, current, feed, _settings["ttl"]):
+        invalidate()  # ленту успели изменить параллельно — слияние со старой версией потеряло бы их правку
+
+
+def invalidate() -> None:
+    cache.delete(FEED_KEY)
+
+
+def _after_flush(session, flush_context) -> None:
+    pending = session.info.setdefault("feed_pending", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Item):
+            pending.add(obj.id)
+        elif isinstance(obj, ItemImage):
+            pending.add(obj.item_id)
+        elif isinstance(obj, Category) and obj not in session.new:
+            pending.add(None)  # сменилось имя категории — проще пересобрать ленту
+    if not pending:
+        session.info.pop("feed_pending")
+
+
+def _after_commit(session) -> None:
+    pending = session.info.pop("feed_pending", None)
+    if not pending:
+        return
+    try:
+        if None in pending:
+            invalidate()
+        else:
+            refresh_items(pending)
+    except Exception:
+        # Коммит уже прошёл: не роняем запрос, а сбрасываем ленту целиком
+        logger.exception("Не удалось обновить ленту главной")
+        invalidate()
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("feed_pending", None)
+
+
+def init_app(app) -> None:
+    _settings["size"] = app.config.get("FEED_SIZE", 12)
+    _settings["ttl"] = app.config.get("FEED_TTL", 300)
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
@@ -0,0 +1,381 @@
+"""Фоновая обработка изображений объявлений.
+
+В запросе загрузка только проверяется по заголовку файла и сохраняется
+под именем sha256 содержимого. Декодирование и уменьшенные копии
+(thumb/card/full в WebP и JPEG) делает пул потоков после коммита; готовые
+пути записываются в ItemImage.variants. Внешний брокер не нужен: очередь —
+внутренняя очередь ThreadPoolExecutor.
+
+Хранилище адресуется содержимым: одинаковые файлы разных объявлений — один
+файл на диске, а число ссылок на него — число строк ItemImage с этим
+file_path/content_hash. При удалении объявления запрос только ставит
+задание ``release``; файлы без ссылок удаляет пул после коммита. Сборщик
+мусора (``collect_garbage``, фоновый поток раз в IMAGE_GC_INTERVAL секунд
+и ``flask images-gc``) пачками сверяет каталог загрузок с ItemImage и
+удаляет файлы, на которые ничто не ссылается, — например, оставшиеся от
+неудачных загрузок. Файлы моложе IMAGE_GC_GRACE секунд не трогаются:
+строка ItemImage для них может быть ещё не закоммичена.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from typing import Iterable, Iterator, Optional
+
+import click
+
+from ..app import db
+from ..app.models import ItemImage
+from . import feed
+
+logger = logging.getLogger(__name__)
+
+# Имя варианта → (ширина, высота, режим): crop — обрезка по центру, fit — вписать
+VARIANT_SIZES = {
+    "thumb": (160, 160, "crop"),
+    "card": (640, 360, "crop"),
+    "full": (1600, 1600, "fit"),
+}
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "progressive": True}),
+}
+VARIANTS_DIR = "variants"
+
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+# variants/<sha256>_<размер>.<формат>
+_VARIANT_NAME = re.compile(r"^([0-9a-f]{64})_")
+
+
+def probe_upload(data: bytes) -> Optional[str]:
+    """Проверяет, что байты — изображение допустимого формата, без полного декодирования.
+
+    Возвращает расширение для хранения (jpg/png/gif) или None.
+    """
+
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(data)) as img:
+            fmt = img.format
+            img.verify()
+    except Exception:
+        return None
+    return _EXTENSIONS.get(fmt)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def store_original(upload_folder: str, data: bytes, ext: str) -> tuple:
+    """Сохраняет исходник под именем хеша; повторная загрузка того же файла не пишет диск"""
+
+    digest = content_hash(data)
+    filename = f"{digest}.{ext}"
+    path = os.path.join(upload_folder, filename)
+    try:
+        # Файл уже есть — обновляем mtime, чтобы параллельное освобождение
+        # или сборщик мусора не удалили его до коммита новой ссылки
+        os.utime(path)
+    except FileNotFoundError:
+        _atomic_write(path, data)
+    return digest, filename
+
+
+def variant_path(digest: str, size: str, fmt: str) -> str:
+    ext = "jpg" if fmt == "jpeg" else fmt
+    return f"{VARIANTS_DIR}/{digest}_{size}.{ext}"
+
+
+def build_variants(upload_folder: str, digest: str, filename: str) -> dict:
+    """Строит все уменьшенные копии исходника; уже существующие файлы не пересоздаются"""
+
+    os.makedirs(os.path.join(upload_folder, VARIANTS_DIR), exist_ok=True)
+    wanted = {
+        (size, fmt): variant_path(digest, size, fmt)
+        for size in VARIANT_SIZES
+        for fmt in VARIANT_FORMATS
+    }
+    missing = {key: rel for key, rel in wanted.items()
+               if not os.path.exists(os.path.join(upload_folder, rel))}
+    if missing:
+        from PIL import Image, ImageOps
+
+        with Image.open(os.path.join(upload_folder, filename)) as src:
+            src = ImageOps.exif_transpose(src)
+            if src.mode != "RGB":
+                src = src.convert("RGB")
+            for size in VARIANT_SIZES:
+                resized = None
+                for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                    rel = missing.get((size, fmt))
+                    if rel is None:
+                        continue
+                    if resized is None:
+                        resized = _resize(src, *VARIANT_SIZES[size])
+                    buffer = BytesIO()
+                    resized.save(buffer, pil_format, **options)
+                    _atomic_write(os.path.join(upload_folder, rel), buffer.getvalue())
+
+    variants: dict = {}
+    for (size, fmt), rel in wanted.items():
+        variants.setdefault(size, {})[fmt] = rel
+    return variants
+
+
+def remove_image_files(upload_folder: str, filename: str, variants: Optional[dict]) -> None:
+    """Удаляет исходник и его уменьшенные копии (ошибки файловой системы игнорируются)"""
+
+    paths = [filename]
+    for formats in (variants or {}).values():
+        paths.extend(formats.values())
+    for rel in paths:
+        try:
+            os.remove(os.path.join(upload_folder, rel))
+        except OSError:
+            pass
+
+
+def _is_recent(path: str, grace: float) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) < grace
+    except OSError:
+        return True  # файла уже нет или он недоступен — не трогаем
+
+
+def _scan_files(upload_folder: str) -> Iterator[tuple]:
+    """Файлы хранилища как (относительный путь, ключ): ключ исходника — имя
+    файла (ItemImage.file_path), ключ копии — хеш (ItemImage.content_hash)"""
+
+    for directory, is_variant in ((upload_folder, False), (os.path.join(upload_folder, VARIANTS_DIR), True)):
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                if not is_variant:
+                    yield entry.name, entry.name
+                    continue
+                match = _VARIANT_NAME.match(entry.name)
+                if match:
+                    yield f"{VARIANTS_DIR}/{entry.name}", match.group(1)
+
+
+def _batches(iterable, size: int) -> Iterator[list]:
+    batch = []
+    for element in iterable:
+        batch.append(element)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _resize(img, width: int, height: int, mode: str):
+    from PIL import Image, ImageOps
+
+    if mode == "crop":
+        return ImageOps.fit(img, (width, height), Image.LANCZOS)
+    copy = img.copy()
+    copy.thumbnail((width, height), Image.LANCZOS)
+    return copy
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+class ImagePipeline:
+    """Пул фоновых обработчиков изображений (app.extensions["image_pipeline"])"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        self._gc_stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.extensions["image_pipeline"] = self
+
+        @app.before_request
+        def _start_image_gc():
+            if self._gc_thread is None and app.config.get("IMAGE_GC_INTERVAL", 0) > 0:
+                self.start_gc()
+
+        @app.cli.command("images-gc")
+        @click.option("--batch", type=int, default=500, help="Файлов в одной сверке с БД")
+        @click.option("--dry-run", is_flag=True, help="Только показать, что будет удалено")
+        def images_gc_command(batch, dry_run):
+            """Удалить файлы изображений, на которые не ссылается ни одно объявление."""
+
+            stats = self.collect_garbage(batch_size=batch, dry_run=dry_run)
+            verb = "к удалению" if dry_run else "удалено"
+            click.echo(f"[OK] Проверено файлов: {stats['scanned']}, {verb}: {stats['removed']} "
+                       f"({stats['bytes'] / 1024 / 1024:.1f} МБ).")
+
+    def submit(self, jobs) -> None:
+        """Ставит в очередь пары (content_hash, filename); вызывать после коммита"""
+
+        workers = self.app.config.get("IMAGE_WORKERS", 2)
+        for digest, filename in jobs:
+            if workers <= 0:
+                self._process(digest, filename)
+            else:
+                self._get_executor(workers).submit(self._process, digest, filename)
+
+    def _get_executor(self, workers: int) -> ThreadPoolExecutor:
+        # Пул создаётся лениво: после fork() в воркере gunicorn, а не в мастере
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="image-worker"
+                )
+            return self._executor
+
+    def release(self, images: Iterable[tuple]) -> None:
+        """Освобождает файлы удалённых изображений: пары (file_path, content_hash).
+
+        Вызывать после коммита удаления строк ItemImage; файлы, на которые
+        больше нет ссылок, удаляются в пуле, запрос не ждёт диска.
+        """
+
+        images = list(images)
+        if not images:
+            return
+        workers = self.app.config.get("IMAGE_WORKERS", 2)
+        if workers <= 0:
+            self._release(images)
+        else:
+            self._get_executor(workers).submit(self._release, images)
+
+    def _release(self, images: list) -> None:
+        upload_folder = self.app.config["UPLOAD_FOLDER"]
+        grace = self.app.config.get("IMAGE_GC_GRACE", 3600)
+        with self.app.app_context():
+            try:
+                paths = {path for path, _ in images}
+                digests = {digest for _, digest in images if digest}
+                used_paths = set(db.session.scalars(
+                    db.select(ItemImage.file_path).where(ItemImage.file_path.in_(paths))
+                ))
+                used_digests = set(db.session.scalars(
+                    db.select(ItemImage.content_hash).where(ItemImage.content_hash.in_(digests))
+                )) if digests else set()
+            except Exception:
+                logger.exception("Не удалось проверить ссылки на изображения")
+                return
+            finally:
+                db.session.remove()
+        for path, digest in set(images):
+            # Свежий файл мог только что загрузить кто-то ещё — его оставит сборщик мусора
+            if path in used_paths or _is_recent(os.path.join(upload_folder, path), grace):
+                continue
+            variants = None
+            if digest and digest not in used_digests:
+                variants = {size: {fmt: variant_path(digest, size, fmt) for fmt in VARIANT_FORMATS}
+                            for size in VARIANT_SIZES}
+            remove_image_files(upload_folder, path, variants)
+
+    def collect_garbage(self, batch_size: int = 500, dry_run: bool = False) -> dict:
+        """Сверяет каталог загрузок с ItemImage пачками и удаляет файлы без ссылок"""
+
+        upload_folder = self.app.config["UPLOAD_FOLDER"]
+        grace = self.app.config.get("IMAGE_GC_GRACE", 3600)
+        stats = {"scanned": 0, "removed": 0, "bytes": 0}
+        with self.app.app_context():
+            # Пустая таблица — скорее всего, приложение смотрит не в ту БД: ничего не удаляем
+            if db.session.scalar(db.select(ItemImage.id).limit(1)) is None:
+                db.session.remove()
+                return stats
+            for batch in _batches(_scan_files(upload_folder), batch_size):
+                stats["scanned"] += len(batch)
+                paths = [key for rel, key in batch if rel == key]
+                digests = [key for rel, key in batch if rel != key]
+                used = set()
+                if paths:
+                    used.update(db.session.scalars(
+                        db.select(ItemImage.file_path).where(ItemImage.file_path.in_(paths))
+                    ))
+                if digests:
+                    used.update(db.session.scalars(
+                        db.select(ItemImage.content_hash).where(ItemImage.content_hash.in_(set(digests)))
+                    ))
+                db.session.rollback()  # не держим транзакцию, пока работаем с диском
+                for rel, key in batch:
+                    path = os.path.join(upload_folder, rel)
+                    if key in used or _is_recent(path, grace):
+                        continue
+                    try:
+                        size = os.path.getsize(path)
+                        if not dry_run:
+                            os.remove(path)
+                    except OSError:
+                        continue
+                    stats["removed"] += 1
+                    stats["bytes"] += size
+            db.session.remove()
+        if stats["removed"]:
+            logger.info("Сборщик мусора изображений: удалено %s файлов (%s байт)", stats["removed"], stats["bytes"])
+        return stats
+
+    def start_gc(self) -> None:
+        with self._lock:
+            if self._gc_thread is not None:
+                return
+            self._gc_stop.clear()
+            self._gc_thread = threading.Thread(target=self._run_gc, name="image-gc", daemon=True)
+            self._gc_thread.start()
+
+    def _run_gc(self) -> None:
+        interval = self.app.config.get("IMAGE_GC_INTERVAL", 0)
+        while not self._gc_stop.wait(interval):
+            try:
+                self.collect_garbage()
+            except Exception:
+                logger.exception("Сбой сборщика мусора изображений")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._gc_stop.set()
+        with self._lock:
+            self._gc_thread = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def _process(self, digest: str, filename: str) -> None:
+        with self.app.app_context():
+            try:
+                variants = build_variants(self.app.config["UPLOAD_FOLDER"], digest, filename)
+                item_ids = db.session.scalars(
+                    db.select(ItemImage.item_id).where(ItemImage.content_hash == digest)
+                ).all()
+                ItemImage.query.filter_by(content_hash=digest).update(
+                    {"variants": variants, "processed_at": datetime.utcnow()},
+                    synchronize_session=False,
+                )
+                db.session.commit()
+                # Массовый UPDATE не вызывает событий сессии — ленту главной обновляем явно
+                feed.refresh_items(item_ids)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Не удалось обработать изображение %s", filename)
+
+
+image_pipeline = ImagePipeline()
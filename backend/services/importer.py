@@ -0,0 +1,247 @@
+"""Массовый импорт объявлений из XLSX и CSV.
+
+Файл читается потоково: XLSX — openpyxl в read-only режиме, CSV — модулем
+csv (разделитель «;» или «,» определяется по заголовку). Каждая строка
+проверяется полями той же формы ItemForm, что и при ручном создании (один
+экземпляр формы на весь файл), категория ищется по названию или id в
+заранее загруженном словаре справочника.
+
+Корректные строки копятся пачками и вставляются одним executemany на
+пачку, без ORM-объектов; всё в одной транзакции, поэтому импорт либо
+проходит целиком (кроме строк с ошибками), либо не проходит вовсе.
+Строки с ошибками попадают в отчёт с номером строки файла.
+
+Массовая вставка не порождает событий сессии, поэтому полнотекстовый
+индекс и счётчики категорий дополняются явно (search.index_items,
+category_tree.count_inserted), а лента главной сбрасывается после commit.
+"""
+import csv
+import io
+import os
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from sqlalchemy import func, insert
+from werkzeug.datastructures import MultiDict
+
+from ..app import db
+from ..app.forms import ItemForm
+from ..app.models import Item
+from ..repositories import reference
+from . import category_tree, feed, search
+
+IMPORT_BATCH = 1000
+# Сколько ошибок хранить в отчёте (считаются все)
+MAX_REPORTED_ERRORS = 500
+
+# Заголовок колонки (в нижнем регистре) → поле ItemForm
+COLUMN_ALIASES = {
+    "title": "title", "название": "title",
+    "description": "description", "описание": "description",
+    "category": "category", "category_id": "category", "категория": "category",
+    "condition": "condition", "состояние": "condition",
+    "price": "price", "цена": "price",
+    "is_free": "is_free", "бесплатно": "is_free",
+    "is_exchangeable": "is_exchangeable", "обмен": "is_exchangeable", "готов к обмену": "is_exchangeable",
+}
+_TRUE_VALUES = {"1", "true", "yes", "y", "да", "+", "x"}
+
+
+class ImportReport:
+    """Итог импорта: сколько строк прочитано, вставлено и какие с ошибками"""
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.total = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: list = []  # (номер строки, сообщение)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "total": self.total,
+            "imported": self.imported,
+            "error_count": self.error_count,
+            "errors": [{"line": line, "message": message} for line, message in self.errors],
+        }
+
+
+class ImportFormatError(ValueError):
+    """Файл нельзя разобрать: неизвестный формат или нет обязательных колонок"""
+
+
+def _header(cells) -> list:
+    return [COLUMN_ALIASES.get(str(cell or "").strip().lower()) for cell in cells]
+
+
+def _check_header(columns: list) -> None:
+    missing = {"title", "description", "category", "condition"} - set(columns)
+    if missing:
+        raise ImportFormatError("В файле нет колонок: " + ", ".join(sorted(missing)))
+
+
+def _xlsx_rows(stream) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Без этого openpyxl для файлов без <dimension> сначала читает лист целиком
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        columns = _header(next(rows, ()))
+        _check_header(columns)
+        for line, cells in enumerate(rows, 2):
+            if any(cell not in (None, "") for cell in cells):
+                yield line, {name: cell for name, cell in zip(columns, cells) if name}
+    finally:
+        workbook.close()
+
+
+def _csv_rows(stream) -> Iterator[tuple]:
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    first_line = text_stream.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    columns = _header(next(csv.reader([first_line], delimiter=delimiter), []))
+    _check_header(columns)
+    for line, cells in enumerate(csv.reader(text_stream, delimiter=delimiter), 2):
+        if any(cell.strip() for cell in cells):
+            yield line, {name: cell for name, cell in zip(columns, cells) if name}
+
+
+def read_rows(stream, filename: str) -> Iterator[tuple]:
+    """Строки файла как (номер строки, {поле: значение}); формат — по расширению"""
+
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension == "xlsx":
+        return _xlsx_rows(stream)
+    if extension == "csv":
+        return _csv_rows(stream)
+    raise ImportFormatError(f"Неподдерживаемый формат файла: {filename}")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class ItemRowValidator:
+    """Приводит сырую строку к данным формы и проверяет её полями ItemForm.
+
+    Обрабатываются только поля данных (без файлов и кнопки) — их валидаторы
+    и inline-методы validate_<поле>, как в Form.validate.
+    """
+
+    FIELDS = ("title", "description", "category_id", "condition", "price", "is_free", "is_exchangeable")
+
+    def __init__(self):
+        self.form = ItemForm(formdata=None, meta={"csrf": False})
+        self.fields = []
+        for name in self.FIELDS:
+            inline = getattr(self.form, f"validate_{name}", None)
+            self.fields.append((self.form[name], [inline] if inline else []))
+        self.form.category_id.choices = reference.category_choices()
+        self.categories = {}
+        for category_id, name in self.form.category_id.choices:
+            self.categories[str(category_id)] = category_id
+            self.categories.setdefault(name.strip().lower(), category_id)
+        self.conditions = {}
+        for code, label in self.form.condition.choices:
+            self.conditions[code] = code
+            self.conditions[label.lower()] = code
+
+    def __call__(self, raw: dict):
+        """Возвращает (значения для INSERT, None) или (None, текст ошибки)"""
+
+        category = _text(raw.get("category"))
+        category_id = self.categories.get(category.lower())
+        if category and category_id is None:
+            return None, f"Неизвестная категория «{category}»"
+        condition = _text(raw.get("condition"))
+        formdata = MultiDict({
+            "title": _text(raw.get("title")),
+            "description": _text(raw.get("description")),
+            "category_id": str(category_id or ""),
+            "condition": self.conditions.get(condition.lower(), condition),
+            "price": _text(raw.get("price")).replace(",", ".").replace(" ", ""),
+        })
+        for name in ("is_free", "is_exchangeable"):
+            if _text(raw.get(name)).lower() in _TRUE_VALUES:
+                formdata[name] = "y"
+
+        form = self.form
+        messages = []
+        for field, extra in self.fields:
+            field.process(formdata)
+        for field, extra in self.fields:
+            if not field.validate(form, extra):
+                messages.append(f"{field.label.text}: {'; '.join(field.errors)}")
+        if messages:
+            return None, "; ".join(messages)
+        price: Optional[Decimal] = form.price.data
+        return {
+            "title": form.title.data,
+            "description": form.description.data,
+            "category_id": form.category_id.data,
+            "condition": form.condition.data,
+            "price": float(price) if price is not None else None,
+            "is_free": form.is_free.data,
+            "is_exchangeable": form.is_exchangeable.data,
+        }, None
+
+
+def import_items(stream, filename: str, owner_id: int, dry_run: bool = False,
+                 batch_size: int = IMPORT_BATCH) -> ImportReport:
+    """Импортирует объявления из файла от имени `owner_id`.
+
+    Ошибки формата файла — ImportFormatError; ошибки строк — в отчёте.
+    При `dry_run` строки только проверяются.
+    """
+
+    report = ImportReport(dry_run=dry_run)
+    validate = ItemRowValidator()
+    session = db.session
+    last_id = session.scalar(db.select(func.max(Item.id))) or 0
+    batch = []
+    try:
+        for line, raw in read_rows(stream, filename):
+            report.total += 1
+            values, error = validate(raw)
+            if error:
+                report.add_error(line, error)
+                continue
+            values["owner_id"] = owner_id
+            batch.append(values)
+            if len(batch) >= batch_size:
+                report.imported += _flush_batch(batch, dry_run)
+        report.imported += _flush_batch(batch, dry_run)
+        if dry_run or not report.imported:
+            session.rollback()
+            return report
+        search.index_items(session.connection(), Item.id > last_id, Item.owner_id == owner_id)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    feed.invalidate()
+    return report
+
+
+def _flush_batch(batch: list, dry_run: bool) -> int:
+    count = len(batch)
+    if count and not dry_run:
+        # Core-вставка по таблице: ORM-вариант insert(Item) дробит пачку на
+        # группы строк с одинаковым набором непустых колонок
+        db.session.execute(insert(Item.__table__), batch)
+        category_tree.count_inserted(batch)
+    batch.clear()
+    return count
@@ -0,0 +1,295 @@
+"""Очередь исходящей почты (outbox) и фоновая отправка.
+
+Обработчик запроса только добавляет строку OutboundEmail в ту же
+транзакцию, что и свои данные, и будит отправителя после коммита.
+Фоновый поток MailSender забирает пачки готовых писем, отправляет их
+через одно долгоживущее SMTP-соединение (переподключение при обрыве,
+закрытие после простоя), при ошибке откладывает письмо с
+экспоненциальной задержкой, а после MAIL_MAX_ATTEMPTS попыток помечает
+его как dead. Письма не теряются при перезапуске: очередь — таблица.
+
+Строка захватывается условным UPDATE с «арендой» (next_attempt_at в
+будущем), поэтому несколько воркеров gunicorn не отправят одно письмо
+дважды, а письма упавшего воркера вернутся в работу после аренды.
+
+Для тестов достаточно локального SMTP-заглушки (например, aiosmtpd на
+localhost:8025): MAIL_SERVER=localhost, MAIL_PORT=8025, MAIL_USE_TLS=false.
+Без фонового потока (MAIL_OUTBOX_WORKER=false) очередь отправляет
+команда ``flask mail-send``.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Iterable, Optional
+
+import click
+from flask import current_app
+
+from ..app import db
+from ..app.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+# Сколько аренды получает захваченное письмо: после неё его может забрать другой воркер
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue_email(subject: str, body: str, to: Iterable[str], sender: Optional[str] = None,
+                  reply_to: Optional[str] = None, config=None) -> Optional[OutboundEmail]:
+    """Добавляет письмо в сессию (коммитит вызывающий). None — если почта не настроена"""
+
+    cfg = config or current_app.config
+    recipients = [addr for addr in to if addr]
+    sender = sender or cfg.get("MAIL_DEFAULT_SENDER")
+    if not cfg.get("MAIL_SERVER") or not recipients or not sender:
+        return None
+    email = OutboundEmail(
+        sender=sender,
+        recipients=",".join(recipients),
+        subject=subject,
+        body=body,
+        reply_to=reply_to,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(email)
+    return email
+
+
+def retry_delay(attempts: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка перед повтором: base * 2^(attempts-1), не больше cap"""
+
+    return min(cap, base * (2 ** max(attempts - 1, 0)))
+
+
+def build_message(email: OutboundEmail) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = email.sender
+    message["To"] = email.recipients
+    message["Subject"] = email.subject
+    if email.reply_to:
+        message["Reply-To"] = email.reply_to
+    message.set_content(email.body)
+    return message
+
+
+class SmtpConnection:
+    """Одно переиспользуемое SMTP-соединение: открывается лениво, закрывается после простоя"""
+
+    def __init__(self, config):
+        self.config = config
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        import smtplib
+
+        cfg = self.config
+        timeout = cfg.get("MAIL_TIMEOUT", 10)
+        if cfg.get("MAIL_USE_SSL"):
+            server = smtplib.SMTP_SSL(cfg.get("MAIL_SERVER"), cfg.get("MAIL_PORT"), timeout=timeout)
+        else:
+            server = smtplib.SMTP(cfg.get("MAIL_SERVER"), cfg.get("MAIL_PORT"), timeout=timeout)
+            if cfg.get("MAIL_USE_TLS"):
+                server.starttls()
+        if cfg.get("MAIL_USERNAME") and cfg.get("MAIL_PASSWORD"):
+            server.login(cfg.get("MAIL_USERNAME"), cfg.get("MAIL_PASSWORD"))
+        return server
+
+    def send(self, message: EmailMessage) -> None:
+        import smtplib
+
+        if self._server is not None and time.monotonic() - self._last_used > self.config.get("MAIL_SMTP_IDLE", 60):
+            self.close()
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл простаивающее соединение — одна попытка переподключиться
+            self.close()
+            self._server = self._connect()
+            self._server.send_message(message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self._server is not None and time.monotonic() - self._last_used > self.config.get("MAIL_SMTP_IDLE", 60):
+            self.close()
+
+    def close(self) -> None:
+        import smtplib
+
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+class MailSender:
+    """Фоновый отправитель очереди писем (app.extensions["mail_sender"])"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._connection = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.extensions["mail_sender"] = self
+
+        @app.before_request
+        def _start_mail_sender():
+            # Поток стартует в воркере (после fork), а не в мастере gunicorn
+            if self._thread is None and self.configured and app.config.get("MAIL_OUTBOX_WORKER", True):
+                self.start()
+
+        @app.cli.command("mail-send")
+        def mail_send_command():
+            """Отправить все готовые письма из очереди и выйти."""
+
+            total = self.drain()
+            self.close()
+            click.echo(f"[OK] Обработано писем: {total}.")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.app.config.get("MAIL_SERVER"))
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or not self.app.config.get("MAIL_OUTBOX_WORKER", True):
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        """Будит отправителя; вызывать после коммита транзакции с письмом"""
+
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+
+    def shutdown(self, timeout: float = 10) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+        self.close()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _run(self) -> None:
+        interval = self.app.config.get("MAIL_POLL_INTERVAL", 30)
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Сбой отправителя почты")
+            if self._connection is not None:
+                self._connection.close_if_idle()
+        self.close()
+
+    def drain(self) -> int:
+        """Отправляет готовые письма пачками, пока они есть; возвращает число обработанных"""
+
+        if not self.configured:
+            return 0
+        total = 0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                batch = self._claim_batch()
+                if not batch:
+                    break
+                for email_id in batch:
+                    self._deliver(email_id)
+                total += len(batch)
+            db.session.remove()
+        return total
+
+    def _claim_batch(self) -> list:
+        """Захватывает до MAIL_BATCH_SIZE писем условным UPDATE (безопасно между воркерами)"""
+
+        now = datetime.utcnow()
+        candidates = db.session.scalars(
+            db.select(OutboundEmail.id)
+            .where(OutboundEmail.status.in_((PENDING, SENDING)), OutboundEmail.next_attempt_at <= now)
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+            .limit(self.app.config.get("MAIL_BATCH_SIZE", 50))
+        ).all()
+        claimed = []
+        for email_id in candidates:
+            result = db.session.execute(
+                db.update(OutboundEmail)
+                .where(
+                    OutboundEmail.id == email_id,
+                    OutboundEmail.status.in_((PENDING, SENDING)),
+                    OutboundEmail.next_attempt_at <= now,
+                )
+                .values(status=SENDING, next_attempt_at=now + CLAIM_LEASE)
+            )
+            if result.rowcount:
+                claimed.append(email_id)
+        db.session.commit()
+        return claimed
+
+    def _deliver(self, email_id: int) -> None:
+        import smtplib
+
+        cfg = self.app.config
+        email = db.session.get(OutboundEmail, email_id)
+        if email is None:
+            return
+        try:
+            if self._connection is None:
+                self._connection = SmtpConnection(cfg)
+            self._connection.send(build_message(email))
+        except Exception as exc:
+            if not isinstance(exc, smtplib.SMTPResponseException):
+                # Соединение в неизвестном состоянии — следующее письмо откроет новое
+                self._connection.close()
+            email.attempts += 1
+            email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            # Адрес отвергнут сервером — повтор бессмысленен
+            permanent = isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused))
+            if permanent or email.attempts >= cfg.get("MAIL_MAX_ATTEMPTS", 8):
+                email.status = DEAD
+                logger.error("Письмо %s не доставлено: %s", email.id, email.last_error)
+            else:
+                email.status = PENDING
+                delay = retry_delay(email.attempts, cfg.get("MAIL_RETRY_BASE", 30), cfg.get("MAIL_RETRY_MAX", 3600))
+                email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning("Письмо %s: попытка %s не удалась (%s)", email.id, email.attempts, email.last_error)
+        else:
+            email.status = SENT
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+        db.session.commit()
+
+
+mail_sender = MailSender()
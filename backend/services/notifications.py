@@ -0,0 +1,238 @@
+"""Уведомления пользователям: рассылка, счётчик непрочитанных, длинный опрос.
+
+``notify`` пишет уведомления пачкой (один executemany на всех получателей)
+в транзакции вызывающего кода — уведомление о сделке появляется тогда же,
+когда фиксируется сама сделка. Число непрочитанных хранится в
+users.unread_notifications и меняется атомарным UPDATE вместе со вставкой
+и отметкой о прочтении, поэтому значок в меню не считает строки: он берётся
+из снимка current_user (session_user.py), который сбрасывается после
+commit.
+
+Страницы уведомлений и личного кабинета обновляются длинным опросом
+(/notifications/poll): запрос ждёт новых уведомлений или смены счётчика не
+дольше NOTIFY_POLL_TIMEOUT секунд — меньше таймаута воркера gunicorn, — и
+браузер сразу отправляет следующий с id последнего полученного. Пока запрос
+ждёт, БД опрашивается раз в NOTIFY_POLL_INTERVAL секунд, а в своём
+процессе он просыпается сразу — по сигналу ``broker`` после commit.
+Соединение с БД между опросами не удерживается.
+
+Старые прочитанные уведомления удаляются пачками: ``flask notifications-prune``.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import click
+from sqlalchemy import bindparam, case, delete, event, insert, update
+
+from ..app import db
+from ..app.models import Notification, User
+from ..app.session_user import invalidate_users
+
+# Уведомлений на странице списка и в API по умолчанию
+PAGE_SIZE = 50
+
+_settings = {"poll_interval": 15, "poll_timeout": 20, "retention_days": 30}
+
+
+class NotificationBroker:
+    """Будит запросы этого процесса, ждущие уведомлений пользователя"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions: dict = {}
+
+    def version(self, user_id: int) -> int:
+        with self._condition:
+            return self._versions.get(user_id, 0)
+
+    def publish(self, user_ids: Iterable[int]) -> None:
+        with self._condition:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._condition.notify_all()
+
+    def wait(self, user_id: int, version: int, timeout: float) -> bool:
+        """Ждёт смены версии пользователя; False — если вышел таймаут"""
+
+        with self._condition:
+            return self._condition.wait_for(lambda: self._versions.get(user_id, 0) != version, timeout)
+
+
+broker = NotificationBroker()
+
+
+def _touch_users(user_ids) -> None:
+    db.session.info.setdefault("notifications_pending", set()).update(user_ids)
+
+
+def notify(recipients: Iterable[Optional[int]], title: str, body: str, link: str = None) -> int:
+    """Рассылает уведомление получателям (без commit); возвращает их число"""
+
+    user_ids = sorted({user_id for user_id in recipients if user_id is not None})
+    if not user_ids:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(Notification.__table__), [
+        {"user_id": user_id, "title": title[:120], "body": body, "link": link, "is_read": False,
+         "created_at": now, "updated_at": now}
+        for user_id in user_ids
+    ])
+    users = User.__table__
+    db.session.execute(
+        update(users)
+        .where(users.c.id == bindparam("recipient_id"))
+        # updated_at не трогаем: уведомление — не правка профиля
+        .values(unread_notifications=users.c.unread_notifications + 1, updated_at=users.c.updated_at),
+        [{"recipient_id": user_id} for user_id in user_ids],
+    )
+    _touch_users(user_ids)
+    return len(user_ids)
+
+
+def mark_read(user_id: int, notification_ids: Optional[Iterable[int]] = None) -> int:
+    """Отмечает прочитанными все (или перечисленные) уведомления; без commit"""
+
+    criteria = [Notification.user_id == user_id, Notification.is_read.is_(False)]
+    if notification_ids is not None:
+        criteria.append(Notification.id.in_(list(notification_ids)))
+    changed = db.session.execute(
+        update(Notification).where(*criteria).values(is_read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        counter = User.unread_notifications
+        db.session.execute(
+            update(User).where(User.id == user_id)
+            .values(unread_notifications=case((counter > changed, counter - changed), else_=0),
+                    updated_at=User.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        _touch_users([user_id])
+    return changed
+
+
+def unread_count(user_id: int) -> int:
+    return db.session.scalar(db.select(User.unread_notifications).where(User.id == user_id)) or 0
+
+
+def _to_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "body": row.body,
+        "link": row.link,
+        "is_read": bool(row.is_read),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def recent(user_id: int, limit: int = PAGE_SIZE, before_id: Optional[int] = None) -> list:
+    """Последние уведомления (новые первыми); `before_id` — курсор следующей страницы"""
+
+    query = db.select(
+        Notification.id, Notification.title, Notification.body, Notification.link,
+        Notification.is_read, Notification.created_at,
+    ).where(Notification.user_id == user_id)
+    if before_id is not None:
+        query = query.where(Notification.id < before_id)
+    rows = db.session.execute(query.order_by(Notification.id.desc()).limit(limit)).all()
+    return [_to_dict(row) for row in rows]
+
+
+def newer_than(user_id: int, after_id: int, limit: int = 100) -> list:
+    """Уведомления после `after_id` в порядке появления"""
+
+    rows = db.session.execute(
+        db.select(
+            Notification.id, Notification.title, Notification.body, Notification.link,
+            Notification.is_read, Notification.created_at,
+        )
+        .where(Notification.user_id == user_id, Notification.id > after_id)
+        .order_by(Notification.id)
+        .limit(limit)
+    ).all()
+    return [_to_dict(row) for row in rows]
+
+
+def last_id(user_id: int) -> int:
+    return db.session.scalar(
+        db.select(Notification.id).where(Notification.user_id == user_id)
+        .order_by(Notification.id.desc()).limit(1)
+    ) or 0
+
+
+def wait_for_updates(user_id: int, after_id: Optional[int] = None, unread: Optional[int] = None) -> dict:
+    """Длинный опрос: ждёт уведомлений после `after_id` или смены счётчика `unread`.
+
+    Возвращает {"notifications", "unread", "last_id"} сразу, как только есть
+    что отдать, иначе — через NOTIFY_POLL_TIMEOUT секунд. Без `after_id`
+    (первый запрос страницы) отдаёт текущее состояние без ожидания.
+    """
+
+    if after_id is None:
+        after_id = last_id(user_id)
+    deadline = time.monotonic() + _settings["poll_timeout"]
+    while True:
+        version = broker.version(user_id)
+        rows = newer_than(user_id, after_id)
+        count = unread_count(user_id)
+        db.session.close()  # не держим соединение, пока ждём
+        remaining = deadline - time.monotonic()
+        if rows or count != unread or remaining <= 0:
+            return {
+                "notifications": rows,
+                "unread": count,
+                "last_id": rows[-1]["id"] if rows else after_id,
+            }
+        broker.wait(user_id, version, min(_settings["poll_interval"], remaining))
+
+
+def prune(days: Optional[int] = None, batch_size: int = 1000) -> int:
+    """Удаляет прочитанные уведомления старше `days` дней пачками; возвращает их число"""
+
+    cutoff = datetime.utcnow() - timedelta(days=_settings["retention_days"] if days is None else days)
+    total = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(Notification.id)
+            .where(Notification.is_read.is_(True), Notification.created_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        db.session.execute(
+            delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += len(ids)
+
+
+def _after_commit(session) -> None:
+    user_ids = session.info.pop("notifications_pending", None)
+    if user_ids:
+        invalidate_users(user_ids)  # значок берётся из снимка current_user
+        broker.publish(user_ids)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("notifications_pending", None)
+
+
+def init_app(app) -> None:
+    _settings["poll_interval"] = app.config.get("NOTIFY_POLL_INTERVAL", 15)
+    _settings["poll_timeout"] = app.config.get("NOTIFY_POLL_TIMEOUT", 20)
+    _settings["retention_days"] = app.config.get("NOTIFY_RETENTION_DAYS", 30)
+    for name, listener in (("after_commit", _after_commit), ("after_rollback", _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+    @app.cli.command("notifications-prune")
+    @click.option("--days", type=int, default=None, help="Старше скольких дней (по умолчанию NOTIFY_RETENTION_DAYS)")
+    @click.option("--batch", type=int, default=1000, help="Строк в одном DELETE")
+    def notifications_prune_command(days, batch):
+        """Удалить старые прочитанные уведомления."""
+
+        total = prune(days, batch)
+        click.echo(f"[OK] Удалено уведомлений: {total}.")
@@ -0,0 +1,348 @@
+"""Полнотекстовый поиск по объявлениям (Item.title + Item.description).
+
+Используется родной полнотекстовый индекс СУБД:
+
+- PostgreSQL — GIN-индекс по выражению to_tsvector('russian', ...),
+  морфология и ранжирование (ts_rank) средствами базы; индекс обновляется
+  самой СУБД;
+- SQLite — виртуальная таблица FTS5 ``items_fts`` (rowid = items.id),
+  ранжирование bm25;
+- MySQL — таблица ``item_search`` с FULLTEXT-индексом, ранжирование MATCH.
+
+В SQLite и MySQL русской морфологии нет, поэтому в индекс пишется текст,
+прошедший через стеммер (``stemmer.stem_text``), и запрос стеммится так же.
+Индекс поддерживается событием сессии after_flush: создание, правка
+заголовка/описания и удаление объявления попадают в ту же транзакцию.
+
+Все варианты отдают подзапрос ``(item_id, score)``: чем больше score, тем
+выше релевантность. Для остальных СУБД поиск идёт без индекса — ILIKE по
+основам слов (базовый ``SearchBackend``).
+"""
+import logging
+
+import click
+from sqlalchemy import Float, Integer, case, event, inspect, literal, or_, select, text, type_coerce
+
+from ..app import db
+from ..app.models import Item
+from .stemmer import stem_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Вес заголовка относительно описания при ранжировании
+TITLE_WEIGHT = 10.0
+REINDEX_BATCH = 1000
+
+
+class SearchBackend:
+    """Базовый класс: бэкенд без индекса, который нужно синхронизировать"""
+
+    maintains_index = False
+
+    def ensure_schema(self, connection) -> bool:
+        """Создаёт индекс, если его нет; True — если он создан только что"""
+
+        return False
+
+    def has_schema(self, connection) -> bool:
+        return True
+
+    def upsert(self, connection, rows: list) -> None:
+        pass
+
+    def delete(self, connection, item_ids: list) -> None:
+        pass
+
+    def clear(self, connection) -> None:
+        pass
+
+    def hits(self, query: str):
+        """Без полнотекстового индекса (СУБД не из списка): каждая основа из
+        запроса должна найтись подстрокой в заголовке или описании.
+
+        Это полный просмотр таблицы; score — число основ в заголовке
+        (с весом TITLE_WEIGHT) и в описании.
+        """
+
+        conditions, weights = [], []
+        for term in _stemmed_terms(query):
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            in_title = Item.title.ilike(pattern, escape="\\")
+            in_description = Item.description.ilike(pattern, escape="\\")
+            conditions.append(or_(in_title, in_description))
+            weights += [case((in_title, TITLE_WEIGHT), else_=0.0), case((in_description, 1.0), else_=0.0)]
+        score = type_coerce(sum(weights, literal(0.0)), Float)
+        return select(Item.id.label("item_id"), score.label("score")).where(*conditions).subquery("search_hits")
+
+
+class PostgresSearch(SearchBackend):
+    _VECTOR = (
+        "(setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(description, '')), 'B'))"
+    )
+
+    def ensure_schema(self, connection) -> bool:
+        created = not self.has_schema(connection)
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_items_search ON items USING GIN ({self._VECTOR})"
+        ))
+        return created
+
+    def has_schema(self, connection) -> bool:
+        found = connection.execute(text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_items_search'"))
+        return found.first() is not None
+
+    def hits(self, query: str):
+        # Выражение совпадает с выражением индекса — иначе планировщик его не использует
+        return text(
+            f"SELECT id AS item_id, ts_rank({self._VECTOR}, websearch_to_tsquery('russian', :q)) AS score "
+            f"FROM items WHERE {self._VECTOR} @@ websearch_to_tsquery('russian', :q)"
+        ).bindparams(q=query).columns(item_id=Integer, score=Float).subquery("search_hits")
+
+
+class SqliteSearch(SearchBackend):
+    maintains_index = True
+
+    def ensure_schema(self, connection) -> bool:
+        created = not self.has_schema(connection)
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+            "title, description, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        return created
+
+    def has_schema(self, connection) -> bool:
+        return inspect(connection).has_table("items_fts")
+
+    def upsert(self, connection, rows: list) -> None:
+        self.delete(connection, [row["id"] for row in rows])
+        connection.execute(
+            text("INSERT INTO items_fts (rowid, title, description) VALUES (:id, :title, :description)"),
+            rows,
+        )
+
+    def delete(self, connection, item_ids: list) -> None:
+        connection.execute(text("DELETE FROM items_fts WHERE rowid = :id"), [{"id": i} for i in item_ids])
+
+    def clear(self, connection) -> None:
+        connection.execute(text("DELETE FROM items_fts"))
+
+    def hits(self, query: str):
+        terms = _stemmed_terms(query)
+        # Каждая основа — префиксный терм в кавычках: «велосипед» найдёт «велосипедный»
+        match = " ".join(f'"{term}"*' for term in terms)
+        return text(
+            f"SELECT rowid AS item_id, -bm25(items_fts, {TITLE_WEIGHT}, 1.0) AS score "
+            "FROM items_fts WHERE items_fts MATCH :match"
+        ).bindparams(match=match).columns(item_id=Integer, score=Float).subquery("search_hits")
+
+
+class MysqlSearch(SearchBackend):
+    maintains_index = True
+
+    def ensure_schema(self, connection) -> bool:
+        created = not self.has_schema(connection)
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS item_search ("
+            "item_id INTEGER NOT NULL PRIMARY KEY, title TEXT, description TEXT, "
+            "FULLTEXT KEY ft_item_search (title, description)"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        ))
+        return created
+
+    def has_schema(self, connection) -> bool:
+        return inspect(connection).has_table("item_search")
+
+    def upsert(self, connection, rows: list) -> None:
+        connection.execute(
+            text(
+                "INSERT INTO item_search (item_id, title, description) VALUES (:id, :title, :description) "
+                "ON DUPLICATE KEY UPDATE title = VALUES(title), description = VALUES(description)"
+            ),
+            rows,
+        )
+
+    def delete(self, connection, item_ids: list) -> None:
+        connection.execute(text("DELETE FROM item_search WHERE item_id = :id"), [{"id": i} for i in item_ids])
+
+    def clear(self, connection) -> None:
+        connection.execute(text("DELETE FROM item_search"))
+
+    def hits(self, query: str):
+        boolean = " ".join(f"+{term}*" for term in _stemmed_terms(query))
+        return text(
+            "SELECT item_id, MATCH(title, description) AGAINST (:q IN BOOLEAN MODE) AS score "
+            "FROM item_search WHERE MATCH(title, description) AGAINST (:q IN BOOLEAN MODE)"
+        ).bindparams(q=boolean).columns(item_id=Integer, score=Float).subquery("search_hits")
+
+
+_BACKENDS = {
+    "postgresql": PostgresSearch,
+    "sqlite": SqliteSearch,
+    "mysql": MysqlSearch,
+    "mariadb": MysqlSearch,
+}
+
+# Движки, для которых индекс точно существует (url → True)
+_schema_ready: dict = {}
+
+
+def backend_for(dialect_name: str) -> SearchBackend:
+    return _BACKENDS.get(dialect_name, SearchBackend)()
+
+
+def _stemmed_terms(query: str) -> list:
+    # Кавычки и операторы FTS-синтаксиса отбрасываются токенизатором
+    return [term for term in dict.fromkeys(tokenize(query)) if term]
+
+
+def _document(title: str, description: str) -> tuple:
+    return stem_text(title), stem_text(description)
+
+
+def search_hits(query: str):
+    """Подзапрос (item_id, score) по строке поиска или None, если в ней нет слов"""
+
+    if not _stemmed_terms(query or ""):
+        return None
+    backend = backend_for(db.engine.dialect.name)
+    if backend.maintains_index and not _schema_ready.get(str(db.engine.url)):
+        # Отдельное соединение с коммитом: GET-запрос откатывает свою транзакцию
+        with db.engine.begin() as connection:
+            _ensure_ready(connection, backend)
+    return backend.hits(query)
+
+
+def _ensure_ready(connection, backend: SearchBackend) -> bool:
+    """Проверяет наличие индекса; в SQLite создаёт и заполняет его сам.
+
+    Положительный результат кешируется на движок. В MySQL DDL неявно
+    коммитит транзакцию, поэтому там индекс создаётся только командой
+    ``flask search-rebuild`` (или ``flask bootstrap``).
+    """
+
+    key = str(connection.engine.url)
+    if _schema_ready.get(key):
+        return True
+    if backend.has_schema(connection):
+        _schema_ready[key] = True
+        return True
+    if connection.dialect.name != "sqlite":
+        logger.warning("Поисковый индекс не создан: выполните flask search-rebuild")
+        return False
+    # Кеш не ставим: транзакция с DDL ещё может откатиться
+    backend.ensure_schema(connection)
+    _reindex(connection, backend)
+    return True
+
+
+def _reindex(connection, backend: SearchBackend) -> int:
+    backend.clear(connection)
+    return _index_where(connection, backend)
+
+
+def _index_where(connection, backend: SearchBackend, *criteria) -> int:
+    total = 0
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            db.select(Item.id, Item.title, Item.description)
+            .where(Item.id > last_id, *criteria)
+            .order_by(Item.id)
+            .limit(REINDEX_BATCH)
+        ).all()
+        if not batch:
+            return total
+        rows = []
+        for item_id, title, description in batch:
+            stemmed_title, stemmed_description = _document(title, description)
+            rows.append({"id": item_id, "title": stemmed_title, "description": stemmed_description})
+        backend.upsert(connection, rows)
+        total += len(rows)
+        last_id = batch[-1][0]
+
+
+def index_items(connection, *criteria) -> int:
+    """Добавляет в индекс объявления, подходящие под `criteria`.
+
+    Нужна для массовых вставок (executemany мимо ORM-объектов), которые
+    не проходят через after_flush. Выполняется в транзакции `connection`.
+    """
+
+    backend = backend_for(connection.dialect.name)
+    if not backend.maintains_index or not _ensure_ready(connection, backend):
+        return 0
+    return _index_where(connection, backend, *criteria)
+
+
+def ensure_index(connection=None) -> bool:
+    """Создаёт индекс, если его нет, и заполняет только что созданный; True — если создан.
+
+    Без `connection` работает в собственной транзакции, иначе — в транзакции
+    вызывающего (``flask bootstrap``).
+    """
+
+    if connection is None:
+        with db.engine.begin() as connection:
+            return ensure_index(connection)
+    backend = backend_for(connection.dialect.name)
+    created = backend.ensure_schema(connection)
+    if created and backend.maintains_index:
+        _reindex(connection, backend)
+    return created
+
+
+def rebuild_index() -> int:
+    """Создаёт индекс при необходимости и полностью перестраивает его"""
+
+    with db.engine.begin() as connection:
+        backend = backend_for(connection.dialect.name)
+        backend.ensure_schema(connection)
+    if not backend.maintains_index:
+        return 0
+    with db.engine.begin() as connection:
+        total = _reindex(connection, backend)
+    _schema_ready[str(db.engine.url)] = True
+    return total
+
+
+def _after_flush(session, flush_context) -> None:
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, Item) and (
+            obj in session.new
+            or inspect(obj).attrs.title.history.has_changes()
+            or inspect(obj).attrs.description.history.has_changes()
+        )
+    ]
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Item)]
+    if not changed and not removed:
+        return
+
+    connection = session.connection()
+    backend = backend_for(connection.dialect.name)
+    if not backend.maintains_index or not _ensure_ready(connection, backend):
+        return
+    if removed:
+        backend.delete(connection, removed)
+    if changed:
+        rows = []
+        for obj in changed:
+            stemmed_title, stemmed_description = _document(obj.title, obj.description)
+            rows.append({"id": obj.id, "title": stemmed_title, "description": stemmed_description})
+        backend.upsert(connection, rows)
+
+
+def init_app(app) -> None:
+    """Подписывает синхронизацию индекса на сессию и регистрирует CLI-команду"""
+
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+
+    @app.cli.command("search-rebuild")
+    def search_rebuild_command():
+        """Создать и перестроить полнотекстовый индекс объявлений."""
+
+        total = rebuild_index()
+        click.echo(f"[OK] Поисковый индекс перестроен: {total} объявлений.")
+
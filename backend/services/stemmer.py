@@ -0,0 +1,72 @@
+"""Стеммер русского языка (алгоритм Snowball/Портера) для поискового индекса.
+
+Нужен там, где у СУБД нет русской морфологии (SQLite FTS5, MySQL FULLTEXT):
+в индекс и в запрос попадают одинаково обрезанные основы слов.
+"""
+import re
+
+_PERFECTIVE_GERUND = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_REFLEXIVE = re.compile(r"(с[яь])$")
+_ADJECTIVE = re.compile(
+    r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+)
+_PARTICIPLE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_VERB = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)"
+    r"|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$"
+)
+_NOUN = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+_RV = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_DERIVATIONAL = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$")
+_DER_SUFFIX = re.compile(r"ость?$")
+_SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(word: str) -> str:
+    """Основа слова; слова без русских гласных возвращаются в нижнем регистре"""
+
+    word = word.lower().replace("ё", "е")
+    match = _RV.match(word)
+    if match is None:
+        return word
+    prefix, rv = match.groups()
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+    temp = _PERFECTIVE_GERUND.sub("", rv, 1)
+    if temp == rv:
+        rv = _REFLEXIVE.sub("", rv, 1)
+        temp = _ADJECTIVE.sub("", rv, 1)
+        if temp != rv:
+            rv = _PARTICIPLE.sub("", temp, 1)
+        else:
+            temp = _VERB.sub("", rv, 1)
+            rv = _NOUN.sub("", rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+
+    # Шаг 2–4: «и» на конце, словообразовательный суффикс, превосходная степень, «нн», «ь»
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    if _DERIVATIONAL.match(rv):
+        rv = _DER_SUFFIX.sub("", rv, 1)
+    if rv.endswith("ь"):
+        rv = rv[:-1]
+    else:
+        rv = _SUPERLATIVE.sub("", rv, 1)
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text: str) -> list:
+    """Основы всех слов текста в порядке появления"""
+
+    return [stem(word) for word in _WORD.findall(text or "")]
+
+
+def stem_text(text: str) -> str:
+    return " ".join(tokenize(text))
@@ -0,0 +1,188 @@
+"""Ограничение частоты попыток входа и регистрации (token bucket).
+
+Проверка пароля (check_password_hash) и хеширование при регистрации
+намеренно дорогие: поток перебора паролей занимает ими все воркеры.
+``login_throttle.check`` вызывается до обращения к БД и до любой работы с
+хешем и снимает по жетону из двух корзин — адреса клиента и имени
+пользователя. Корзина вмещает BURST жетонов и пополняется со скоростью
+PER_MINUTE в минуту; пустая корзина — ответ 429 с Retry-After.
+
+Бэкенд выбирается настройкой THROTTLE_TYPE:
+
+- ``memory`` — корзины в памяти процесса (по умолчанию): у каждого
+  воркера свой лимит, итоговый — не больше лимита × число воркеров;
+- ``redis`` — общие корзины для всех воркеров (THROTTLE_URL, по умолчанию
+  CACHE_URL). Обновление — транзакция WATCH/MULTI без Lua, поэтому в
+  тестах подходит ``RedisThrottle(client=FakeRedis())``. Если Redis
+  недоступен, проверка временно идёт по корзинам процесса;
+- ``null`` — ограничение выключено.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _refill(tokens: Optional[float], updated: Optional[float], capacity: int, rate: float, now: float) -> tuple:
+    """Снимает жетон: (остаток в корзине, секунд до следующего жетона или 0)"""
+
+    if tokens is None or updated is None:
+        tokens = float(capacity)
+    else:
+        tokens = min(float(capacity), tokens + max(now - updated, 0.0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class ThrottleBackend:
+    """Интерфейс хранилища корзин: `rate` — жетонов в секунду"""
+
+    name = "null"
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        return 0.0
+
+    def reset(self, key: str) -> None:
+        pass
+
+
+class MemoryThrottle(ThrottleBackend):
+    """Корзины в памяти процесса (потокобезопасно, не больше max_entries ключей)"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict = OrderedDict()  # key → (жетоны, время обновления)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (None, None))
+            tokens, wait = _refill(tokens, updated, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            # Вытесняются давно не обновлявшиеся — их корзины всё равно почти полны
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class RedisThrottle(ThrottleBackend):
+    """Общие корзины в Redis; `client` позволяет подставить совместимую заглушку"""
+
+    name = "redis"
+
+    # Попыток транзакции при одновременном обновлении одной корзины
+    _RETRIES = 5
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "ecobg:throttle:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:  # pragma: no cover - зависит от окружения
+                raise RuntimeError("THROTTLE_TYPE=redis требует пакет redis (pip install redis)") from exc
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+        self.fallback = MemoryThrottle()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        from redis.exceptions import RedisError, WatchError
+
+        name = self.prefix + key
+        ttl = int(math.ceil(capacity / rate)) + 1  # за это время корзина снова полна
+        try:
+            with self.client.pipeline() as pipe:
+                for _ in range(self._RETRIES):
+                    try:
+                        pipe.watch(name)
+                        tokens, updated = pipe.hmget(name, "tokens", "updated")
+                        now = time.time()
+                        tokens, wait = _refill(
+                            float(tokens) if tokens is not None else None,
+                            float(updated) if updated is not None else None,
+                            capacity, rate, now,
+                        )
+                        pipe.multi()
+                        pipe.hset(name, mapping={"tokens": tokens, "updated": now})
+                        pipe.expire(name, ttl)
+                        pipe.execute()
+                        return wait
+                    except WatchError:
+                        continue
+        except RedisError:
+            logger.warning("Redis недоступен, ограничение попыток — по корзинам процесса", exc_info=True)
+            return self.fallback.take(key, capacity, rate)
+        # Корзину непрерывно обновляют параллельные запросы — это и есть поток попыток
+        return 1 / rate
+
+    def reset(self, key: str) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            self.client.delete(self.prefix + key)
+        except RedisError:
+            self.fallback.reset(key)
+
+
+class LoginThrottle:
+    """Лимиты попыток по адресу и имени пользователя (app.extensions["login_throttle"])"""
+
+    def __init__(self):
+        self.backend: ThrottleBackend = MemoryThrottle()
+        self.limits = {"ip": (20, 20 / 60), "user": (5, 3 / 60)}
+        self._stats = {"allowed": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app, backend: Optional[ThrottleBackend] = None) -> None:
+        cfg = app.config
+        if backend is None:
+            kind = cfg.get("THROTTLE_TYPE", "memory")
+            if kind == "redis":
+                backend = RedisThrottle(cfg.get("THROTTLE_URL") or cfg.get("CACHE_URL"))
+            elif kind == "null":
+                backend = ThrottleBackend()
+            else:
+                backend = MemoryThrottle()
+        self.backend = backend
+        self.limits = {
+            "ip": (cfg.get("LOGIN_IP_BURST", 20), cfg.get("LOGIN_IP_PER_MINUTE", 20) / 60),
+            "user": (cfg.get("LOGIN_USER_BURST", 5), cfg.get("LOGIN_USER_PER_MINUTE", 3) / 60),
+        }
+        app.extensions["login_throttle"] = self
+
+    @staticmethod
+    def _user_key(username: str) -> str:
+        return "user:" + username.strip().lower()[:64]
+
+    def check(self, ip: Optional[str], username: Optional[str] = None) -> float:
+        """Снимает жетоны попытки; 0 — можно продолжать, иначе секунд до повтора"""
+
+        wait = self.backend.take("ip:" + (ip or "unknown"), *self.limits["ip"])
+        if not wait and username:
+            wait = self.backend.take(self._user_key(username), *self.limits["user"])
+        with self._stats_lock:
+            self._stats["rejected" if wait else "allowed"] += 1
+        return wait
+
+    def reset_user(self, username: str) -> None:
+        """Успешный вход: попытки по имени больше не считаются"""
+
+        self.backend.reset(self._user_key(username))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"backend": self.backend.name, **self._stats}
+
+
+login_throttle = LoginThrottle()
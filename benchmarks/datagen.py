@@ -0,0 +1,167 @@
+"""Генератор синтетических данных барахолки для бенчмарков.
+
+Пишет напрямую в таблицы пакетными INSERT (executemany по метаданным
+моделей), без ORM-сессии: миллион строк занимает секунды, а не минуты.
+Генерация детерминирована (``seed``), поэтому прогоны на разных коммитах
+сравнимы между собой.
+
+Приложение импортируется лениво, внутри функций: load.py успевает задать
+DATABASE_URL и прочие переменные окружения до чтения config.py.
+
+Запуск отдельно (заполнить существующую БД):
+  python -m benchmarks.datagen --database-url sqlite:///bench.db --items 100000
+"""
+import argparse
+import os
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BENCH_PASSWORD = "bench-password"
+START = datetime(2024, 1, 1)
+
+_WORDS = (
+    "велосипед стол стул шкаф куртка ботинки телефон ноутбук чайник лампа книга "
+    "игрушка коляска диван холодильник пальто рюкзак монитор кресло зеркало"
+).split()
+_ADJECTIVES = "старый новый детский зимний кожаный деревянный белый большой удобный рабочий".split()
+_STATUSES = ["available"] * 7 + ["reserved", "donated", "recycled"]
+_CONDITIONS = ("new", "like_new", "used", "needs_repair")
+
+
+@dataclass
+class DatasetSize:
+    users: int = 1000
+    items: int = 20000
+    categories: int = 20
+    images_per_item: float = 1.5
+    comments_per_item: float = 2.0
+    requests_per_item: float = 0.3
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _title(rnd: random.Random) -> str:
+    return f"{rnd.choice(_ADJECTIVES).capitalize()} {rnd.choice(_WORDS)}"
+
+
+def _description(rnd: random.Random) -> str:
+    words = [rnd.choice(_WORDS + _ADJECTIVES) for _ in range(rnd.randint(8, 40))]
+    return "Отдам в хорошие руки: " + " ".join(words) + "."
+
+
+def _count(rnd: random.Random, mean: float) -> int:
+    """Случайное число со средним `mean` (целая часть + вероятность добавки)"""
+
+    base = int(mean)
+    return base + (1 if rnd.random() < mean - base else 0)
+
+
+def generate(engine, size: DatasetSize, seed: int = 42, batch: int = 5000) -> dict:
+    """Заполняет пустую схему; возвращает параметры, удобные для сценариев нагрузки"""
+
+    from backend.app import db, models  # noqa: F401  (metadata всех таблиц)
+    from backend.services import category_tree
+
+    rnd = random.Random(seed)
+    t = db.metadata.tables
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(t["roles"]), [
+            {"id": 1, "name": "admin", "description": "Администратор", "level": 100},
+            {"id": 2, "name": "manager", "description": "Менеджер", "level": 50},
+            {"id": 3, "name": "client", "description": "Клиент", "level": 10},
+        ])
+        # Двухуровневое дерево: первая пятая часть — корни, остальные — их подкатегории
+        roots = max(1, size.categories // 5)
+        conn.execute(insert(t["categories"]), [
+            {"id": i, "name": f"Категория {i}", "description": f"Описание категории {i}",
+             "parent_id": None if i <= roots else (i - 1) % roots + 1}
+            for i in range(1, size.categories + 1)
+        ])
+        for offset in range(0, size.users, batch):
+            ids = range(offset + 1, min(offset + batch, size.users) + 1)
+            conn.execute(insert(t["users"]), [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+                 "full_name": f"Пользователь {i}", "password_hash": password_hash, "is_active": True,
+                 "created_at": START, "updated_at": START}
+                for i in ids
+            ])
+            conn.execute(insert(t["user_roles"]), [
+                {"user_id": i, "role_id": 1 if i == 1 else 3} for i in ids
+            ])
+
+        for offset in range(0, size.items, batch):
+            items, images, comments, requests = [], [], [], []
+            for item_id in range(offset + 1, min(offset + batch, size.items) + 1):
+                created = START + timedelta(seconds=item_id * 37)
+                is_free = rnd.random() < 0.15
+                items.append({
+                    "id": item_id, "title": _title(rnd), "description": _description(rnd),
+                    "condition": rnd.choice(_CONDITIONS),
+                    "price": None if is_free or rnd.random() < 0.1 else float(rnd.randint(1, 500) * 100),
+                    "is_free": is_free, "is_exchangeable": rnd.random() < 0.3,
+                    "status": rnd.choice(_STATUSES), "owner_id": rnd.randint(1, size.users),
+                    "category_id": rnd.randint(1, size.categories),
+                    "created_at": created, "updated_at": created,
+                })
+                for n in range(_count(rnd, size.images_per_item)):
+                    images.append({"item_id": item_id, "file_path": f"bench/{item_id}_{n}.jpg",
+                                   "is_primary": n == 0, "created_at": created, "updated_at": created})
+                items[-1]["comment_count"] = 0
+                for n in range(_count(rnd, size.comments_per_item)):
+                    moment = created + timedelta(minutes=n + 1)
+                    is_deleted = rnd.random() < 0.05
+                    items[-1]["comment_count"] += not is_deleted
+                    comments.append({"item_id": item_id, "user_id": rnd.randint(1, size.users),
+                                     "text": _description(rnd), "is_deleted": is_deleted,
+                                     "created_at": moment, "updated_at": moment})
+                # Одна ожидающая заявка на пару (вещь, автор) — уникальный индекс exchange_requests
+                requesters = rnd.sample(range(1, size.users + 1), min(_count(rnd, size.requests_per_item), size.users))
+                for requester_id in requesters:
+                    requests.append({"requester_id": requester_id, "target_item_id": item_id,
+                                     "offered_item_id": rnd.randint(1, item_id), "status": "pending",
+                                     "message": "Готов обменяться", "created_at": created, "updated_at": created})
+            conn.execute(insert(t["items"]), items)
+            for table, rows in (("item_images", images), ("comments", comments), ("exchange_requests", requests)):
+                if rows:
+                    conn.execute(insert(t[table]), rows)
+        category_tree.rebuild(conn)
+
+    return {
+        "item_ids": (1, size.items),
+        "category_ids": (1, size.categories),
+        "search_terms": _WORDS[:8],
+        "username": "user1",
+        "password": BENCH_PASSWORD,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Синтетические данные для бенчмарков")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=DatasetSize.users)
+    parser.add_argument("--items", type=int, default=DatasetSize.items)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Пересоздать схему перед заполнением")
+    args = parser.parse_args(argv)
+
+    from backend.app import db, models  # noqa: F401
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    generate(engine, DatasetSize(users=args.users, items=args.items), seed=args.seed)
+    print(f"[OK] {args.users} пользователей, {args.items} объявлений")
+
+
+if __name__ == "__main__":
+    main()
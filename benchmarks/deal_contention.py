@@ -0,0 +1,188 @@
+"""Проверка сделок под параллельной нагрузкой (services/deals.py).
+
+Для каждой «популярной» вещи десятки покупателей одновременно отправляют
+заявки, затем владелец одновременно (несколько вкладок, двойные клики)
+принимает их все. То же — для обменов. После каждого раунда проверяются
+инварианты:
+
+- принята ровно одна заявка, остальные отклонены, ожидающих не осталось;
+- покупка: вещь sold и принадлежит автору принятой заявки;
+- обмен: обе вещи принятой заявки reserved, остальные предложенные — нет;
+- все неудачи — DealError, других исключений нет.
+
+Печатает число нарушений и задержки (p50/p95) операций; код возврата 1,
+если инварианты нарушены.
+
+Запуск (из корня репозитория):
+  python -m benchmarks.deal_contention --rounds 20 --buyers 40
+  python -m benchmarks.deal_contention --database-url postgresql://localhost/bench --json deals.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.load import percentile  # noqa: E402
+
+
+def _timed(app, func, *args):
+    """Вызывает func в своём контексте приложения: (результат | исключение, мс)"""
+
+    from backend.services import deals
+
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except deals.DealError as exc:
+            result = exc
+        except Exception as exc:  # noqa: BLE001 - считаем как нарушение
+            result = exc
+        return result, (time.perf_counter() - started) * 1000
+
+
+def _parallel(app, calls: list, workers: int) -> list:
+    start = threading.Event()
+
+    def run(call):
+        start.wait()  # все потоки стартуют одновременно
+        return _timed(app, *call)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, call) for call in calls]
+        start.set()
+        return [future.result() for future in futures]
+
+
+def _round(app, item_id: int, owner_id: int, buyers: list, exchange: bool, workers: int) -> dict:
+    from backend.app import db
+    from backend.app.models import ExchangeRequest, Item
+    from backend.services import deals
+
+    offered = {}
+    if exchange:
+        with app.app_context():
+            for buyer_id in buyers:
+                offered[buyer_id] = db.session.scalar(
+                    db.select(Item.id).where(Item.owner_id == buyer_id, Item.status == "available").limit(1)
+                )
+        buyers = [buyer_id for buyer_id in buyers if offered[buyer_id]]
+        calls = [(app, deals.request_exchange, item_id, b, offered[b], "обмен") for b in buyers]
+    else:
+        calls = [(app, deals.request_purchase, item_id, b) for b in buyers]
+    sent = _parallel(app, [call[1:] for call in calls], workers)
+
+    with app.app_context():
+        req_ids = db.session.scalars(
+            db.select(ExchangeRequest.id).where(ExchangeRequest.target_item_id == item_id)
+        ).all()
+    accepted = _parallel(app, [(deals.accept_request, req_id, owner_id) for req_id in req_ids], workers)
+
+    violations = []
+    unexpected = [r for r, _ in sent + accepted if isinstance(r, Exception) and not isinstance(r, deals.DealError)]
+    violations += [f"исключение: {exc!r}" for exc in unexpected]
+    with app.app_context():
+        rows = db.session.execute(
+            db.select(ExchangeRequest.requester_id, ExchangeRequest.offered_item_id, ExchangeRequest.status)
+            .where(ExchangeRequest.target_item_id == item_id)
+        ).all()
+        statuses = [row.status for row in rows]
+        winners = [row for row in rows if row.status == "accepted"]
+        if len(winners) != 1:
+            violations.append(f"вещь {item_id}: принято заявок {len(winners)}")
+        if statuses.count("pending"):
+            violations.append(f"вещь {item_id}: осталось ожидающих заявок {statuses.count('pending')}")
+        item = db.session.get(Item, item_id)
+        if winners and not exchange and (item.status != "sold" or item.owner_id != winners[0].requester_id):
+            violations.append(f"вещь {item_id}: {item.status}, владелец {item.owner_id}")
+        if winners and exchange:
+            reserved = db.session.scalars(
+                db.select(Item.id).where(Item.id.in_([item_id, *offered.values()]), Item.status == "reserved")
+            ).all()
+            if sorted(reserved) != sorted([item_id, winners[0].offered_item_id]):
+                violations.append(f"вещь {item_id}: зарезервированы {sorted(reserved)}")
+    return {
+        "violations": violations,
+        "send_ms": [ms for _, ms in sent],
+        "accept_ms": [ms for _, ms in accepted],
+        "accept_conflicts": sum(1 for r, _ in accepted if isinstance(r, deals.DealError)),
+    }
+
+
+def run(database_url: str, rounds: int, buyers: int, workers: int) -> dict:
+    from benchmarks.datagen import DatasetSize
+    from benchmarks.load import prepare_app
+
+    # Покупатели — пользователи 2..buyers+1, владелец «популярных» вещей — user1
+    size = DatasetSize(users=buyers + 1, items=(buyers + 1) * 5 + rounds * 2,
+                       comments_per_item=0, images_per_item=0, requests_per_item=0)
+    app, _ = prepare_app(database_url, size, seed=7)
+    from backend.app import db
+    from backend.app.models import Item
+
+    with app.app_context():
+        # Чистый старт: всё доступно, у популярных вещей есть цена
+        db.session.execute(db.update(Item).values(status="available", is_free=False, price=1000.0))
+        popular = db.session.scalars(
+            db.select(Item.id).order_by(Item.id.desc()).limit(rounds * 2)
+        ).all()
+        db.session.execute(db.update(Item).where(Item.id.in_(popular)).values(owner_id=1))
+        db.session.commit()
+        dialect = db.engine.dialect.name
+
+    buyer_ids = list(range(2, buyers + 2))
+    results = []
+    started = time.perf_counter()
+    for n in range(rounds):
+        results.append(_round(app, popular[2 * n], 1, buyer_ids, exchange=False, workers=workers))
+        results.append(_round(app, popular[2 * n + 1], 1, buyer_ids, exchange=True, workers=workers))
+    wall = time.perf_counter() - started
+
+    send_ms = sorted(ms for r in results for ms in r["send_ms"])
+    accept_ms = sorted(ms for r in results for ms in r["accept_ms"])
+    return {
+        "meta": {"dialect": dialect, "rounds": rounds, "buyers": buyers, "workers": workers},
+        "violations": [v for r in results for v in r["violations"]],
+        "accept_conflicts": sum(r["accept_conflicts"] for r in results),
+        "wall_s": round(wall, 2),
+        "send_ms": {"p50": round(percentile(send_ms, 50), 2), "p95": round(percentile(send_ms, 95), 2)},
+        "accept_ms": {"p50": round(percentile(accept_ms, 50), 2), "p95": round(percentile(accept_ms, 95), 2)},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сделки под параллельной нагрузкой")
+    parser.add_argument("--database-url", help="По умолчанию — временная SQLite-база")
+    parser.add_argument("--rounds", type=int, default=10, help="Раундов (покупка + обмен)")
+    parser.add_argument("--buyers", type=int, default=30, help="Покупателей на одну вещь")
+    parser.add_argument("--workers", type=int, default=16, help="Параллельных потоков")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-deals-"), "bench.db")
+    report = run(database_url, args.rounds, args.buyers, args.workers)
+
+    meta = report["meta"]
+    print(f"{meta['dialect']}: {meta['rounds']} раундов x {meta['buyers']} покупателей, {meta['workers']} потоков")
+    print(f"заявки:   p50 {report['send_ms']['p50']:.2f} ms, p95 {report['send_ms']['p95']:.2f} ms")
+    print(f"принятие: p50 {report['accept_ms']['p50']:.2f} ms, p95 {report['accept_ms']['p95']:.2f} ms, "
+          f"отказов из-за гонки: {report['accept_conflicts']}")
+    print(f"нарушений инвариантов: {len(report['violations'])} ({report['wall_s']} с)")
+    for violation in report["violations"][:20]:
+        print("  " + violation)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 1 if report["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""Нагрузочный бенчмарк основных страниц и API.
+
+Поднимает приложение через create_app на отдельной БД (временная SQLite
+или локальный PostgreSQL через --database-url), заполняет её генератором
+datagen.py и гоняет сценарии параллельными клиентами (потоки, у каждого —
+свой test_client и своя авторизованная сессия). Для каждого сценария
+считает p50/p95/p99 и среднее время ответа, пропускную способность,
+ошибки и число SQL-запросов на запрос.
+
+SQL считаются счётчиком на уровне Engine в потоке клиента, поэтому в
+итог попадают и запросы, выполненные при потоковой отдаче тела
+(экспорт xlsx/docx), которых нет в заголовке Server-Timing.
+
+Отчёт --json машиночитаемый; --compare печатает разницу с отчётом
+другого коммита:
+  python -m benchmarks.load --items 20000 --json before.json
+  git checkout <коммит> && python -m benchmarks.load --items 20000 --compare before.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Сценарии: имя → (нужна ли авторизация, функция построения URL)
+SCENARIOS = {
+    "index": (False, lambda rnd, ctx: "/"),
+    "items_date_desc": (False, lambda rnd, ctx: "/items?sort=date_desc"),
+    "items_price_asc": (False, lambda rnd, ctx: "/items?sort=price_asc"),
+    "items_price_desc": (False, lambda rnd, ctx: "/items?sort=price_desc"),
+    "items_relevance": (False, lambda rnd, ctx: f"/items?q={rnd.choice(ctx['search_terms'])}&sort=relevance"),
+    "items_category": (
+        False, lambda rnd, ctx: f"/items?category={rnd.randint(*ctx['category_ids'])}&status=available",
+    ),
+    "item_detail": (False, lambda rnd, ctx: f"/items/{rnd.randint(*ctx['item_ids'])}"),
+    "api_items": (True, lambda rnd, ctx: "/api/items?limit=50"),
+    "export_xlsx": (False, lambda rnd, ctx: f"/export/items.xlsx?category={rnd.randint(*ctx['category_ids'])}"),
+    "export_docx": (False, lambda rnd, ctx: f"/export/items.docx?category={rnd.randint(*ctx['category_ids'])}"),
+}
+
+_sql_counter = threading.local()
+
+
+def _count_sql(conn, cursor, statement, parameters, context, executemany) -> None:
+    _sql_counter.value = getattr(_sql_counter, "value", 0) + 1
+
+
+def percentile(values: list, pct: float) -> float:
+    """Перцентиль методом ближайшего ранга (values отсортированы)"""
+
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def prepare_app(database_url: str, size, seed: int):
+    """Создаёт приложение на чистой БД с данными; возвращает (app, контекст сценариев)"""
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("MAIL_OUTBOX_WORKER", "false")
+    os.environ.setdefault("IMAGE_WORKERS", "0")
+    # В синтетических данных пути изображений выдуманы — сборщик мусора не запускаем
+    os.environ.setdefault("IMAGE_GC_INTERVAL", "0")
+    os.environ.setdefault("COMMENTS_PURGE_INTERVAL", "0")
+
+    from backend.app import create_app, db
+    from backend.services import search
+    from benchmarks.datagen import generate
+
+    app = create_app()
+    if app.config["SQLALCHEMY_DATABASE_URI"] != database_url:
+        raise RuntimeError("config.py импортирован до настройки окружения бенчмарка")
+    app.config.update(WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        ctx = generate(db.engine, size, seed=seed)
+        search.rebuild_index()
+    return app, ctx
+
+
+def _login(client, ctx) -> None:
+    response = client.post(
+        "/auth/login", data={"username": ctx["username"], "password": ctx["password"]}
+    )
+    if response.status_code != 302:
+        raise RuntimeError(f"Не удалось войти пользователем {ctx['username']}: {response.status_code}")
+
+
+def run_scenario(app, ctx: dict, name: str, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    needs_login, build_url = SCENARIOS[name]
+    timings, sql_counts = [], []
+    errors = 0
+    lock = threading.Lock()
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def client_loop(index: int) -> None:
+        nonlocal errors
+        rnd = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        if needs_login:
+            _login(client, ctx)
+        for _ in range(warmup):
+            client.get(build_url(rnd, ctx)).close()
+        local_timings, local_sql, local_errors = [], [], 0
+        for _ in range(per_client[index]):
+            url = build_url(rnd, ctx)
+            _sql_counter.value = 0
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()  # дочитываем потоковые ответы
+            elapsed = (time.perf_counter() - started) * 1000
+            response.close()
+            local_timings.append(elapsed)
+            local_sql.append(_sql_counter.value)
+            if response.status_code >= 400:
+                local_errors += 1
+        with lock:
+            timings.extend(local_timings)
+            sql_counts.extend(local_sql)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(client_loop, i) for i in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "throughput_rps": round(len(timings) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(timings, 50), 2),
+            "p95": round(percentile(timings, 95), 2),
+            "p99": round(percentile(timings, 99), 2),
+            "mean": round(statistics.fmean(timings), 2) if timings else 0.0,
+            "max": round(timings[-1], 2) if timings else 0.0,
+        },
+        "sql_per_request": {
+            "mean": round(statistics.fmean(sql_counts), 2) if sql_counts else 0.0,
+            "max": max(sql_counts, default=0),
+        },
+    }
+
+
+def run(database_url: str, size, scenarios: list, requests: int, concurrency: int,
+        warmup: int, seed: int) -> dict:
+    app, ctx = prepare_app(database_url, size, seed)
+    event.listen(Engine, "before_cursor_execute", _count_sql)
+    try:
+        results = {
+            name: run_scenario(app, ctx, name, requests, concurrency, warmup, seed)
+            for name in scenarios
+        }
+    finally:
+        event.remove(Engine, "before_cursor_execute", _count_sql)
+    with app.app_context():
+        from backend.app import db
+        dialect = db.engine.dialect.name
+        db.engine.dispose()
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "dialect": dialect,
+            "dataset": size.as_dict(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "seed": seed,
+        },
+        "scenarios": results,
+    }
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    meta = report["meta"]
+    dataset = meta["dataset"]
+    print(
+        f"{meta['commit']} {meta['dialect']}: {dataset['items']} объявлений, {dataset['users']} пользователей, "
+        f"{meta['concurrency']} клиентов x {meta['requests']} запросов"
+    )
+    print(f"{'сценарий':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'SQL':>7}{'ошибки':>8}")
+    for name, data in report["scenarios"].items():
+        latency = data["latency_ms"]
+        print(
+            f"{name:<18}{latency['p50']:>9.2f}{latency['p95']:>9.2f}{latency['p99']:>9.2f}"
+            f"{data['throughput_rps']:>9.1f}{data['sql_per_request']['mean']:>7.1f}{data['errors']:>8}"
+        )
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        if old:
+            print(
+                f"{'  vs ' + baseline['meta']['commit']:<18}"
+                f"{_delta(latency['p50'], old['latency_ms']['p50']):>9}"
+                f"{_delta(latency['p95'], old['latency_ms']['p95']):>9}"
+                f"{_delta(latency['p99'], old['latency_ms']['p99']):>9}"
+                f"{_delta(data['throughput_rps'], old['throughput_rps']):>9}"
+                f"{data['sql_per_request']['mean'] - old['sql_per_request']['mean']:>+7.1f}"
+            )
+
+
+def main(argv=None) -> None:
+    from benchmarks.datagen import DatasetSize
+
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк страниц и API")
+    parser.add_argument("--database-url", help="По умолчанию — временная SQLite-база")
+    parser.add_argument("--users", type=int, default=DatasetSize.users)
+    parser.add_argument("--items", type=int, default=DatasetSize.items)
+    parser.add_argument("--images-per-item", type=float, default=DatasetSize.images_per_item)
+    parser.add_argument("--comments-per-item", type=float, default=DatasetSize.comments_per_item)
+    parser.add_argument("--requests-per-item", type=float, default=DatasetSize.requests_per_item)
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="Прогревочных запросов на клиента")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Сценарий (можно повторять); по умолчанию — все")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчёт в JSON")
+    parser.add_argument("--compare", help="JSON-отчёт предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-load-"), "bench.db")
+    size = DatasetSize(
+        users=args.users, items=args.items, images_per_item=args.images_per_item,
+        comments_per_item=args.comments_per_item, requests_per_item=args.requests_per_item,
+    )
+    report = run(database_url, size, args.scenario or list(SCENARIOS), args.requests,
+                 args.concurrency, args.warmup, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Вход под потоком перебора паролей (services/throttle.py).
+
+Атакующие потоки без пауз отправляют POST /auth/login с неверными
+паролями — с нескольких адресов и по нескольким именам, — а
+«настоящий» пользователь со своего адреса периодически входит с верным
+паролем. Прогон повторяется дважды: без ограничения попыток
+(THROTTLE_TYPE=null) и с ним. Для каждого режима печатает:
+
+- попыток атаки в секунду и долю ответов 429;
+- сколько раз за прогон считался хеш пароля (check_password_hash) и
+  сколько процессорного времени ушло на попытку;
+- p50/p95 времени входа настоящего пользователя и число неудачных входов.
+
+Запуск (из корня репозитория):
+  python -m benchmarks.login_attack --seconds 10 --attackers 16
+  python -m benchmarks.login_attack --attack-ips 50 --ip-burst 5 --json login.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.load import percentile  # noqa: E402
+
+LEGIT_ADDR = "10.0.0.1"
+
+
+class _HashCounter:
+    """Обёртка над check_password_hash в моделях: считает вызовы"""
+
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return self.func(*args, **kwargs)
+
+
+def _attack(app, usernames: list, addresses: list, deadline: float, index: int) -> dict:
+    client = app.test_client()
+    statuses: dict = {}
+    n = index
+    while time.perf_counter() < deadline:
+        response = client.post(
+            "/auth/login",
+            data={"username": usernames[n % len(usernames)], "password": f"wrong-{n}"},
+            environ_base={"REMOTE_ADDR": addresses[n % len(addresses)]},
+        )
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        n += 1
+    return statuses
+
+
+def _legit(app, ctx: dict, deadline: float, pause: float) -> dict:
+    timings, failures = [], 0
+    while time.perf_counter() < deadline:
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post(
+            "/auth/login", data={"username": ctx["username"], "password": ctx["password"]},
+            environ_base={"REMOTE_ADDR": LEGIT_ADDR},
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        failures += response.status_code != 302
+        time.sleep(pause)
+    return {"timings": sorted(timings), "failures": failures}
+
+
+def _run_mode(app, ctx: dict, throttled: bool, args) -> dict:
+    from backend.app import models
+    from backend.services.throttle import MemoryThrottle, ThrottleBackend, login_throttle
+
+    login_throttle.backend = MemoryThrottle() if throttled else ThrottleBackend()
+    limits = dict(login_throttle.limits)
+    if args.ip_burst:
+        limits["ip"] = (args.ip_burst, limits["ip"][1])
+    if args.user_burst:
+        limits["user"] = (args.user_burst, limits["user"][1])
+    login_throttle.limits = limits
+    counter = _HashCounter(models.check_password_hash)
+    models.check_password_hash = counter
+    usernames = [f"user{i}" for i in range(2, args.attack_users + 2)]
+    addresses = [f"203.0.113.{i % 250 + 1}" for i in range(args.attack_ips)]
+    cpu_started, started = time.process_time(), time.perf_counter()
+    deadline = started + args.seconds
+    try:
+        with ThreadPoolExecutor(max_workers=args.attackers + 1) as pool:
+            legit = pool.submit(_legit, app, ctx, deadline, args.legit_pause)
+            attacks = [pool.submit(_attack, app, usernames, addresses, deadline, i) for i in range(args.attackers)]
+            statuses: dict = {}
+            for future in attacks:
+                for status, count in future.result().items():
+                    statuses[status] = statuses.get(status, 0) + count
+            legit = legit.result()
+    finally:
+        models.check_password_hash = counter.func
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    attempts = sum(statuses.values())
+    return {
+        "attempts": attempts,
+        "attempts_per_s": round(attempts / wall, 1),
+        "rejected_429": statuses.get(429, 0),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "hash_checks": counter.calls,
+        "cpu_ms_per_attempt": round(cpu * 1000 / max(attempts + len(legit["timings"]), 1), 2),
+        "legit_logins": len(legit["timings"]),
+        "legit_failures": legit["failures"],
+        "legit_ms": {"p50": round(percentile(legit["timings"], 50), 1),
+                     "p95": round(percentile(legit["timings"], 95), 1)},
+    }
+
+
+def run(database_url: str, args) -> dict:
+    from benchmarks.datagen import DatasetSize
+    from benchmarks.load import prepare_app
+
+    size = DatasetSize(users=args.attack_users + 1, items=10, comments_per_item=0,
+                       images_per_item=0, requests_per_item=0)
+    app, ctx = prepare_app(database_url, size, seed=11)
+    with app.app_context():
+        from backend.app import db
+        dialect = db.engine.dialect.name
+    modes = {name: _run_mode(app, ctx, name == "throttled", args) for name in ("unthrottled", "throttled")}
+    return {
+        "meta": {"dialect": dialect, "seconds": args.seconds, "attackers": args.attackers,
+                 "attack_ips": args.attack_ips, "attack_users": args.attack_users},
+        "modes": modes,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Вход под потоком перебора паролей")
+    parser.add_argument("--database-url", help="По умолчанию — временная SQLite-база")
+    parser.add_argument("--seconds", type=float, default=10, help="Длительность каждого прогона")
+    parser.add_argument("--attackers", type=int, default=8, help="Атакующих потоков")
+    parser.add_argument("--attack-ips", type=int, default=1, help="Адресов атакующих")
+    parser.add_argument("--attack-users", type=int, default=20, help="Перебираемых имён")
+    parser.add_argument("--ip-burst", type=int, help="Запас корзины адреса (по умолчанию LOGIN_IP_BURST)")
+    parser.add_argument("--user-burst", type=int, help="Запас корзины имени (по умолчанию LOGIN_USER_BURST)")
+    parser.add_argument("--legit-pause", type=float, default=0.2, help="Пауза между входами пользователя, с")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-login-"), "bench.db")
+    report = run(database_url, args)
+
+    meta = report["meta"]
+    print(f"{meta['dialect']}: {meta['attackers']} потоков атаки с {meta['attack_ips']} адресов "
+          f"по {meta['attack_users']} именам, {meta['seconds']} с на режим")
+    print(f"{'режим':<13}{'попыток/с':>10}{'429':>8}{'хешей':>8}{'CPU мс':>8}{'вход p50':>10}{'p95':>8}{'отказов':>9}")
+    for name, data in report["modes"].items():
+        print(f"{name:<13}{data['attempts_per_s']:>10.1f}{data['rejected_429']:>8}{data['hash_checks']:>8}"
+              f"{data['cpu_ms_per_attempt']:>8.2f}{data['legit_ms']['p50']:>10.1f}{data['legit_ms']['p95']:>8.1f}"
+              f"{data['legit_failures']:>9}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
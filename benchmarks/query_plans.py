@@ -0,0 +1,177 @@
+"""Планы и время ключевых запросов до и после составных индексов.
+
+Создаёт отдельную БД, заполняет её синтетическими данными (datagen.py),
+затем дважды прогоняет запросы из routes/main.py: сначала на схеме
+без вторичных индексов (как было до миграции 8d2f4b6a1c37), потом с
+индексами из моделей. Для каждого запроса печатает план (EXPLAIN) и
+медиану времени.
+
+Запуск (из корня репозитория):
+  python -m benchmarks.query_plans --items 100000
+  python -m benchmarks.query_plans --database-url postgresql://localhost/bench --json plans.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app import db  # noqa: E402
+from backend.app import models  # noqa: E402,F401
+from benchmarks.datagen import DatasetSize, generate  # noqa: E402
+
+QUERIES = {
+    "index_latest_cards": (
+        "SELECT items.id, categories.name, "
+        "(SELECT item_images.file_path FROM item_images WHERE item_images.item_id = items.id "
+        " ORDER BY item_images.is_primary DESC, item_images.created_at LIMIT 1) "
+        "FROM items LEFT OUTER JOIN categories ON items.category_id = categories.id "
+        "ORDER BY items.created_at DESC, items.id DESC LIMIT 12"
+    ),
+    "items_list_status": (
+        "SELECT items.id FROM items WHERE items.status = :status "
+        "ORDER BY items.created_at DESC LIMIT 25"
+    ),
+    "items_list_category": (
+        "SELECT items.id FROM items WHERE items.category_id IN "
+        "(SELECT category_closure.descendant_id FROM category_closure "
+        " WHERE category_closure.ancestor_id = :category_id) "
+        "ORDER BY items.created_at DESC LIMIT 25"
+    ),
+    "items_facets": (
+        "SELECT items.category_id, items.status, items.condition, items.is_free, "
+        "items.is_exchangeable, count(*) FROM items GROUP BY items.category_id, "
+        "items.status, items.condition, items.is_free, items.is_exchangeable"
+    ),
+    "items_list_price_asc": (
+        "SELECT items.id FROM items WHERE items.price > :price "
+        "ORDER BY items.price, items.id LIMIT 25"
+    ),
+    "item_detail_images": (
+        "SELECT item_images.id FROM item_images WHERE item_images.item_id = :item_id "
+        "ORDER BY item_images.is_primary DESC, item_images.created_at"
+    ),
+    "item_detail_comments": (
+        "SELECT comments.id FROM comments WHERE comments.item_id = :item_id "
+        "AND comments.is_deleted = :is_deleted ORDER BY comments.created_at DESC"
+    ),
+    "item_detail_incoming_requests": (
+        "SELECT exchange_requests.id FROM exchange_requests "
+        "WHERE exchange_requests.target_item_id = :item_id AND exchange_requests.status = 'pending'"
+    ),
+    "dashboard_owner_items": (
+        "SELECT items.id FROM items WHERE items.owner_id = :owner_id ORDER BY items.created_at DESC"
+    ),
+    "dashboard_requests": (
+        "SELECT exchange_requests.id FROM exchange_requests "
+        "WHERE exchange_requests.requester_id = :owner_id ORDER BY exchange_requests.created_at DESC"
+    ),
+    "register_has_admin": "SELECT user_roles.id FROM user_roles WHERE user_roles.role_id = :role_id LIMIT 1",
+}
+
+# Индексы, появившиеся в миграции 8d2f4b6a1c37 (этап «до» работает без них)
+NEW_INDEXES = {
+    index.name
+    for table in db.metadata.tables.values()
+    for index in table.indexes
+    if len(index.columns) > 1 or index.name in {
+        "ix_exchange_requests_offered_item_id", "ix_donations_item_id", "ix_user_roles_role_id",
+    }
+}
+
+
+def seed(engine, n_items: int, n_users: int) -> dict:
+    """Заполняет БД генератором datagen; возвращает параметры для запросов"""
+
+    generate(engine, DatasetSize(users=n_users, items=n_items))
+    return {
+        "status": "reserved", "category_id": 7, "price": 49000, "item_id": n_items // 2,
+        "is_deleted": False, "owner_id": n_users // 2, "role_id": 1,
+    }
+
+
+def explain(conn, sql: str, params: dict) -> list:
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+        return [row[-1] for row in rows]
+    return [row[0] for row in conn.execute(text("EXPLAIN " + sql), params).all()]
+
+
+def measure(engine, params: dict, repeat: int) -> dict:
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {"median_ms": round(statistics.median(timings), 3),
+                             "plan": explain(conn, sql, params)}
+    return results
+
+
+def run(database_url: str, n_items: int, n_users: int, repeat: int) -> dict:
+    engine = create_engine(database_url)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in NEW_INDEXES:
+                    index.drop(conn)
+
+    params = seed(engine, n_items, n_users)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    before = measure(engine, params, repeat)
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in NEW_INDEXES:
+                    index.create(conn)
+        conn.execute(text("ANALYZE"))
+    after = measure(engine, params, repeat)
+    engine.dispose()
+    return {
+        "dialect": engine.dialect.name,
+        "items": n_items,
+        "users": n_users,
+        "queries": {name: {"before": before[name], "after": after[name]} for name in QUERIES},
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Планы запросов до/после составных индексов")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--database-url", help="По умолчанию — временная SQLite-база")
+    parser.add_argument("--json", dest="json_path", help="Сохранить результат в JSON")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-bench-"), "bench.db")
+    report = run(database_url, args.items, args.users, args.repeat)
+
+    print(f"{report['dialect']}: {report['items']} объявлений, {report['users']} пользователей")
+    for name, data in report["queries"].items():
+        before, after = data["before"], data["after"]
+        print(f"\n{name}: {before['median_ms']:.3f} ms -> {after['median_ms']:.3f} ms")
+        print("  до:    " + "\n         ".join(before["plan"]))
+        print("  после: " + "\n         ".join(after["plan"]))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Холодный старт: от запуска процесса до первого обслуженного запроса.
+
+Каждый замер — новый интерпретатор, как при развёртывании. Этапы:
+
+- ``import`` — интерпретатор и ``import main`` (create_app);
+- ``bootstrap`` — ``flask bootstrap`` на уже подготовленной базе
+  (повторный запуск при каждом развёртывании);
+- ``first_request`` — gunicorn с одним воркером: от запуска до первого
+  ответа 200 на PATH.
+
+Для сравнения те же этапы меряются в режиме ``eager``: docx, openpyxl,
+PIL и smtplib импортируются до приложения, как было до ленивых импортов.
+Строка «развёртывание» — bootstrap + first_request; для старого Procfile
+(три скрипта, каждый со своим create_app(), и sleep) она оценивается как
+3 × import (eager) + --legacy-sleep + first_request (eager).
+
+Запуск (из корня репозитория):
+  python -m benchmarks.startup --repeat 5
+  python -m benchmarks.startup --database-url postgresql://localhost/bench --json startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Модули, которые раньше импортировались вместе с routes/main.py
+EAGER_IMPORTS = "import docx, openpyxl, PIL.Image, PIL.ImageOps, smtplib"
+
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ)
+    env.update(DATABASE_URL=database_url, PYTHONPATH=ROOT)
+    # Фоновые потоки не нужны: меряется только старт
+    env.setdefault("MAIL_OUTBOX_WORKER", "false")
+    env.setdefault("IMAGE_WORKERS", "0")
+    env.setdefault("IMAGE_GC_INTERVAL", "0")
+    env.setdefault("COMMENTS_PURGE_INTERVAL", "0")
+    return env
+
+
+def _prefix(eager: bool) -> str:
+    return EAGER_IMPORTS + "; " if eager else ""
+
+
+def _timed_run(args: list, env: dict) -> float:
+    started = time.perf_counter()
+    subprocess.run(args, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_import(env: dict, eager: bool) -> float:
+    return _timed_run([sys.executable, "-c", _prefix(eager) + "import main"], env)
+
+
+def measure_bootstrap(env: dict) -> float:
+    return _timed_run([sys.executable, "-m", "flask", "--app", "main:app", "bootstrap"], env)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(env: dict, eager: bool, path: str, timeout: float) -> float:
+    port = _free_port()
+    # sys.argv[1:] уходит в разбор аргументов gunicorn
+    code = _prefix(eager) + "from gunicorn.app.wsgiapp import run; run()"
+    args = [sys.executable, "-c", code, "--bind", f"127.0.0.1:{port}", "--workers", "1", "main:app"]
+    url = f"http://127.0.0.1:{port}{path}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn завершился с кодом {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"{url} не ответил за {timeout} с")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _summary(samples: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def run(database_url: str, args) -> dict:
+    env = _env(database_url)
+    # Первый bootstrap создаёт схему и справочники; дальше меряются повторные
+    measure_bootstrap(env)
+    samples: dict = {}
+    for _ in range(args.repeat):
+        for eager in (False, True):
+            mode = "eager" if eager else "lazy"
+            samples.setdefault(f"import/{mode}", []).append(measure_import(env, eager))
+            samples.setdefault(f"first_request/{mode}", []).append(
+                measure_first_request(env, eager, args.path, args.timeout)
+            )
+        samples.setdefault("bootstrap", []).append(measure_bootstrap(env))
+    phases = {name: _summary(values) for name, values in samples.items()}
+
+    def median(name):
+        return phases[name]["median_ms"]
+
+    deploy = {
+        "legacy": round(3 * median("import/eager") + args.legacy_sleep * 1000 + median("first_request/eager"), 1),
+        "bootstrap": round(median("bootstrap") + median("first_request/lazy"), 1),
+    }
+    return {
+        "meta": {"database_url": database_url.split("@")[-1], "repeat": args.repeat, "path": args.path,
+                 "legacy_sleep": args.legacy_sleep},
+        "phases": phases,
+        "deploy_ms": deploy,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Время холодного старта приложения")
+    parser.add_argument("--database-url", help="По умолчанию — временная SQLite-база")
+    parser.add_argument("--repeat", type=int, default=5, help="Замеров каждого этапа")
+    parser.add_argument("--path", default="/", help="Адрес первого запроса")
+    parser.add_argument("--timeout", type=float, default=60, help="Сколько ждать первого ответа, с")
+    parser.add_argument("--legacy-sleep", type=float, default=5, help="Пауза старого Procfile перед gunicorn, с")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-startup-"), "bench.db")
+    report = run(database_url, args)
+
+    print(f"{report['meta']['database_url']}: {args.repeat} замеров, первый запрос GET {args.path}")
+    print(f"{'этап':<22}{'медиана':>10}{'мин':>10}{'макс':>10}")
+    for name, data in report["phases"].items():
+        print(f"{name:<22}{data['median_ms']:>10.1f}{data['min_ms']:>10.1f}{data['max_ms']:>10.1f}")
+    deploy = report["deploy_ms"]
+    print(f"развёртывание: старый Procfile ≈ {deploy['legacy']:.0f} мс, "
+          f"flask bootstrap + gunicorn ≈ {deploy['bootstrap']:.0f} мс")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,68 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'backend/app/static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
+    # Потоков фоновой обработки изображений; 0 — обрабатывать синхронно в запросе
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)
+    # Сборщик мусора загрузок: период фонового прохода (0 — только `flask images-gc`)
+    # и возраст, моложе которого файлы без ссылок не удаляются, секунд
+    IMAGE_GC_INTERVAL = int(os.environ.get('IMAGE_GC_INTERVAL') or 6 * 3600)
+    IMAGE_GC_GRACE = int(os.environ.get('IMAGE_GC_GRACE') or 3600)
+
+    # Размер страницы списка объявлений (keyset-пагинация)
+    ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE') or 24)
+    # Максимальный (и используемый по умолчанию) размер страницы GET /api/items
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE') or 100)
+    # Максимум элементов в POST/PATCH /api/items/batch
+    API_MAX_BATCH_SIZE = int(os.environ.get('API_MAX_BATCH_SIZE') or 500)
+
+    # Профилировщик SQL: заголовок Server-Timing и агрегаты в /api/admin/profiler
+    SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SQL_PROFILER_RING_SIZE = int(os.environ.get('SQL_PROFILER_RING_SIZE') or 200)
+    SQL_PROFILER_SLOW_TOP = int(os.environ.get('SQL_PROFILER_SLOW_TOP') or 5)
+
+    # Сколько секунд роли пользователя живут в кеше процесса (0 — только в пределах запроса)
+    ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL') or 60)
+
+    # Кеш страниц и справочников: memory (в процессе), redis (общий, CACHE_URL) или null
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'memory'
+    CACHE_URL = os.environ.get('CACHE_URL')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 300)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    # Лента «Последние объявления» на главной: число карточек и время жизни в кеше
+    FEED_SIZE = int(os.environ.get('FEED_SIZE') or 12)
+    FEED_TTL = int(os.environ.get('FEED_TTL') or 300)
+    # Счётчики фасетов списка объявлений (без поиска) в кеше, секунд; сбрасываются после изменений
+    FACETS_TTL = int(os.environ.get('FACETS_TTL') or 60)
+    # Снимок пользователя сессии (логин, email, ФИО...) в кеше процесса, секунд; 0 — отключить
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)
+    # Уведомления: опрос БД ждущим запросом и наибольшее ожидание, секунд
+    # (ожидание должно быть меньше --timeout gunicorn, по умолчанию 30); хранение прочитанных, дней
+    NOTIFY_POLL_INTERVAL = int(os.environ.get('NOTIFY_POLL_INTERVAL') or 15)
+    NOTIFY_POLL_TIMEOUT = int(os.environ.get('NOTIFY_POLL_TIMEOUT') or 20)
+    NOTIFY_RETENTION_DAYS = int(os.environ.get('NOTIFY_RETENTION_DAYS') or 30)
+    # Ограничение попыток входа/регистрации (token bucket): memory (в процессе), redis (общий,
+    # THROTTLE_URL или CACHE_URL) или null; корзина адреса и корзина имени — запас и пополнение в минуту
+    THROTTLE_TYPE = os.environ.get('THROTTLE_TYPE') or 'memory'
+    THROTTLE_URL = os.environ.get('THROTTLE_URL')
+    LOGIN_IP_BURST = int(os.environ.get('LOGIN_IP_BURST') or 20)
+    LOGIN_IP_PER_MINUTE = float(os.environ.get('LOGIN_IP_PER_MINUTE') or 20)
+    LOGIN_USER_BURST = int(os.environ.get('LOGIN_USER_BURST') or 5)
+    LOGIN_USER_PER_MINUTE = float(os.environ.get('LOGIN_USER_PER_MINUTE') or 3)
+    # Сколько обратных прокси стоит перед приложением: адрес клиента для лимитов и журнала
+    # берётся из X-Forwarded-For. По умолчанию 0 — соединения приходят напрямую, заголовкам
+    # X-Forwarded-* не доверяем (иначе их подделка обходит лимиты). На Railway (один прокси)
+    # 1 задают Procfile и railway.json
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS') or 0)
+    # Комментарии: размер страницы под объявлением; очистка мягко удалённых старше
+    # COMMENTS_PURGE_AGE дней раз в COMMENTS_PURGE_INTERVAL секунд (0 — только `flask comments-purge`)
+    COMMENTS_PER_PAGE = int(os.environ.get('COMMENTS_PER_PAGE') or 20)
+    COMMENTS_PURGE_INTERVAL = int(os.environ.get('COMMENTS_PURGE_INTERVAL') or 3600)
+    COMMENTS_PURGE_AGE = int(os.environ.get('COMMENTS_PURGE_AGE') or 30)
+    # Журнал действий: буфер в памяти процесса, запись пачками по размеру или по времени (секунд)
+    ACTIVITY_BUFFER_SIZE = int(os.environ.get('ACTIVITY_BUFFER_SIZE') or 10000)
+    ACTIVITY_FLUSH_SIZE = int(os.environ.get('ACTIVITY_FLUSH_SIZE') or 500)
+    ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL') or 2)
+    ACTIVITY_RETENTION_DAYS = int(os.environ.get('ACTIVITY_RETENTION_DAYS') or 180)
 
     # Email/SMTP
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -36,4 +98,16 @@ class Config:
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
     MAIL_USE_SSL = os.environ.get('MAIL_USE_SSL', 'false').lower() in ('1', 'true', 'yes')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME
-    MAIL_ADMIN_TO = os.environ.get('MAIL_ADMIN_TO') or os.environ.get('MAIL_DEFAULT_SENDER')
\ No newline at end of file
+    MAIL_ADMIN_TO = os.environ.get('MAIL_ADMIN_TO') or os.environ.get('MAIL_DEFAULT_SENDER')
+    MAIL_TIMEOUT = int(os.environ.get('MAIL_TIMEOUT') or 10)
+
+    # Очередь исходящей почты: фоновый поток в каждом воркере (false — только `flask mail-send`)
+    MAIL_OUTBOX_WORKER = os.environ.get('MAIL_OUTBOX_WORKER', 'true').lower() in ('1', 'true', 'yes')
+    MAIL_POLL_INTERVAL = int(os.environ.get('MAIL_POLL_INTERVAL') or 30)
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS') or 8)
+    # Задержка повтора: MAIL_RETRY_BASE * 2^(попытка-1), но не больше MAIL_RETRY_MAX секунд
+    MAIL_RETRY_BASE = int(os.environ.get('MAIL_RETRY_BASE') or 30)
+    MAIL_RETRY_MAX = int(os.environ.get('MAIL_RETRY_MAX') or 3600)
+    # Сколько секунд держать простаивающее SMTP-соединение открытым
+    MAIL_SMTP_IDLE = int(os.environ.get('MAIL_SMTP_IDLE') or 60)
\ No newline at end of file
@@ -94,9 +94,7 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
-    connectable = get_engine()
-
-    with connectable.connect() as connection:
+    def run(connection):
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +104,17 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+    # flask bootstrap передаёт соединение своей сессии: миграции идут в её транзакции
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        run(connection)
+        return
+
+    connectable = get_engine()
+
+    with connectable.connect() as connection:
+        run(connection)
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,33 @@
+"""items: covering index for facet counts
+
+Revision ID: 2d7a6c94e8b5
+Revises: 9f4c2e8b1d63
+Create Date: 2026-10-16 21:00:00.000000
+
+Счётчики фасетов списка (services/facets.py) группируют items по пяти
+колонкам; покрывающий индекс позволяет читать только его, не таблицу.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7a6c94e8b5'
+down_revision = '9f4c2e8b1d63'
+branch_labels = None
+depends_on = None
+
+_INDEX = 'ix_items_facets'
+_COLUMNS = ['category_id', 'status', 'condition', 'is_free', 'is_exchangeable']
+
+
+def upgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('items')}
+    if _INDEX not in existing:
+        with op.batch_alter_table('items', schema=None) as batch_op:
+            batch_op.create_index(_INDEX, _COLUMNS, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_index(_INDEX)
@@ -0,0 +1,42 @@
+"""item_images: content hash and processed variants
+
+Revision ID: 3a5c1e7f9b20
+Revises: 
+Create Date: 2026-10-16 10:00:00.000000
+
+Базы создавались через create_all(), поэтому ревизия проверяет наличие
+колонок и не падает на уже обновлённой схеме.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a5c1e7f9b20'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {col['name'] for col in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    existing = _columns('item_images')
+    with op.batch_alter_table('item_images', schema=None) as batch_op:
+        if 'content_hash' not in existing:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+            batch_op.create_index('ix_item_images_content_hash', ['content_hash'], unique=False)
+        if 'variants' not in existing:
+            batch_op.add_column(sa.Column('variants', sa.JSON(), nullable=True))
+        if 'processed_at' not in existing:
+            batch_op.add_column(sa.Column('processed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('item_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_images_content_hash')
+        batch_op.drop_column('processed_at')
+        batch_op.drop_column('variants')
+        batch_op.drop_column('content_hash')
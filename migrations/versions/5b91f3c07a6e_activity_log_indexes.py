@@ -0,0 +1,38 @@
+"""activity_logs: time-range indexes
+
+Revision ID: 5b91f3c07a6e
+Revises: e7b3d9a4f218
+Create Date: 2026-10-16 18:00:00.000000
+
+Журнал читается только в пределах временного окна, поэтому все индексы
+заканчиваются created_at.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b91f3c07a6e'
+down_revision = 'e7b3d9a4f218'
+branch_labels = None
+depends_on = None
+
+_INDEXES = {
+    'ix_activity_logs_created_at': ['created_at'],
+    'ix_activity_logs_event_created': ['event_type', 'created_at'],
+    'ix_activity_logs_user_created': ['user_id', 'created_at'],
+}
+
+
+def upgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('activity_logs')}
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        for name, columns in _INDEXES.items():
+            if name not in existing:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        for name in reversed(list(_INDEXES)):
+            batch_op.drop_index(name)
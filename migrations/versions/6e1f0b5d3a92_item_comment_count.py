@@ -0,0 +1,41 @@
+"""items.comment_count and purge index for soft-deleted comments
+
+Revision ID: 6e1f0b5d3a92
+Revises: 2d7a6c94e8b5
+Create Date: 2026-10-16 22:00:00.000000
+
+Счётчик заполняется по существующим неудалённым комментариям.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f0b5d3a92'
+down_revision = '2d7a6c94e8b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'comment_count' not in {col['name'] for col in inspector.get_columns('items')}:
+        with op.batch_alter_table('items', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+
+    if 'ix_comments_deleted_updated' not in {index['name'] for index in inspector.get_indexes('comments')}:
+        with op.batch_alter_table('comments', schema=None) as batch_op:
+            batch_op.create_index('ix_comments_deleted_updated', ['is_deleted', 'updated_at'], unique=False)
+
+    op.execute(
+        "UPDATE items SET comment_count = ("
+        "SELECT COUNT(*) FROM comments "
+        "WHERE comments.item_id = items.id AND NOT COALESCE(comments.is_deleted, false))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_deleted_updated')
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
@@ -0,0 +1,51 @@
+"""composite indexes for listing, detail and dashboard queries
+
+Revision ID: 8d2f4b6a1c37
+Revises: 3a5c1e7f9b20
+Create Date: 2026-10-16 10:05:00.000000
+
+Индексы повторяют фильтры и сортировки из routes/main.py:
+лента и keyset-пагинация (created_at, id), фильтры по статусу и категории,
+сортировка по цене, основное фото карточки, комментарии, входящие заявки,
+кабинет пользователя и проверка ролей. Уже существующие индексы пропускаются.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4b6a1c37'
+down_revision = '3a5c1e7f9b20'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('items', 'ix_items_created_at_id', ['created_at', 'id']),
+    ('items', 'ix_items_status_created_at', ['status', 'created_at']),
+    ('items', 'ix_items_category_created_at', ['category_id', 'created_at']),
+    ('items', 'ix_items_owner_created_at', ['owner_id', 'created_at']),
+    ('items', 'ix_items_price_id', ['price', 'id']),
+    ('item_images', 'ix_item_images_item_primary_created', ['item_id', 'is_primary', 'created_at']),
+    ('comments', 'ix_comments_item_deleted_created', ['item_id', 'is_deleted', 'created_at']),
+    ('exchange_requests', 'ix_exchange_requests_target_status', ['target_item_id', 'status']),
+    ('exchange_requests', 'ix_exchange_requests_requester_created', ['requester_id', 'created_at']),
+    ('exchange_requests', 'ix_exchange_requests_offered_item_id', ['offered_item_id']),
+    ('donations', 'ix_donations_donor_created', ['donor_id', 'created_at']),
+    ('donations', 'ix_donations_item_id', ['item_id']),
+    ('user_roles', 'ix_user_roles_user_role', ['user_id', 'role_id']),
+    ('user_roles', 'ix_user_roles_role_id', ['role_id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, name, columns in INDEXES:
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for table, name, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
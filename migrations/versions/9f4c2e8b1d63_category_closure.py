@@ -0,0 +1,62 @@
+"""categories: closure table and item counters
+
+Revision ID: 9f4c2e8b1d63
+Revises: 5b91f3c07a6e
+Create Date: 2026-10-16 20:00:00.000000
+
+Таблица замыкания строится по parent_id, счётчики — по items; дальше их
+поддерживает backend/services/category_tree.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f4c2e8b1d63'
+down_revision = '5b91f3c07a6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'item_count' not in {col['name'] for col in inspector.get_columns('categories')}:
+        with op.batch_alter_table('categories', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'))
+    if not inspector.has_table('category_closure'):
+        op.create_table(
+            'category_closure',
+            sa.Column('ancestor_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('descendant_id', sa.Integer(), sa.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('depth', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        )
+        op.create_index('ix_category_closure_descendant', 'category_closure', ['descendant_id', 'ancestor_id'])
+
+    parents = dict(bind.execute(sa.text('SELECT id, parent_id FROM categories')).all())
+    rows = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node is not None and node in parents and node not in seen:
+            seen.add(node)
+            rows.append({'ancestor_id': node, 'descendant_id': category_id, 'depth': depth})
+            node, depth = parents[node], depth + 1
+    op.execute('DELETE FROM category_closure')
+    if rows:
+        bind.execute(
+            sa.text('INSERT INTO category_closure (ancestor_id, descendant_id, depth) '
+                    'VALUES (:ancestor_id, :descendant_id, :depth)'),
+            rows,
+        )
+    op.execute(
+        'UPDATE categories SET item_count = '
+        '(SELECT COUNT(*) FROM items WHERE items.category_id = categories.id)'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_category_closure_descendant', table_name='category_closure')
+    op.drop_table('category_closure')
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_column('item_count')
@@ -0,0 +1,48 @@
+"""exchange_requests: one pending request per item and requester
+
+Revision ID: a1d5f8c3e604
+Revises: 6e1f0b5d3a92
+Create Date: 2026-10-16 23:00:00.000000
+
+Частичный уникальный индекс не даёт параллельным запросам создать две
+ожидающие заявки одного пользователя на одну вещь. Уже накопившиеся
+дубликаты отклоняются (остаётся самая ранняя заявка). В MySQL частичных
+индексов нет — миграция там ничего не делает.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d5f8c3e604'
+down_revision = '6e1f0b5d3a92'
+branch_labels = None
+depends_on = None
+
+_INDEX = 'uq_exchange_requests_pending'
+_DIALECTS = ('postgresql', 'sqlite')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name not in _DIALECTS:
+        return
+    existing = {index['name'] for index in sa.inspect(bind).get_indexes('exchange_requests')}
+    if _INDEX in existing:
+        return
+    op.execute(
+        "UPDATE exchange_requests SET status = 'declined' "
+        "WHERE status = 'pending' AND id NOT IN ("
+        "SELECT MIN(id) FROM exchange_requests WHERE status = 'pending' "
+        "GROUP BY target_item_id, requester_id)"
+    )
+    op.create_index(
+        _INDEX, 'exchange_requests', ['target_item_id', 'requester_id'], unique=True,
+        postgresql_where=sa.text("status = 'pending'"), sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name not in _DIALECTS:
+        return
+    op.drop_index(_INDEX, table_name='exchange_requests')
@@ -0,0 +1,48 @@
+"""outbound_emails: persistent mail outbox
+
+Revision ID: c4e8a2d61f05
+Revises: 8d2f4b6a1c37
+Create Date: 2026-10-16 11:00:00.000000
+
+Очередь исходящих писем для фоновой отправки (backend/services/mail.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2d61f05'
+down_revision = '8d2f4b6a1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('outbound_emails'):
+        return
+    op.create_table(
+        'outbound_emails',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sender', sa.String(length=255), nullable=False),
+        sa.Column('recipients', sa.String(length=1024), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('reply_to', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_outbound_emails_status_next_attempt', 'outbound_emails',
+        ['status', 'next_attempt_at'], unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_outbound_emails_status_next_attempt', table_name='outbound_emails')
+    op.drop_table('outbound_emails')
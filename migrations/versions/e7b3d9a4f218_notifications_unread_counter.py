@@ -0,0 +1,58 @@
+"""notifications: unread counter, link and indexes
+
+Revision ID: e7b3d9a4f218
+Revises: c4e8a2d61f05
+Create Date: 2026-10-16 14:00:00.000000
+
+Счётчик непрочитанных в users заполняется по существующим уведомлениям.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d9a4f218'
+down_revision = 'c4e8a2d61f05'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {col['name'] for col in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'unread_notifications' not in _columns('users'):
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column('unread_notifications', sa.Integer(), nullable=False, server_default='0')
+            )
+
+    existing = _columns('notifications')
+    indexes = _indexes('notifications')
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        if 'link' not in existing:
+            batch_op.add_column(sa.Column('link', sa.String(length=255), nullable=True))
+        if 'ix_notifications_user_id_id' not in indexes:
+            batch_op.create_index('ix_notifications_user_id_id', ['user_id', 'id'], unique=False)
+        if 'ix_notifications_is_read_created' not in indexes:
+            batch_op.create_index('ix_notifications_is_read_created', ['is_read', 'created_at'], unique=False)
+
+    op.execute(
+        "UPDATE users SET unread_notifications = ("
+        "SELECT COUNT(*) FROM notifications "
+        "WHERE notifications.user_id = users.id AND NOT COALESCE(notifications.is_read, false))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_is_read_created')
+        batch_op.drop_index('ix_notifications_user_id_id')
+        batch_op.drop_column('link')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('unread_notifications')
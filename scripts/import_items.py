@@ -0,0 +1,57 @@
+"""Массовый импорт объявлений из XLSX/CSV (партнёрские выгрузки).
+Примеры (Windows PowerShell):
+  # Проверить файл, ничего не загружая
+  #   python .\scripts\import_items.py partner.xlsx --owner partner --dry-run
+  # Загрузить объявления от имени пользователя partner
+  #   python .\scripts\import_items.py partner.csv --owner partner
+
+Первая строка файла — заголовки (Название, Описание, Категория, Состояние,
+Цена, Бесплатно, Обмен или title, description, category...). Правила
+проверки — как у формы объявления, см. backend/services/importer.py.
+"""
+import sys
+import argparse
+import time
+from typing import List
+from backend.app import create_app  # type: ignore
+from backend.app.models import User  # type: ignore
+from backend.services import importer  # type: ignore
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Импорт объявлений из XLSX/CSV")
+    parser.add_argument("path", help="Файл .xlsx или .csv")
+    parser.add_argument("--owner", required=True, help="Логин владельца объявлений")
+    parser.add_argument("--dry-run", action="store_true", help="Только проверить строки")
+    parser.add_argument("--batch", type=int, default=importer.IMPORT_BATCH, help="Строк в одной вставке")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        owner = User.query.filter_by(username=args.owner).first()
+        if not owner:
+            print(f"[!] Пользователь {args.owner!r} не найден")
+            return 1
+        started = time.perf_counter()
+        try:
+            with open(args.path, "rb") as fh:
+                report = importer.import_items(
+                    fh, args.path, owner.id, dry_run=args.dry_run, batch_size=args.batch
+                )
+        except importer.ImportFormatError as exc:
+            print(f"[!] {exc}")
+            return 1
+        elapsed = time.perf_counter() - started
+
+    for line, message in report.errors:
+        print(f"[!] Строка {line}: {message}")
+    if report.error_count > len(report.errors):
+        print(f"[!] ... и ещё {report.error_count - len(report.errors)} строк с ошибками")
+    verb = "проверено" if report.dry_run else "загружено"
+    print(f"[OK] Строк: {report.total}, {verb}: {report.imported}, "
+          f"с ошибками: {report.error_count} ({elapsed:.1f} с)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
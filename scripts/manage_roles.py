@@ -8,12 +8,17 @@
   #   python .\scripts\manage_roles.py add  --user ivan --role manager
   # Забрать роль
   #   python .\scripts\manage_roles.py remove --user ivan --role manager
+
+Запущенное веб-приложение держит роли в кеше процесса: изменение,
+сделанное этим скриптом, вступит в силу не позже чем через
+ROLE_CACHE_TTL секунд (см. backend/app/roles.py).
 """
 import sys
 import argparse
 from typing import Optional, List
 from backend.app import create_app, db  # type: ignore
 from backend.app.models import User, Role, UserRole  # type: ignore
+from backend.services.activity import activity_log  # type: ignore
 
 
 def list_roles(username: Optional[str] = None):
@@ -42,6 +47,7 @@ def add_role(username: str, role_name: str):
         return
     db.session.add(UserRole(user_id=u.id, role_id=role.id))
     db.session.commit()
+    activity_log.record("role.add", None, target_user_id=u.id, role=role_name, source="manage_roles")
     print(f"[OK] Роль {role_name} выдана пользователю {username}")
 
 
@@ -60,6 +66,7 @@ def remove_role(username: str, role_name: str):
         return
     db.session.delete(link)
     db.session.commit()
+    activity_log.record("role.remove", None, target_user_id=u.id, role=role_name, source="manage_roles")
     print(f"[OK] Роль {role_name} снята у пользователя {username}")
 
 
@@ -88,6 +95,7 @@ def main(argv: List[str]):
             add_role(args.user, args.role)
         elif args.cmd == "remove":
             remove_role(args.user, args.role)
+        activity_log.shutdown()  # дописать журнал до выхода
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+"""Общие фикстуры: приложение на временной SQLite-базе с синтетическими данными.
+
+config.py читает окружение при импорте, поэтому оно задаётся здесь, до
+импорта приложения; данные создаёт тот же генератор, что и для бенчмарков.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+DATABASE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecobg-tests-"), "test.db")
+os.environ["DATABASE_URL"] = DATABASE_URL
+# Кеш и ограничение попыток выключены: тесты видят каждый запрос к БД и не упираются в 429
+os.environ["CACHE_TYPE"] = "null"
+os.environ["THROTTLE_TYPE"] = "null"
+os.environ["MAIL_OUTBOX_WORKER"] = "false"
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """(app, ctx): приложение и параметры сгенерированных данных (user1 — администратор)"""
+
+    from benchmarks.datagen import DatasetSize
+    from benchmarks.load import prepare_app
+
+    size = DatasetSize(users=10, items=60, categories=10, images_per_item=2,
+                       comments_per_item=3, requests_per_item=2.5)
+    return prepare_app(DATABASE_URL, size, seed=7)
+
+
+@pytest.fixture
+def app(seeded):
+    return seeded[0]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client, seeded):
+    """Входит под пользователем (по умолчанию user1) и возвращает клиент"""
+
+    def do_login(username=None):
+        ctx = seeded[1]
+        response = client.post(
+            "/auth/login", data={"username": username or ctx["username"], "password": ctx["password"]}
+        )
+        assert response.status_code == 302, response.status_code
+        return client
+
+    return do_login
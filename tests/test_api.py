@@ -0,0 +1,23 @@
+"""Разбор параметров JSON API: некорректные значения не приводят к 500."""
+from backend.repositories import encode_cursor
+from backend.services.activity import activity_log
+
+
+def test_notifications_limit_is_clamped(login):
+    client = login("user10")
+    for limit in (0, -5, 1000):
+        response = client.get(f"/api/notifications?limit={limit}")
+        assert response.status_code == 200, limit
+        data = response.get_json()
+        assert len(data["notifications"]) <= max(1, min(limit, 200))
+
+
+def test_activity_malformed_cursor_returns_first_page(app, login):
+    client = login()
+    with app.app_context():
+        activity_log.flush()  # вход пишется в журнал — страница не должна меняться между запросами
+    first = client.get("/api/admin/activity").get_json()
+    for position in ([1, 2], ["не дата", 2], ["2026-01-01T00:00:00", "2"], {"a": 1}, "x"):
+        response = client.get("/api/admin/activity?cursor=" + encode_cursor(position))
+        assert response.status_code == 200, position
+        assert response.get_json()["entries"] == first["entries"]
@@ -0,0 +1,91 @@
+"""Сделки под параллельными запросами (services/deals.py).
+
+Те же инварианты, что проверяет benchmarks/deal_contention.py, но на одной
+вещи: из одновременно принимаемых заявок принята ровно одна, остальные
+отклонены, вещь продана её автору.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.app import db
+from backend.app.models import ExchangeRequest, Item
+from backend.services import deals
+
+OWNER_ID = 1
+BUYER_IDS = list(range(2, 11))
+
+
+def _parallel(app, calls: list) -> list:
+    """Вызывает (func, *args) одновременно, каждый в своём контексте; результат или DealError"""
+
+    start = threading.Event()
+
+    def run(call):
+        func, *args = call
+        start.wait()
+        with app.app_context():
+            try:
+                return func(*args)
+            except deals.DealError as exc:
+                return exc
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(run, call) for call in calls]
+        start.set()
+        return [future.result() for future in futures]
+
+
+@pytest.fixture
+def item_id(app):
+    """Новая вещь user1 на продажу, без заявок"""
+
+    with app.app_context():
+        item = Item(title="Велосипед", description="Почти новый", condition="good", price=1000.0,
+                    is_free=False, status="available", owner_id=OWNER_ID, category_id=1)
+        db.session.add(item)
+        db.session.commit()
+        return item.id
+
+
+def _requests(app, item_id: int) -> list:
+    with app.app_context():
+        return db.session.execute(
+            db.select(ExchangeRequest.id, ExchangeRequest.requester_id, ExchangeRequest.status)
+            .where(ExchangeRequest.target_item_id == item_id)
+        ).all()
+
+
+def test_parallel_accepts_sell_item_once(app, item_id):
+    sent = _parallel(app, [(deals.request_purchase, item_id, buyer_id) for buyer_id in BUYER_IDS])
+    assert not [r for r in sent if isinstance(r, Exception)]
+
+    req_ids = [row.id for row in _requests(app, item_id)]
+    accepted = _parallel(app, [(deals.accept_request, req_id, OWNER_ID) for req_id in req_ids])
+    assert all(r == item_id or isinstance(r, deals.DealError) for r in accepted)
+
+    rows = _requests(app, item_id)
+    statuses = sorted(row.status for row in rows)
+    assert statuses == ["accepted"] + ["declined"] * (len(BUYER_IDS) - 1)
+    winner = next(row for row in rows if row.status == "accepted")
+    with app.app_context():
+        item = db.session.get(Item, item_id)
+        assert (item.status, item.owner_id) == ("sold", winner.requester_id)
+
+
+def test_parallel_duplicate_requests_create_one(app, item_id):
+    sent = _parallel(app, [(deals.request_purchase, item_id, BUYER_IDS[0])] * 6)
+    errors = [r for r in sent if isinstance(r, deals.DealError)]
+    assert len(errors) == len(sent) - 1
+    assert [row.status for row in _requests(app, item_id)] == ["pending"]
+
+
+def test_unique_index_rejects_duplicate_pending(app, item_id, monkeypatch):
+    # Гонка, при которой оба запроса прошли проверку до INSERT
+    monkeypatch.setattr(deals, "_has_pending_request", lambda *args: False)
+    with app.app_context():
+        deals.request_purchase(item_id, BUYER_IDS[0])
+        with pytest.raises(deals.DealError, match="уже отправили"):
+            deals.request_purchase(item_id, BUYER_IDS[0])
+    assert len(_requests(app, item_id)) == 1
@@ -0,0 +1,63 @@
+"""Лента главной (services/feed.py): обновление кеша без потери параллельных правок."""
+import pytest
+
+from backend.app import db
+from backend.app.models import Item
+from backend.services import feed
+from backend.services.cache import MemoryCache, RedisCache, cache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryCache()
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(client=fakeredis.FakeRedis())
+
+
+def test_replace_is_compare_and_set(backend):
+    assert not backend.replace("k", (1,), (2,), 60)  # ключа нет
+    backend.set("k", (1,), 60)
+    assert not backend.replace("k", (0,), (2,), 60)
+    assert backend.get("k") == (1,)
+    assert backend.replace("k", (1,), (2,), 60)
+    assert backend.get("k") == (2,)
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    backend = MemoryCache()
+    monkeypatch.setattr(cache, "backend", backend)
+    return backend
+
+
+def _rename_first_card(app, title: str) -> int:
+    with app.app_context():
+        item_id = feed.latest_cards()[0].id
+        db.session.execute(db.update(Item).where(Item.id == item_id).values(title=title))
+        db.session.commit()
+        return item_id
+
+
+def test_refresh_merges_changed_item(app, memory_cache):
+    item_id = _rename_first_card(app, "Новое название")
+    with app.app_context():
+        feed.refresh_items([item_id])
+        assert cache.get(feed.FEED_KEY)[0].title == "Новое название"
+
+
+def test_refresh_conflict_invalidates(app, memory_cache, monkeypatch):
+    item_id = _rename_first_card(app, "Параллельная правка")
+    read = cache.get
+
+    def racing_get(key, default=None):
+        # Другой воркер записывает свою версию ленты сразу после нашего чтения
+        value = read(key, default)
+        memory_cache.set(key, value[1:], 300)
+        return value
+
+    monkeypatch.setattr(cache, "get", racing_get)
+    with app.app_context():
+        feed.latest_cards()
+        feed.refresh_items([item_id])
+    assert read(feed.FEED_KEY) is None
@@ -0,0 +1,130 @@
+"""Очередь почты (services/mail.py) против настоящего SMTP-сервера на localhost.
+
+aiosmtpd принимает письма в память; ответ на DATA можно подменить кодом
+4xx, чтобы проверить повторы с экспоненциальной задержкой и переход в dead
+после MAIL_MAX_ATTEMPTS попыток.
+"""
+import socket
+from datetime import datetime, timedelta
+from email import message_from_bytes, policy
+
+import pytest
+
+from backend.app import db
+from backend.app.models import OutboundEmail
+from backend.services import mail
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    """Запоминает принятые письма; `reply` — ответ на DATA вместо 250"""
+
+    def __init__(self):
+        self.messages = []
+        self.reply = None
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reply:
+            return self.reply
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_handler():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+@pytest.fixture
+def sender(app, smtp_handler, monkeypatch):
+    """Отправитель очереди, настроенный на локальный сервер"""
+
+    _, port = smtp_handler
+    for key, value in {
+        "MAIL_SERVER": "127.0.0.1", "MAIL_PORT": port, "MAIL_USE_TLS": False, "MAIL_USE_SSL": False,
+        "MAIL_USERNAME": None, "MAIL_PASSWORD": None, "MAIL_DEFAULT_SENDER": "noreply@example.com",
+        "MAIL_MAX_ATTEMPTS": 3, "MAIL_RETRY_BASE": 30, "MAIL_RETRY_MAX": 3600,
+    }.items():
+        monkeypatch.setitem(app.config, key, value)
+    mail_sender = app.extensions["mail_sender"]
+    yield mail_sender
+    mail_sender.close()
+
+
+def _enqueue(app, subject: str) -> int:
+    with app.app_context():
+        email = mail.enqueue_email(subject, "Текст письма", ["user@example.com"], config=app.config)
+        db.session.commit()
+        return email.id
+
+
+def _load(app, email_id: int) -> OutboundEmail:
+    with app.app_context():
+        email = db.session.get(OutboundEmail, email_id)
+        db.session.expunge(email)
+        return email
+
+
+def _make_due(app, email_id: int) -> None:
+    """Повтор наступил: переносим next_attempt_at в прошлое"""
+
+    with app.app_context():
+        db.session.execute(
+            db.update(OutboundEmail).where(OutboundEmail.id == email_id)
+            .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        db.session.commit()
+
+
+def test_drain_delivers_message(app, smtp_handler, sender):
+    handler, _ = smtp_handler
+    email_id = _enqueue(app, "Новая заявка")
+
+    assert sender.drain() == 1
+
+    email = _load(app, email_id)
+    assert (email.status, email.attempts, email.last_error) == (mail.SENT, 0, None)
+    assert email.sent_at is not None
+    [envelope] = handler.messages
+    assert envelope.mail_from == "noreply@example.com"
+    assert envelope.rcpt_tos == ["user@example.com"]
+    message = message_from_bytes(envelope.content, policy=policy.default)
+    assert message["Subject"] == "Новая заявка"
+    assert message.get_content().strip() == "Текст письма"
+
+
+def test_temporary_failure_backs_off_then_dead(app, smtp_handler, sender):
+    handler, _ = smtp_handler
+    handler.reply = "451 4.3.0 Try again later"
+    email_id = _enqueue(app, "Повтор")
+
+    delays = []
+    for attempt in (1, 2):
+        started = datetime.utcnow()
+        sender.drain()
+        email = _load(app, email_id)
+        assert (email.status, email.attempts) == (mail.PENDING, attempt)
+        assert "451" in email.last_error
+        delays.append((email.next_attempt_at - started).total_seconds())
+        # До наступления повтора письмо не отправляется
+        assert sender.drain() == 0
+        _make_due(app, email_id)
+    # MAIL_RETRY_BASE * 2^(попытка-1)
+    assert delays[0] == pytest.approx(30, abs=2)
+    assert delays[1] == pytest.approx(60, abs=2)
+
+    sender.drain()
+    email = _load(app, email_id)
+    assert (email.status, email.attempts) == (mail.DEAD, 3)
+    assert handler.messages == []
@@ -0,0 +1,23 @@
+"""Профилировщик SQL (app/profiler.py): потоковые ответы учитываются целиком."""
+import re
+
+import pytest
+
+
+@pytest.mark.parametrize("path, endpoint", [
+    ("/export/items.xlsx", "main.export_items_xlsx"),
+    ("/export/items.docx", "main.export_items_docx"),
+])
+def test_streamed_export_sql_is_recorded(app, client, path, endpoint):
+    profiler = app.extensions["sql_profiler"]
+    profiler.reset()
+    response = client.get(path)
+    assert response.status_code == 200
+    assert endpoint not in profiler.snapshot()  # тело ещё не отдано
+    header_count = int(re.search(r'desc="(\d+) SQL"', response.headers["Server-Timing"]).group(1))
+    response.get_data()
+    response.close()
+
+    summary = profiler.snapshot()[endpoint]
+    assert summary["requests_total"] == 1
+    assert summary["max_queries"] > header_count  # SQL при отдаче тела тоже учтён
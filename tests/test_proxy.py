@@ -0,0 +1,7 @@
+"""Адрес клиента: без явного PROXY_FIX_HOPS заголовкам X-Forwarded-* не доверяем."""
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+def test_forwarded_headers_ignored_by_default(app):
+    assert app.config["PROXY_FIX_HOPS"] == 0
+    assert not isinstance(app.wsgi_app, ProxyFix)
@@ -0,0 +1,74 @@
+"""Бюджеты SQL-запросов страниц (repositories/testing.query_budget).
+
+Число запросов страницы не должно зависеть от числа карточек, комментариев
+и заявок на ней: N+1 в шаблоне или представлении сразу превышает бюджет.
+Кеши ролей и пользователя сессии перед каждым запросом сбрасываются —
+бюджет рассчитан на холодный старт; буфер журнала действий записывается
+заранее.
+"""
+import pytest
+
+from backend.app import db
+from backend.app.models import Comment, ExchangeRequest, Item, ItemImage
+from backend.app.roles import invalidate_roles
+from backend.app.session_user import invalidate_users
+from backend.repositories.testing import query_budget
+from backend.services.activity import activity_log
+
+
+@pytest.fixture
+def rich_item_id(app):
+    """Объявление user1 с несколькими фото, комментариями и ожидающими заявками"""
+
+    with app.app_context():
+        def counted(model, column):
+            return db.select(db.func.count()).where(column == Item.id, *(
+                [model.is_deleted.is_(False)] if model is Comment else
+                [model.status == "pending"] if model is ExchangeRequest else []
+            )).correlate(Item).scalar_subquery()
+
+        item_id = db.session.scalar(
+            db.select(Item.id).where(
+                Item.owner_id == 1,
+                counted(ItemImage, ItemImage.item_id) >= 2,
+                counted(Comment, Comment.item_id) >= 2,
+                counted(ExchangeRequest, ExchangeRequest.target_item_id) >= 2,
+            ).limit(1)
+        )
+    assert item_id is not None, "в сгенерированных данных нет подходящего объявления"
+    return item_id
+
+
+def _get_within_budget(app, client, path: str, budget: int):
+    invalidate_users()
+    invalidate_roles()
+    with app.app_context():
+        # События предыдущих тестов записываются заранее, а не внутри замера
+        activity_log.flush()
+    with app.app_context(), query_budget(budget):
+        response = client.get(path)
+    assert response.status_code == 200, path
+    return response
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/", 2),
+    ("/items", 7),
+    ("/dashboard", 4),
+    ("/admin/users", 4),
+])
+def test_page_query_budget(app, login, path, budget):
+    _get_within_budget(app, login(), path, budget)
+
+
+def test_item_detail_query_budget(app, login, rich_item_id):
+    response = _get_within_budget(app, login(), f"/items/{rich_item_id}", 6)
+    assert "/accept" in response.get_data(as_text=True)  # заявки владельцу действительно показаны
+
+
+def test_query_budget_reports_overflow(app):
+    with app.app_context():
+        with pytest.raises(AssertionError, match="Превышен бюджет SQL-запросов: 2 > 1"):
+            with query_budget(1):
+                db.session.execute(db.select(Item.id).limit(1))
+                db.session.execute(db.select(Item.id).limit(1))